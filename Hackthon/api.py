@@ -0,0 +1,432 @@
+"""JSON API for notes, todos and period records.
+
+Lists use keyset pagination: each page carries an opaque cursor holding the
+sort key of its last row, and the next page starts after it with an indexed
+WHERE instead of an OFFSET scan. GET responses carry an ETag and answer
+If-None-Match with 304. PATCH changes only the fields it is given, and
+honours If-Match so a client can't overwrite a change it hasn't seen.
+
+POST /api/sync exchanges changes with the desktop pet's sync engine: the
+client pushes what changed since its last sync and gets back what changed
+on the server since its cursor. Conflicts go to the latest change.
+"""
+import base64
+import io
+import json
+from datetime import date, datetime
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+
+import bulk_io
+from cache import ResponseCache
+from models import (db, Todo, Note, PeriodRecord, SyncChange, SYNC_MODELS, SERVER_ORIGIN,
+                    search_filter, get_cycle_stats, commit_periods, next_seq,
+                    log_inserted, load_rows, change_event, queue_events, change_listeners,
+                    change_versions)
+
+api = Blueprint('api', __name__, url_prefix='/api')
+
+# GET responses per tab; a change only invalidates the tab it touched
+response_cache = ResponseCache(poll=change_versions)
+change_listeners.append(response_cache.changed)
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+@api.errorhandler(ApiError)
+def handle_api_error(error):
+    return jsonify({'error': error.message}), error.status
+
+# Field parsers for POST and PATCH bodies
+
+def text_field(max_length=None):
+    def parse(value):
+        if not isinstance(value, str) or not value.strip():
+            raise ApiError("text must be a non-empty string")
+        value = value.strip()
+        if max_length and len(value) > max_length:
+            raise ApiError(f"text must be at most {max_length} characters")
+        return value
+    return parse
+
+def bool_field(value):
+    if not isinstance(value, bool):
+        raise ApiError("completed must be true or false")
+    return value
+
+def date_field(value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ApiError(f"invalid date {value!r}, expected YYYY-MM-DD")
+
+class Resource:
+    """How one model is listed, created and updated through the API"""
+
+    def __init__(self, model, order, fields, required, searchable=False):
+        self.model = model
+        self.order = order          # ((column name, descending, cursor parser), ...)
+        self.fields = fields        # field name -> parser
+        self.required = required
+        self.searchable = searchable
+
+    def order_by(self):
+        columns = [getattr(self.model, name) for name, _, _ in self.order]
+        return [c.desc() if desc else c.asc() for c, (_, desc, _) in zip(columns, self.order)]
+
+    def after(self, key):
+        """WHERE clause selecting the rows that sort after key"""
+        columns = [getattr(self.model, name) for name, _, _ in self.order]
+        directions = {desc for _, desc, _ in self.order}
+        if len(directions) == 1:
+            # A row value comparison lets SQLite seek into the index instead of scanning up to key
+            row, start = db.tuple_(*columns), db.tuple_(*key)
+            return row < start if directions.pop() else row > start
+        clause = None
+        # Otherwise build (a > x) OR (a = x AND b > y) from the last column backwards
+        for column, (_, desc, _), value in reversed(list(zip(columns, self.order, key))):
+            beyond = column < value if desc else column > value
+            clause = beyond if clause is None else db.or_(beyond, db.and_(column == value, clause))
+        return clause
+
+    def cursor(self, row):
+        key = [getattr(row, name) for name, _, _ in self.order]
+        key = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in key]
+        return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+    def parse_cursor(self, cursor):
+        try:
+            key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(key) != len(self.order):
+                raise ValueError
+            return [parse(value) for (_, _, parse), value in zip(self.order, key)]
+        except (ValueError, TypeError, ApiError):
+            raise ApiError("invalid cursor")
+
+    def parse_body(self, body, partial):
+        if not isinstance(body, dict):
+            raise ApiError("expected a JSON object")
+        unknown = set(body) - set(self.fields)
+        if unknown:
+            raise ApiError(f"unknown fields: {', '.join(sorted(unknown))}")
+        if not partial:
+            missing = [name for name in self.required if name not in body]
+            if missing:
+                raise ApiError(f"missing fields: {', '.join(missing)}")
+        return {name: self.fields[name](value) for name, value in body.items()}
+
+RESOURCES = {
+    'notes': Resource(Note, (('id', True, int),), {'text': text_field(bulk_io.NOTE_MAX_LENGTH)}, ('text',),
+                      searchable=True),
+    # Open todos first, served by ix_todo_completed. completed is compared as 0/1:
+    # SQLAlchemy only allows == and != against True and False
+    'todos': Resource(Todo, (('completed', False, int), ('id', False, int)),
+                      {'text': text_field(200), 'completed': bool_field}, ('text',), searchable=True),
+    'periods': Resource(PeriodRecord, (('start_date', True, date_field), ('id', True, int)),
+                        {'start_date': date_field, 'end_date': date_field}, ('start_date', 'end_date')),
+}
+
+def get_resource(name):
+    resource = RESOURCES.get(name)
+    if resource is None:
+        raise ApiError(f"no such resource {name!r}", 404)
+    return resource
+
+def get_row(resource, item_id):
+    row = db.session.get(resource.model, item_id)
+    if row is None:
+        raise ApiError("not found", 404)
+    return row
+
+def conditional(payload):
+    """JSON response with an ETag, or 304 if the client's copy is current"""
+    response = jsonify(payload)
+    response.add_etag()
+    return response.make_conditional(request)
+
+def cached(tab, build):
+    """conditional() for a list or stats GET, served from the response cache when current"""
+    response_cache.refresh()
+    entry, version = response_cache.get(tab, request.full_path)
+    if entry is None:
+        entry = response_cache.set(tab, version, request.full_path,
+                                   current_app.json.dumps(build()).encode())
+    body, etag = entry
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+def check_dates(row, fields):
+    """Reject a period that would end before it starts"""
+    if not isinstance(row, PeriodRecord):
+        return
+    start = fields.get('start_date', row.start_date)
+    end = fields.get('end_date', row.end_date)
+    if end < start:
+        raise ApiError("end_date must not be before start_date")
+
+# Routes
+
+@api.route('/<name>')
+def list_items(name):
+    resource = get_resource(name)
+    try:
+        limit = min(max(int(request.args.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        raise ApiError("limit must be a number")
+    query = request.args.get('q', '').strip()
+    if query and not resource.searchable:
+        raise ApiError(f"{name} can't be searched")
+
+    def page():
+        select = resource.model.query.order_by(*resource.order_by())
+        cursor = request.args.get('cursor')
+        key = resource.parse_cursor(cursor) if cursor else None
+        if key:
+            select = select.filter(resource.after(key))
+        if query:
+            window = None
+            if [name for name, _, _ in resource.order] == ['id']:
+                window = (resource.order[0][1], key[0] if key else None, limit + 1)
+            select = select.filter(search_filter(resource.model, query, window))
+        # One extra row tells whether there is a next page without a COUNT
+        rows = select.limit(limit + 1).all()
+        next_cursor = resource.cursor(rows[limit - 1]) if len(rows) > limit else None
+        return {'items': [row.to_dict() for row in rows[:limit]], 'next_cursor': next_cursor}
+    return cached(name, page)
+
+@api.route('/<name>', methods=['POST'])
+def create_item(name):
+    resource = get_resource(name)
+    fields = resource.parse_body(request.get_json(silent=True), partial=False)
+    row = resource.model(**fields)
+    check_dates(row, fields)
+    db.session.add(row)
+    if isinstance(row, PeriodRecord):
+        commit_periods(added=[(row.start_date, row.end_date)])
+    else:
+        db.session.commit()
+    response = jsonify(row.to_dict())
+    response.status_code = 201
+    response.add_etag()
+    return response
+
+@api.route('/<name>/<int:item_id>')
+def get_item(name, item_id):
+    return conditional(get_row(get_resource(name), item_id).to_dict())
+
+@api.route('/<name>/<int:item_id>', methods=['PATCH'])
+def update_item(name, item_id):
+    resource = get_resource(name)
+    row = get_row(resource, item_id)
+    if request.if_match:
+        current = jsonify(row.to_dict())
+        current.add_etag()
+        if not request.if_match.contains(current.get_etag()[0]):
+            raise ApiError("item changed since it was read", 412)
+    fields = resource.parse_body(request.get_json(silent=True), partial=True)
+    check_dates(row, fields)
+    if isinstance(row, PeriodRecord):
+        before = (row.start_date, row.end_date)
+    for field, value in fields.items():
+        setattr(row, field, value)
+    if isinstance(row, PeriodRecord):
+        commit_periods(removed=[before], added=[(row.start_date, row.end_date)])
+    else:
+        db.session.commit()
+    return conditional(row.to_dict())
+
+@api.route('/<name>/<int:item_id>', methods=['DELETE'])
+def delete_item(name, item_id):
+    row = get_row(get_resource(name), item_id)
+    db.session.delete(row)
+    if isinstance(row, PeriodRecord):
+        commit_periods(removed=[(row.start_date, row.end_date)])
+    else:
+        db.session.commit()
+    return '', 204
+
+@api.route('/periods/stats')
+def period_stats():
+    def stats():
+        summary = get_cycle_stats(response_cache.version('periods')).summary()
+        prediction = summary['prediction']
+        if prediction:
+            summary['prediction'] = {key: value.isoformat() for key, value in prediction.items()}
+        return summary
+    return cached('periods', stats)
+
+# Bulk import and export, streamed in both directions
+
+BULK_COLLECTIONS = {'notes': 'notes', 'todos': 'todos', 'periods': 'period_records'}
+MIMETYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+def bulk_format(default):
+    fmt = request.args.get('format', default)
+    if fmt not in bulk_io.FORMATS:
+        raise ApiError(f"format must be one of {', '.join(bulk_io.FORMATS)}")
+    return fmt
+
+def to_columns(record):
+    """Column values for a record cleaned by bulk_io, which keeps dates as strings"""
+    values = dict(record)
+    for name in ('start_date', 'end_date'):
+        if name in values:
+            values[name] = date.fromisoformat(values[name])
+    if 'timestamp' in values:
+        values['timestamp'] = datetime.fromisoformat(values['timestamp'])
+    return values
+
+@api.route('/bulk/<name>')
+def bulk_export(name):
+    resource = get_resource(name)
+    fmt = bulk_format('ndjson')
+    rows = resource.model.query.order_by(*resource.order_by()).yield_per(bulk_io.CHUNK_SIZE)
+    lines = bulk_io.export_lines((row.to_dict() for row in rows), fmt, BULK_COLLECTIONS[name])
+    return Response(stream_with_context(lines), mimetype=MIMETYPES[fmt],
+                    headers={'Content-Disposition': f'attachment; filename={name}.{fmt}'})
+
+@api.route('/bulk/<name>', methods=['POST'])
+def bulk_import(name):
+    resource = get_resource(name)
+    fmt = bulk_format('csv' if request.mimetype == 'text/csv' else 'ndjson')
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    report = bulk_io.new_report()
+    records = bulk_io.read_records(stream, fmt, BULK_COLLECTIONS[name], report)
+    # One executemany and commit per chunk keeps memory flat and lets other writers in between
+    table = resource.model.__table__
+    kind = BULK_COLLECTIONS[name]
+    for chunk in bulk_io.chunks(records):
+        columns = [to_columns(r) for r in chunk]
+        ids = db.session.execute(table.insert().returning(table.c.id), columns).scalars().all()
+        seqs = log_inserted(db.session.connection(), kind, ids)
+        queue_events(db.session, [change_event(seq, kind, 'created', row_id,
+                                               resource.model(id=row_id, **values).to_dict())
+                                  for seq, row_id, values in zip(seqs, ids, columns)])
+        db.session.commit()
+        report['imported'] += len(chunk)
+    return jsonify(report)
+
+# Two-way sync with the desktop pet (see sync.py)
+
+SYNC_PAGE_SIZE = 500
+
+def parse_change(raw):
+    """(uid, kind, updated_at, deleted, columns) of a pushed change, or ValueError"""
+    if not isinstance(raw, dict) or raw.get('kind') not in SYNC_MODELS:
+        raise ValueError(f"kind must be one of {', '.join(SYNC_MODELS)}")
+    uid = raw.get('uid')
+    if not isinstance(uid, str) or not 0 < len(uid) <= 64:
+        raise ValueError("uid must be a string of at most 64 characters")
+    updated_at = raw.get('updated_at')
+    if not isinstance(updated_at, (int, float)) or isinstance(updated_at, bool):
+        raise ValueError("updated_at must be a number")
+    deleted = raw.get('deleted') is True
+    columns = None if deleted else to_columns(bulk_io.clean_record(raw['kind'], raw.get('record')))
+    return uid, raw['kind'], float(updated_at), deleted, columns
+
+def apply_changes(changes, origin, seq):
+    """Apply pushed changes unless the server has later ones. Returns the uids that lost.
+
+    Log entries and rows are loaded in one query each and written in one flush.
+    """
+    logs = {c.uid: c for c in SyncChange.query.filter(SyncChange.uid.in_([c[0] for c in changes]))}
+    rows = load_rows(list(logs.values()))
+    lost, applied = [], []
+    for uid, kind, updated_at, deleted, columns in changes:
+        log = logs.get(uid)
+        if log is not None and (log.updated_at, log.origin) >= (updated_at, origin):
+            # Equal means a retried push that was already applied
+            if (log.updated_at, log.origin) != (updated_at, origin):
+                lost.append(uid)
+            continue
+        if log is None and deleted:
+            continue  # Created and deleted before the server ever saw it
+        row = rows.get((kind, log.row_id)) if log is not None and not log.deleted else None
+        change = 'deleted' if deleted else 'updated'
+        if deleted:
+            if row is not None:
+                db.session.delete(row)
+        elif row is None:
+            row = SYNC_MODELS[kind](**columns)
+            db.session.add(row)
+            change = 'created'
+        else:
+            for field, value in columns.items():
+                setattr(row, field, value)
+        if log is None:
+            log = logs[uid] = SyncChange(uid=uid, kind=kind)
+            db.session.add(log)
+        log.seq, log.updated_at, log.origin, log.deleted = seq, updated_at, origin, deleted
+        applied.append((log, row, change))
+        seq += 1
+    db.session.flush()  # Gives created rows their ids
+    events = []
+    for log, row, change in applied:
+        if row is not None:
+            log.row_id = row.id
+        events.append(change_event(log.seq, log.kind, change, log.row_id,
+                                   None if log.deleted else row.to_dict()))
+    queue_events(db.session, events)
+    return lost
+
+def sync_payload(changes):
+    """Changes as sent to clients, with the current fields of each record"""
+    rows = load_rows(changes)
+    payload = []
+    for change in changes:
+        row = None if change.deleted else rows.get((change.kind, change.row_id))
+        record = row.to_dict() if row is not None else None
+        if record:
+            del record['id']
+        payload.append({'uid': change.uid, 'kind': change.kind, 'updated_at': change.updated_at,
+                        'origin': change.origin, 'deleted': record is None, 'record': record})
+    return payload
+
+@api.route('/sync', methods=['POST'])
+def sync():
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        raise ApiError("expected a JSON object")
+    client = body.get('client_id')
+    if not isinstance(client, str) or not 0 < len(client) <= 64 or client == SERVER_ORIGIN:
+        raise ApiError("client_id must be a string of at most 64 characters")
+    cursor = body.get('cursor', 0)
+    pushed = body.get('changes', [])
+    if not isinstance(cursor, int) or isinstance(cursor, bool) or not isinstance(pushed, list):
+        raise ApiError("cursor must be a number and changes a list")
+    if len(pushed) > SYNC_PAGE_SIZE:
+        raise ApiError(f"push at most {SYNC_PAGE_SIZE} changes at a time", 413)
+
+    changes, rejected = [], []
+    for raw in pushed:
+        try:
+            changes.append(parse_change(raw))
+        except ValueError as e:
+            rejected.append({'uid': raw.get('uid') if isinstance(raw, dict) else None, 'error': str(e)})
+    # Pushed changes are logged under the client's name, not by the session hook
+    db.session.info['sync_applying'] = True
+    try:
+        lost = apply_changes(changes, client, next_seq(db.session.connection())) if changes else []
+        db.session.commit()
+    finally:
+        db.session.info.pop('sync_applying', None)
+
+    # Everything past the cursor except the client's own changes, plus the
+    # server's side of the conflicts it lost
+    scanned = SyncChange.query.filter(SyncChange.seq > cursor) \
+        .order_by(SyncChange.seq).limit(SYNC_PAGE_SIZE + 1).all()
+    more = len(scanned) > SYNC_PAGE_SIZE
+    scanned = scanned[:SYNC_PAGE_SIZE]
+    changes = [c for c in scanned if c.origin != client]
+    seen = {c.uid for c in changes}
+    if lost:
+        changes += [c for c in SyncChange.query.filter(SyncChange.uid.in_(lost)) if c.uid not in seen]
+    return jsonify({'cursor': scanned[-1].seq if scanned else cursor, 'more': more,
+                    'changes': sync_payload(changes), 'rejected': rejected})
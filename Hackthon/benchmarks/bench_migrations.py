@@ -0,0 +1,143 @@
+"""List queries of the web app before and after the schema migrations.
+
+Seeds a scratch database through the app (see load_test.load_app), takes it
+back to the schema before migrations.py by dropping the indexes they add,
+and times the list queries the API and the desktop pet run: first pages
+and pages deep into the list, through a cursor. Then applies the
+migrations to the populated database, as on an existing instance/app.db,
+and times the same queries again. Each query's SQLite plan is shown before
+and after.
+
+Usage: python benchmarks/bench_migrations.py [--rows 200000] [--periods 20000] [--repeat 20]
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from load_test import load_app
+
+# The indexes migration 1 (add_listing_indexes) adds to existing databases
+BASELINE_DROPS = ("DROP INDEX IF EXISTS ix_note_timestamp",
+                  "DROP INDEX IF EXISTS ix_period_record_start_date",
+                  "DROP INDEX IF EXISTS ix_todo_completed",
+                  "PRAGMA user_version = 0")
+
+
+def list_page(resource, key=None, limit=50):
+    """A page of an API list, as GET /api/<name> queries it"""
+    select = resource.model.query.order_by(*resource.order_by())
+    if key is not None:
+        select = select.filter(resource.after(key))
+    return select.limit(limit + 1).all()
+
+
+def key_at(resource, fraction):
+    """Sort key of the row fraction of the way down a list, as a cursor holds it"""
+    count = resource.model.query.count()
+    row = resource.model.query.order_by(*resource.order_by()).offset(int(count * fraction)).first()
+    return resource.parse_cursor(resource.cursor(row))
+
+
+def capture_statement(engine, run):
+    """(statement, parameters) of the last SQL statement run() executes"""
+    from sqlalchemy import event
+    seen = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        seen.append((statement, parameters))
+    event.listen(engine, 'before_cursor_execute', before_execute)
+    try:
+        run()
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_execute)
+    return seen[-1]
+
+
+def query_plan(db_path, statement, parameters):
+    # A new connection: a pooled one may reuse an EXPLAIN prepared before the schema changed
+    connection = sqlite3.connect(db_path)
+    try:
+        rows = connection.execute('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+        return '; '.join(row[-1] for row in rows)
+    finally:
+        connection.close()
+
+
+def measure(db, queries, repeat):
+    """name -> (median ms, plan) for each query"""
+    results = {}
+    for name, run in queries:
+        run()  # Warms the page cache, so both runs read from memory
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            times.append((time.perf_counter() - start) * 1000)
+        results[name] = (statistics.median(times), query_plan(db.engine.url.database, *capture_statement(db.engine, run)))
+        # An open read transaction would keep seeing the schema as it was when it began
+        db.session.commit()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000, help='notes and todos to seed')
+    # Seeded periods go back a month each, so 20000 reach the 4th century
+    parser.add_argument('--periods', type=int, default=20_000, help='periods to seed')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--db', help="scratch database (default: a new temporary file); "
+                                     "its indexes are dropped and rebuilt")
+    args = parser.parse_args()
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='bench-migrations-'), 'app.db')
+
+    start = time.perf_counter()
+    app = load_app(db_path, {'notes': args.rows, 'todos': args.rows, 'periods': args.periods}, profiling=False)
+    print(f"Seeded {db_path} with {args.rows} notes and todos and {args.periods} periods "
+          f"in {time.perf_counter() - start:.1f} s")
+
+    from api import RESOURCES
+    from migrations import migrate
+    from models import db
+
+    with app.app_context():
+        todos, periods = RESOURCES['todos'], RESOURCES['periods']
+        deep_todo, deep_period = key_at(todos, 0.75), key_at(periods, 0.75)
+        queries = [
+            ('todos, open first', lambda: list_page(todos)),
+            ('todos, 3/4 down', lambda: list_page(todos, deep_todo)),
+            ('periods, newest first', lambda: list_page(periods)),
+            ('periods, 3/4 down', lambda: list_page(periods, deep_period)),
+            # NotesDialog's first page when the desktop pet uses this database
+            ('notes by timestamp', lambda: db.session.execute(db.text(
+                "SELECT id, text, timestamp FROM note ORDER BY timestamp, id LIMIT 50 OFFSET 0")).all()),
+        ]
+        db.session.commit()
+
+        connection = db.engine.raw_connection()
+        try:
+            for statement in BASELINE_DROPS:
+                connection.cursor().execute(statement)
+            before = measure(db, queries, args.repeat)
+            start = time.perf_counter()
+            applied = migrate(connection)
+            migrate_seconds = time.perf_counter() - start
+        finally:
+            connection.close()
+        after = measure(db, queries, args.repeat)
+
+    print(f"Applied {applied} migration(s) to the populated database in {migrate_seconds:.2f} s\n")
+    print(f"{'query':24} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name, _ in queries:
+        print(f"{name:24} {before[name][0]:10.2f} {after[name][0]:10.2f} "
+              f"{before[name][0] / after[name][0]:7.0f}x")
+    print("\nQuery plans:")
+    for name, _ in queries:
+        print(f"{name}\n  before: {before[name][1]}\n  after:  {after[name][1]}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Search latency over a large notes history.
+
+Builds 100k synthetic notes, indexes them with SearchIndex (the JSON
+store) and with SQLiteStore's FTS5 tables, then times a mix of queries.
+
+Usage: python benchmarks/bench_search.py [--notes 100000] [--budget-ms 10]
+Exits with status 1 if the p95 query time of either backend is over budget.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_index import SearchIndex
+from sqlite_store import SQLiteStore
+
+WORDS = ("buy milk call mom dentist appointment meeting project deadline gym run yoga "
+         "book flight hotel pay rent water plants birthday gift recipe pasta exam study "
+         "chapter review laundry clean kitchen email report budget travel paris tokyo "
+         "cat food vet walk doctor pharmacy movie concert ticket garden repair bike").split()
+
+QUERIES = ["milk", "dent", "book fl", "proj dead", "tokyo", "vet cat", "concert tick",
+           "zzz", "pa", "budget report email"]
+
+
+def make_notes(count, seed=1):
+    rng = random.Random(seed)
+    for i in range(count):
+        words = rng.choices(WORDS, k=rng.randint(4, 30))
+        # A unique word per note gives the index a realistic vocabulary size
+        words.append(f"ref{i}")
+        yield ' '.join(words)
+
+
+def time_queries(search, repeat):
+    """Per-query times in ms, over repeat rounds of QUERIES"""
+    times = []
+    for _ in range(repeat):
+        for query in QUERIES:
+            start = time.perf_counter()
+            search(query)
+            times.append((time.perf_counter() - start) * 1000)
+    return sorted(times)
+
+
+def report(name, build_seconds, times):
+    p50 = times[len(times) // 2]
+    p95 = times[int(len(times) * 0.95)]
+    print(f"{name:8} build {build_seconds:6.2f} s   "
+          f"p50 {p50:6.2f} ms   p95 {p95:6.2f} ms   max {times[-1]:6.2f} ms")
+    return p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--notes', type=int, default=100_000)
+    parser.add_argument('--limit', type=int, default=200, help='results per query, as in the dialogs')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--budget-ms', type=float, default=10.0)
+    args = parser.parse_args()
+    notes = list(make_notes(args.notes))
+    print(f"{len(notes)} notes, {len(QUERIES)} queries x {args.repeat}")
+
+    start = time.perf_counter()
+    index = SearchIndex()
+    for i, text in enumerate(notes):
+        index.add(i, text)
+    memory_p95 = report('index', time.perf_counter() - start,
+                        time_queries(lambda q: index.search(q, args.limit), args.repeat))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteStore(os.path.join(tmp, 'bench.db')).load()
+        if not store.fts:
+            print("SQLite has no FTS5, skipping the FTS benchmark")
+            fts_p95 = 0.0
+        else:
+            start = time.perf_counter()
+            with store.conn:
+                store.conn.executemany('INSERT INTO note (text, timestamp) VALUES (?, ?)',
+                                       ((text, '2025-01-01 00:00:00') for text in notes))
+            fts_p95 = report('fts5', time.perf_counter() - start,
+                             time_queries(lambda q: store.search('notes', q, args.limit), args.repeat))
+        store.close()
+
+    worst = max(memory_p95, fts_p95)
+    print(f"worst p95 {worst:.2f} ms, budget {args.budget_ms:.0f} ms: "
+          f"{'ok' if worst <= args.budget_ms else 'OVER BUDGET'}")
+    return 0 if worst <= args.budget_ms else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
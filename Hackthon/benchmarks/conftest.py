@@ -0,0 +1,113 @@
+"""Fixtures for the desktop pet benchmarks (test_pet.py).
+
+Qt runs on the offscreen platform, and HOME points at a scratch directory
+so the pet never touches the real ~/.desktop_pet. Data sizes come from
+PET_BENCH_SIZES (default 1000,10000,100000).
+"""
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+BENCH_HOME = tempfile.mkdtemp(prefix='pet-bench-')
+os.environ['HOME'] = os.environ['USERPROFILE'] = BENCH_HOME
+
+HACKTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(HACKTHON_DIR)
+sys.path.insert(0, HACKTHON_DIR)
+
+import pytest
+
+SIZES = [int(size) for size in os.environ.get('PET_BENCH_SIZES', '1000,10000,100000').split(',')]
+
+WORDS = ("buy milk call mom dentist appointment meeting project deadline gym run yoga "
+         "book flight hotel pay rent water plants birthday gift recipe pasta exam study").split()
+
+
+def synthetic_data(size, seed=1):
+    """pet_data.json contents with size notes, todos and period records"""
+    rng = random.Random(seed)
+    start = datetime(2000, 1, 1)
+    notes = [{'id': f'{i:032x}', 'text': ' '.join(rng.choices(WORDS, k=rng.randint(4, 30))),
+              'timestamp': (start + timedelta(minutes=17 * i)).strftime("%Y-%m-%d %H:%M:%S")}
+             for i in range(size)]
+    todos = [{'id': f'{size + i:032x}', 'text': ' '.join(rng.choices(WORDS, k=rng.randint(2, 8))),
+              'completed': rng.random() < 0.5}
+             for i in range(size)]
+    period_records = []
+    day = date(1900, 1, 1)
+    for i in range(size):
+        end = day + timedelta(days=rng.randint(3, 7))
+        period_records.append({'id': f'{2 * size + i:032x}', 'start_date': day.isoformat(),
+                               'end_date': end.isoformat()})
+        day += timedelta(days=rng.randint(24, 35))
+    return {'notes': notes, 'todos': todos, 'period_records': period_records,
+            'reminders': [], 'pet_size': 100}
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'sizes(*sizes): data sizes to run with instead of PET_BENCH_SIZES')
+
+
+def pytest_generate_tests(metafunc):
+    if 'size' in metafunc.fixturenames:
+        marker = metafunc.definition.get_closest_marker('sizes')
+        metafunc.parametrize('size', list(marker.args) if marker else SIZES, scope='session')
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    from PySide6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture(scope='session')
+def data_file(tmp_path_factory, size):
+    """A synthetic pet_data.json, generated once per size"""
+    path = tmp_path_factory.mktemp(f'data-{size}') / 'pet_data.json'
+    path.write_text(json.dumps(synthetic_data(size)), encoding='utf-8')
+    return str(path)
+
+
+@pytest.fixture
+def fresh_data_dir(tmp_path, data_file):
+    """Returns a function giving a new data directory holding a copy of data_file"""
+    counter = iter(range(1_000_000))
+
+    def make():
+        directory = tmp_path / f'run-{next(counter)}'
+        directory.mkdir()
+        shutil.copy(data_file, directory / 'pet_data.json')
+        return str(directory)
+    return make
+
+
+@pytest.fixture
+def pet(qapp, monkeypatch, fresh_data_dir):
+    """A DesktopPet with its data loaded, without the staged startup"""
+    import desktop_pet
+    data_dir = fresh_data_dir()
+    monkeypatch.setattr(desktop_pet, 'DATA_DIR', data_dir)
+    monkeypatch.chdir(REPO_DIR)  # resource_path() looks for Hackthon/*.gif here
+    pet = desktop_pet.DesktopPet()
+    pet.ready = True  # Keeps the deferred startup stages (cursor tracking, sound) from running
+    pet.load_data()
+    # The states test_change_state switches between, so they play from the sprite cache
+    for state in ('happy', 'idle'):
+        pet.sprite_cache.get(desktop_pet.animation_path(state), pet.scaled_size())
+    yield pet
+    pet.close()  # Flushes the store
+    pet.store.close()
+    pet.deleteLater()
+    close_widgets(qapp)
+
+
+def close_widgets(app):
+    """Run pending deletions, which processEvents alone leaves queued"""
+    from PySide6.QtCore import QCoreApplication, QEvent
+    app.processEvents()
+    QCoreApplication.sendPostedEvents(None, QEvent.Type.DeferredDelete)
@@ -0,0 +1,370 @@
+"""Load test for the Flask app's routes.
+
+Against a running server, e.g. on a scratch database:
+
+    DATABASE_URL=sqlite:////tmp/load.db python wsgi.py --port 5001
+    python benchmarks/load_test.py --url http://127.0.0.1:5001 --concurrency 16 --duration 20
+
+Or let the harness seed a scratch database with --notes/--todos/--periods
+rows and drive the app itself, in process through Flask's test client or
+through a waitress server it launches in a child process:
+
+    python benchmarks/load_test.py --mode client --notes 100000 --duration 10
+    python benchmarks/load_test.py --mode server --notes 100000 --concurrency 16 --json results.json
+
+Each worker thread loops over a weighted mix of read routes (the page, list
+pages, search, cycle stats) and write routes (create a note, toggle a todo,
+add and delete a period). Requests per second, p50/p95/p99 latency, errors
+and SQL statements per request are reported per route. Statement counts
+come from the Server-Timing headers of SQL_PROFILING (see profiling.py),
+which the client and server modes turn on; they are followed by the
+slowest statements from /_perf. Test client workers share the GIL with the
+app, so use server mode for throughput under concurrency.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+HACKTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+class Client:
+    """Tiny JSON client over urllib.
+
+    queries adds up the statement counts in the server's Server-Timing
+    headers; it stays None when the server doesn't profile SQL.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.queries = None
+
+    def count(self, headers):
+        match = QUERIES_RE.search(headers.get('Server-Timing') or '')
+        if match:
+            self.queries = (self.queries or 0) + int(match.group(1))
+
+    def call(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        if data is not None:
+            req.add_header('Content-Type', 'application/json')
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                payload = response.read()
+                self.count(response.headers)
+                is_json = response.headers.get_content_type() == 'application/json'
+                return response.status, json.loads(payload) if payload and is_json else None
+        except urllib.error.HTTPError as e:
+            self.count(e.headers)
+            return e.code, None
+
+
+class AppClient(Client):
+    """The same interface over Flask's test client, without a socket"""
+
+    def __init__(self, app):
+        super().__init__('')
+        self.client = app.test_client()
+
+    def call(self, method, path, body=None):
+        response = self.client.open(path, method=method, json=body)
+        self.count(response.headers)
+        return response.status_code, response.get_json(silent=True)
+
+
+# Scenarios: (route label, weight, function(client, rng) -> status)
+
+def home(client, rng):
+    return client.call('GET', '/')[0]
+
+def search_notes(client, rng):
+    return client.call('GET', '/api/notes?q=' + rng.choice(SEED_WORDS))[0]
+
+def page_notes(client, rng):
+    """The first pages of notes, following next_cursor"""
+    path = '/api/notes?limit=50'
+    for _ in range(4):
+        status, page = client.call('GET', path)
+        if status != 200 or not page['next_cursor']:
+            return status
+        path = f"/api/notes?limit=50&cursor={page['next_cursor']}"
+    return status
+
+def list_notes(client, rng):
+    return client.call('GET', '/api/notes?limit=50')[0]
+
+def list_todos(client, rng):
+    return client.call('GET', '/api/todos?limit=50')[0]
+
+def list_periods(client, rng):
+    return client.call('GET', '/api/periods?limit=50')[0]
+
+def cycle_stats(client, rng):
+    return client.call('GET', '/api/periods/stats')[0]
+
+def create_note(client, rng):
+    return client.call('POST', '/api/notes', {'text': f"load test note {rng.random()}"})[0]
+
+def toggle_todo(client, rng):
+    status, todo = client.call('POST', '/api/todos', {'text': 'load test todo'})
+    if status != 201:
+        return status
+    return client.call('PATCH', f"/api/todos/{todo['id']}", {'completed': True})[0]
+
+def add_delete_period(client, rng):
+    day = rng.randint(1, 28)
+    status, record = client.call('POST', '/api/periods', {'start_date': f'2020-01-{day:02d}',
+                                                           'end_date': f'2020-01-{day:02d}'})
+    if status != 201:
+        return status
+    return client.call('DELETE', f"/api/periods/{record['id']}")[0]
+
+READS = [('GET /', 1, home), ('GET /api/notes', 4, list_notes), ('GET /api/notes x4 pages', 1, page_notes),
+         ('GET /api/notes?q=', 2, search_notes), ('GET /api/todos', 3, list_todos),
+         ('GET /api/periods', 2, list_periods), ('GET /api/periods/stats', 1, cycle_stats)]
+WRITES = [('POST /api/notes', 3, create_note), ('POST+PATCH /api/todos', 2, toggle_todo),
+          ('POST+DELETE /api/periods', 1, add_delete_period)]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def run(url, concurrency, duration, write_ratio, seed=0, scenarios=None, make_client=None):
+    """Run the load and return {route: {'latencies': [...], 'errors': n, 'queries': [...]}}.
+
+    make_client builds each worker's client; by default a Client for url.
+    """
+    make_client = make_client or (lambda: Client(url))
+    reads = scenarios['reads'] if scenarios else READS
+    writes = scenarios['writes'] if scenarios else WRITES
+    results = defaultdict(lambda: {'latencies': [], 'errors': 0, 'queries': []})
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(n):
+        rng = random.Random(seed * 1000 + n)
+        client = make_client()
+        while time.perf_counter() < deadline:
+            pool = writes if rng.random() < write_ratio else reads
+            label, _, scenario = rng.choices(pool, weights=[w for _, w, _ in pool])[0]
+            client.queries = None
+            start = time.perf_counter()
+            try:
+                status = scenario(client, rng)
+            except OSError:
+                status = None
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                entry = results[label]
+                entry['latencies'].append(elapsed)
+                if client.queries is not None:
+                    entry['queries'].append(client.queries)
+                if status is None or status >= 400:
+                    entry['errors'] += 1
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return dict(results)
+
+
+def summarize(results, duration):
+    """Per-route numbers for report() and --json"""
+    summary = {}
+    for label, entry in sorted(results.items()):
+        latencies = sorted(entry['latencies'])
+        queries = entry['queries']
+        summary[label] = {
+            'requests': len(latencies),
+            'rps': round(len(latencies) / duration, 1),
+            'p50_ms': round(percentile(latencies, 0.5), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'errors': entry['errors'],
+            'queries': round(sum(queries) / len(queries), 1) if queries else None,
+        }
+    return summary
+
+
+def report(results, duration):
+    summary = summarize(results, duration)
+    print(f"{'route':28} {'requests':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'errors':>7} {'queries':>7}")
+    for label, row in summary.items():
+        queries = '-' if row['queries'] is None else f"{row['queries']:.1f}"
+        print(f"{label:28} {row['requests']:8d} {row['rps']:8.1f} {row['p50_ms']:8.1f} "
+              f"{row['p95_ms']:8.1f} {row['p99_ms']:8.1f} {row['errors']:7d} {queries:>7}")
+    total = sum(row['requests'] for row in summary.values())
+    errors = sum(row['errors'] for row in summary.values())
+    print(f"{'total':28} {total:8d} {total / duration:8.1f} {'':8} {'':8} {'':8} {errors:7d}")
+    return errors
+
+
+# A local app on a seeded scratch database
+
+SEED_WORDS = ("buy milk call mom dentist appointment meeting project deadline gym run yoga "
+              "book flight hotel pay rent water plants birthday gift recipe pasta exam study").split()
+
+
+def seed_rows(kind, start, count, rng):
+    """Synthetic rows for the app's tables, numbered from start"""
+    now = datetime.now()
+    for i in range(start, count):
+        if kind == 'notes':
+            yield {'text': ' '.join(rng.choices(SEED_WORDS, k=rng.randint(4, 30))),
+                   'timestamp': now - timedelta(minutes=17 * i)}
+        elif kind == 'todos':
+            yield {'text': ' '.join(rng.choices(SEED_WORDS, k=rng.randint(2, 8))),
+                   'completed': rng.random() < 0.5}
+        else:
+            start_date = date(2020, 1, 1) - timedelta(days=29 * i)
+            yield {'start_date': start_date, 'end_date': start_date + timedelta(days=rng.randint(3, 7))}
+
+
+def load_app(db_path, counts=None, profiling=True):
+    """The Flask app on db_path, topped up to counts {'notes': n, ...} rows"""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(db_path)
+    if profiling:
+        os.environ['SQL_PROFILING'] = '1'
+    sys.path.insert(0, HACKTHON_DIR)
+    from sqlalchemy import func, select
+
+    import bulk_io
+    from app import app
+    from models import db, init_db, backfill_sync_log, Note, Todo, PeriodRecord
+
+    rng = random.Random(0)
+    with app.app_context():
+        init_db()
+        for kind, model in (('notes', Note), ('todos', Todo), ('periods', PeriodRecord)):
+            table = model.__table__
+            existing = db.session.execute(select(func.count()).select_from(table)).scalar()
+            for chunk in bulk_io.chunks(seed_rows(kind, existing, (counts or {}).get(kind, 0), rng)):
+                db.session.execute(table.insert(), chunk)
+            db.session.commit()
+        with db.engine.begin() as connection:
+            backfill_sync_log(connection)
+    return app
+
+
+def report_statements(client, limit=5):
+    """Print the slowest statements the server's profiler has seen"""
+    status, report = client.call('GET', '/_perf?format=json')
+    if status != 200:
+        return
+    print("\nSlowest statements (see /_perf for query plans):")
+    print(f"{'max ms':>8} {'mean ms':>8} {'count':>7}  statement")
+    for row in report['statements'][:limit]:
+        print(f"{row['max_ms']:8.1f} {row['mean_ms']:8.2f} {row['count']:7d}  {row['statement'][:100]}")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def launch_server(db_path, threads, timeout=60):
+    """Serve db_path with waitress in a child process; returns (process, url)"""
+    port = free_port()
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', '--db', db_path,
+                                '--port', str(port), '--threads', str(threads)])
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with status {process.returncode}")
+        try:
+            urllib.request.urlopen(url + '/api/todos?limit=1', timeout=1).close()
+            return process, url
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"server didn't start within {timeout} s")
+
+
+def serve(db_path, port, threads):
+    from waitress import serve as waitress_serve
+    app = load_app(db_path)
+    waitress_serve(app, host='127.0.0.1', port=port, threads=threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Flask app's routes")
+    parser.add_argument('--mode', choices=('url', 'client', 'server'), default='url',
+                        help="url: a running server; client: Flask's test client; "
+                             "server: a waitress server launched on a seeded database")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds')
+    parser.add_argument('--write-ratio', type=float, default=0.3)
+    parser.add_argument('--db', help="scratch database for the client and server modes "
+                                     "(default: a new temporary file)")
+    parser.add_argument('--notes', type=int, default=10000, help="rows to seed")
+    parser.add_argument('--todos', type=int, default=1000)
+    parser.add_argument('--periods', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=16, help="waitress threads in server mode")
+    parser.add_argument('--json', help="also write the per-route results to this file")
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.db, args.port, args.threads)
+        return
+    make_client = None
+    process = None
+    url = args.url
+    if args.mode == 'url':
+        make_client = lambda: Client(url)
+    if args.mode != 'url':
+        db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='load-test-'), 'app.db')
+        counts = {'notes': args.notes, 'todos': args.todos, 'periods': args.periods}
+        start = time.perf_counter()
+        app = load_app(db_path, counts)
+        print(f"Seeded {db_path} to at least "
+              + ", ".join(f"{n} {kind}" for kind, n in counts.items())
+              + f" in {time.perf_counter() - start:.1f} s")
+        if args.mode == 'client':
+            make_client = lambda: AppClient(app)
+            url = 'test client'
+        else:
+            process, url = launch_server(db_path, args.threads)
+    try:
+        print(f"{url}: {args.concurrency} clients for {args.duration:.0f} s, "
+              f"{args.write_ratio:.0%} writes")
+        results = run(url, args.concurrency, args.duration, args.write_ratio, make_client=make_client)
+        report(results, args.duration)
+        report_statements(make_client() if make_client else Client(url))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'mode': args.mode, 'concurrency': args.concurrency, 'duration': args.duration,
+                       'write_ratio': args.write_ratio, 'routes': summarize(results, args.duration)},
+                      f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
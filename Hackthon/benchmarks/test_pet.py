@@ -0,0 +1,107 @@
+"""Benchmarks of the desktop pet's data and UI paths, run headless.
+
+Needs PySide6 and pytest-benchmark. From Hackthon/:
+
+    QT_QPA_PLATFORM=offscreen python -m pytest benchmarks
+    PET_BENCH_SIZES=1000 python -m pytest benchmarks -k dialog
+
+Every run is saved as JSON under .benchmarks/ (see pytest.ini); compare
+with an earlier run with --benchmark-compare, or fail on a regression with
+--benchmark-compare-fail=mean:10%.
+"""
+import itertools
+
+import pytest
+
+pytest.importorskip('PySide6')
+pytest.importorskip('pytest_benchmark')
+
+from PySide6.QtCore import QDate
+
+from conftest import close_widgets
+
+
+# Opening a dialog over 100k records can take seconds, so big sizes get few rounds
+def rounds_for(size):
+    return max(1, min(20, 100_000 // (size * 5)))
+
+
+def test_load_data(benchmark, pet, monkeypatch, fresh_data_dir, size):
+    import desktop_pet
+
+    def setup():
+        pet.store.close()
+        monkeypatch.setattr(desktop_pet, 'DATA_DIR', fresh_data_dir())
+
+    benchmark.pedantic(pet.load_data, setup=setup, rounds=rounds_for(size))
+    assert pet.store.count('notes') == size
+
+
+def test_save_data(benchmark, pet, size):
+    sizes = itertools.cycle((90, 110))
+
+    def change_and_save():
+        pet.store.set('pet_size', next(sizes))
+        pet.save_data()
+
+    benchmark(change_and_save)
+
+
+@pytest.mark.parametrize('collection, record', [
+    ('notes', {'text': 'benchmark note', 'timestamp': '2024-01-01 12:00:00'}),
+    ('todos', {'text': 'benchmark todo', 'completed': False}),
+    ('period_records', {'start_date': '2024-01-01', 'end_date': '2024-01-05'}),
+])
+def test_add_delete(benchmark, pet, size, collection, record):
+    def add_and_delete():
+        added = pet.store.add(collection, dict(record))
+        pet.store.delete(collection, added)
+
+    benchmark(add_and_delete)
+    assert pet.store.count(collection) == size
+
+
+@pytest.mark.parametrize('dialog_name', ['NotesDialog', 'TodoListDialog', 'PeriodDialog'])
+def test_open_dialog(benchmark, qapp, pet, size, dialog_name):
+    import dialogs
+    dialog_class = getattr(dialogs, dialog_name)
+    opened = []
+
+    def close_opened():
+        while opened:
+            dialog = opened.pop()
+            dialog.close()
+            dialog.deleteLater()
+        close_widgets(qapp)
+
+    def open_dialog():
+        dialog = dialog_class(pet)
+        dialog.show()
+        qapp.processEvents()  # Lays out and paints the first screen
+        opened.append(dialog)
+
+    benchmark.pedantic(open_dialog, setup=close_opened, rounds=rounds_for(size))
+    close_opened()
+
+
+@pytest.mark.sizes(1000)
+@pytest.mark.parametrize('days', [31, 365, 3650])
+def test_highlight_date_range(benchmark, qapp, pet, days):
+    from dialogs import PeriodDialog
+    dialog = PeriodDialog(pet)
+    # Alternate between two ranges that don't overlap, so every day changes format
+    starts = itertools.cycle((QDate(2030, 1, 1), QDate(2030, 1, 1).addDays(days + 1)))
+
+    def select_range():
+        dialog.start_date = next(starts)
+        dialog.end_date = dialog.start_date.addDays(days - 1)
+        dialog.highlight_date_range()
+
+    benchmark(select_range)
+    dialog.close()
+
+
+@pytest.mark.sizes(1000)
+def test_change_state(benchmark, pet):
+    states = itertools.cycle(('happy', 'idle'))
+    benchmark(lambda: pet.change_state(next(states)))
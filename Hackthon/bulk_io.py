@@ -0,0 +1,229 @@
+"""Bulk import and export of notes, todos and period records.
+
+Records are streamed as NDJSON (one JSON object per line) or CSV, one row
+at a time, so memory use doesn't grow with the size of the file. Imports
+are validated row by row and written in chunks: executemany on SQLite, or
+one batched journal write per chunk on the JSON store. Invalid rows are
+skipped and reported with their line number.
+
+Used by the /api/bulk routes of the Flask app, and as a command line tool
+for the desktop pet's data and for the Flask app's database:
+
+    python bulk_io.py export notes notes.ndjson --data-dir ~/.desktop_pet
+    python bulk_io.py import todos todos.csv --db instance/app.db
+"""
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import json
+import logging
+import os
+import sys
+from datetime import date, datetime
+
+FORMATS = ('ndjson', 'csv')
+
+# collection -> fields written on export and read on import
+FIELDS = {
+    'notes': ('text', 'timestamp'),
+    'todos': ('text', 'completed'),
+    'period_records': ('start_date', 'end_date'),
+}
+
+# Longest note text accepted; the web app's database enforces it too (see migrations.py)
+NOTE_MAX_LENGTH = 10000
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 20
+
+
+def detect_format(path, default='ndjson'):
+    """Format from a file name: .csv is CSV, anything else NDJSON"""
+    return 'csv' if path and path.lower().endswith('.csv') else default
+
+
+# Validation
+
+def clean_text(value, max_length=None):
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError("text is required")
+    value = value.strip()
+    if max_length and len(value) > max_length:
+        raise ValueError(f"text is longer than {max_length} characters")
+    return value
+
+
+def clean_bool(value):
+    if isinstance(value, bool):
+        return value
+    if value in (None, ''):
+        return False
+    text = str(value).strip().lower()
+    if text in ('1', 'true', 'yes', 'y'):
+        return True
+    if text in ('0', 'false', 'no', 'n'):
+        return False
+    raise ValueError(f"completed must be true or false, not {value!r}")
+
+
+def clean_date(value, name):
+    try:
+        return date.fromisoformat(str(value).strip()[:10]).isoformat()
+    except ValueError:
+        raise ValueError(f"{name} must be a YYYY-MM-DD date, not {value!r}")
+
+
+def clean_timestamp(value):
+    if value in (None, ''):
+        return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        return datetime.fromisoformat(str(value).strip()).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        raise ValueError(f"timestamp must be an ISO date and time, not {value!r}")
+
+
+def clean_record(collection, raw):
+    """A validated record with canonical string values, or ValueError"""
+    if not isinstance(raw, dict):
+        raise ValueError("expected an object")
+    if collection == 'notes':
+        return {'text': clean_text(raw.get('text'), NOTE_MAX_LENGTH),
+                'timestamp': clean_timestamp(raw.get('timestamp'))}
+    if collection == 'todos':
+        return {'text': clean_text(raw.get('text'), 200), 'completed': clean_bool(raw.get('completed'))}
+    start = clean_date(raw.get('start_date'), 'start_date')
+    end = clean_date(raw.get('end_date'), 'end_date')
+    if end < start:
+        raise ValueError("end_date is before start_date")
+    return {'start_date': start, 'end_date': end}
+
+
+# Streaming readers and writers
+
+def read_rows(stream, fmt):
+    """(line number, raw dict or None) for each row of a text stream"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, None
+
+
+def read_records(stream, fmt, collection, report):
+    """Valid records of a text stream; problems are counted in report"""
+    for number, raw in read_rows(stream, fmt):
+        try:
+            if raw is None:
+                raise ValueError("not valid JSON")
+            yield clean_record(collection, raw)
+        except ValueError as e:
+            report['skipped'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append(f"line {number}: {e}")
+
+
+def new_report():
+    return {'imported': 0, 'skipped': 0, 'errors': []}
+
+
+def chunks(iterable, size=CHUNK_SIZE):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def export_lines(records, fmt, collection):
+    """Encoded lines of an export, a header first for CSV"""
+    fields = ('id',) + FIELDS[collection]
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            # Hand over what one row produced instead of building the whole file
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+        return
+    for record in records:
+        yield json.dumps({field: record.get(field) for field in fields}, default=str) + '\n'
+
+
+# Desktop stores (JournalStore and SQLiteStore)
+
+def import_into_store(store, collection, stream, fmt):
+    """Import a stream into a store in chunks. Returns a report."""
+    report = new_report()
+    for chunk in chunks(read_records(stream, fmt, collection, report)):
+        store.add_many(collection, chunk)
+        report['imported'] += len(chunk)
+    return report
+
+
+def export_from_store(store, collection, stream, fmt):
+    for line in export_lines(store.iterate(collection), fmt, collection):
+        stream.write(line)
+
+
+def open_file(path, mode):
+    """Open path for streaming, or stdin/stdout (left open) for '-'"""
+    if path == '-':
+        return contextlib.nullcontext(sys.stdin if mode == 'r' else sys.stdout)
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import or export notes, todos and period records")
+    parser.add_argument('action', choices=('import', 'export'))
+    parser.add_argument('collection', choices=tuple(FIELDS))
+    parser.add_argument('file', help="file to read or write, '-' for stdin/stdout")
+    parser.add_argument('--format', choices=FORMATS, help="default: from the file name, else ndjson")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--data-dir', help="desktop pet data directory (pet_data.json)")
+    target.add_argument('--db', help="SQLite database: the pet's pet_data.db or the web app's app.db")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    fmt = args.format or detect_format(args.file)
+
+    if args.db:
+        from sqlite_store import SQLiteStore
+        store = SQLiteStore(args.db).load()
+    else:
+        from pet_store import JournalStore
+        data_dir = args.data_dir or os.path.join(os.path.expanduser('~'), '.desktop_pet')
+        os.makedirs(data_dir, exist_ok=True)
+        store = JournalStore(os.path.join(data_dir, 'pet_data.json'))
+        store.load()
+
+    try:
+        if args.action == 'import':
+            with open_file(args.file, 'r') as stream:
+                report = import_into_store(store, args.collection, stream, fmt)
+            store.flush()
+            print(f"Imported {report['imported']} {args.collection}, skipped {report['skipped']}")
+            for error in report['errors']:
+                print(f"  {error}")
+        else:
+            with open_file(args.file, 'w') as stream:
+                export_from_store(store, args.collection, stream, fmt)
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Cache of the API's GET responses, invalidated one tab at a time.
+
+Responses are cached per tab (notes, todos, periods) under the tab's
+version: the seq of the latest change log entry that touched it. A change
+to a note moves the notes version on, so the notes entries stop matching
+and age out of the LRU while todos and periods stay cached. Versions come
+from the database, so every worker process agrees on them, and a shared
+backend could serve all of them.
+
+Local commits move versions on through models.change_listeners. Changes
+made by other processes are found by one indexed query on the change log
+before each lookup.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """In-memory backend, bounded by entry count and total size"""
+
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, size):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'evictions': self.evictions}
+
+
+class ResponseCache:
+    """JSON response bodies and their ETags, keyed by tab version"""
+
+    def __init__(self, poll, backend=None):
+        self.poll = poll    # cursor -> ([(tab, seq), ...], cursor), other processes' changes
+        self.backend = backend or LRUCache()
+        self._versions = {}
+        self._cursor = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _bump(self, changes):
+        latest = {}
+        for tab, seq in changes:
+            latest[tab] = max(seq, latest.get(tab, 0))
+        with self._lock:
+            for tab, seq in latest.items():
+                if seq > self._versions.get(tab, 0):
+                    self._versions[tab] = seq
+                    self.invalidations += 1
+
+    def changed(self, events):
+        """Change listener: move on the versions of the tabs these events touched"""
+        self._bump((event['resource'], event['seq']) for event in events)
+
+    def refresh(self):
+        """Catch up with changes committed by other processes"""
+        with self._lock:
+            cursor = self._cursor
+        changes, cursor = self.poll(cursor)
+        self._bump(changes)
+        with self._lock:
+            self._cursor = max(cursor, self._cursor or 0)
+
+    def version(self, tab):
+        with self._lock:
+            return self._versions.get(tab, 0)
+
+    def get(self, tab, key):
+        """(entry, version): the cached (body, etag) or None, and the version
+        to store a freshly computed body under. The version is taken before
+        the body is computed, so a change made meanwhile can't be cached as current.
+        """
+        with self._lock:
+            version = self._versions.get(tab, 0)
+        entry = self.backend.get((tab, version, key))
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return (entry[0] if entry is not None else None), version
+
+    def set(self, tab, version, key, body):
+        etag = hashlib.md5(body).hexdigest()
+        self.backend.set((tab, version, key), (body, etag), len(body))
+        return body, etag
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {'hits': self.hits, 'misses': self.misses, 'invalidations': self.invalidations,
+                     'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                     'versions': dict(self._versions)}
+        stats.update(self.backend.stats())
+        return stats
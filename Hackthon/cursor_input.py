@@ -0,0 +1,158 @@
+"""Global cursor position sources for mouse following.
+
+A cursor source emits cursorMoved whenever the global cursor position
+changes. PynputCursorSource gets OS mouse events pushed to it, so nothing
+runs while the mouse is still. AdaptivePollingSource is the fallback: it
+polls QCursor, backing off towards max_interval while the cursor is idle.
+Both can be stopped entirely when following is switched off, and both
+count their wakeups so the effect on idle CPU use can be measured.
+"""
+import logging
+import os
+import time
+
+from PySide6.QtCore import Qt, QObject, QPoint, QTimer, Signal
+from PySide6.QtGui import QCursor
+
+
+class CursorSource(QObject):
+    """Base class for cursor sources"""
+
+    cursorMoved = Signal(QPoint)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.active = False
+        self.wakeups = 0
+        self.idle_wakeups = 0
+        self._started_at = None
+
+    def start(self):
+        if not self.active:
+            self.active = True
+            self._started_at = time.monotonic()
+
+    def stop(self):
+        self.active = False
+
+    def stats(self):
+        """Wakeup counters; idle wakeups are the ones where the cursor had not moved"""
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0
+        return {
+            'source': type(self).__name__,
+            'wakeups': self.wakeups,
+            'idle_wakeups': self.idle_wakeups,
+            'wakeups_per_minute': round(self.wakeups * 60 / elapsed, 1) if elapsed else 0,
+        }
+
+
+class AdaptivePollingSource(CursorSource):
+    """Polls QCursor.pos(), doubling the interval each time the cursor hasn't moved"""
+
+    def __init__(self, min_interval=100, max_interval=2000, parent=None):
+        super().__init__(parent)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self._last_pos = None
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._poll)
+
+    def start(self):
+        super().start()
+        self.interval = self.min_interval
+        self._timer.start(self.interval)
+
+    def stop(self):
+        super().stop()
+        self._timer.stop()
+
+    def _poll(self):
+        self.wakeups += 1
+        pos = QCursor.pos()
+        if pos == self._last_pos:
+            self.idle_wakeups += 1
+            self.interval = min(self.interval * 2, self.max_interval)
+        else:
+            self._last_pos = pos
+            self.interval = self.min_interval
+            self.cursorMoved.emit(pos)
+        if self.active:
+            self._timer.start(self.interval)
+
+
+class PynputCursorSource(CursorSource):
+    """Receives mouse move events from pynput's listener thread.
+
+    The listener can fire hundreds of times a second, so at most one
+    delivery to the GUI thread is queued at a time. The event only wakes us
+    up; the position itself is read with QCursor so it is in Qt's logical
+    coordinates even on scaled displays. If no event arrives although the cursor moved (for example
+    when the OS denies input monitoring), unavailable is emitted so the
+    caller can fall back to polling.
+    """
+
+    _moved = Signal()
+    unavailable = Signal()
+
+    verify_after_ms = 3000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        from pynput import mouse  # Optional dependency, imported here so polling works without it
+        self._mouse = mouse
+        self._listener = None
+        self._delivery_pending = False
+        self._received = False
+        self._moved.connect(self._deliver, Qt.ConnectionType.QueuedConnection)
+
+    def start(self):
+        if self.active:
+            return
+        super().start()
+        self._listener = self._mouse.Listener(on_move=self._on_move)
+        self._listener.daemon = True
+        self._listener.start()
+        self._start_pos = QCursor.pos()
+        QTimer.singleShot(self.verify_after_ms, self._verify)
+
+    def stop(self):
+        super().stop()
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    def _on_move(self, x, y):
+        # Runs on the listener thread
+        if not self._delivery_pending:
+            self._delivery_pending = True
+            self._moved.emit()  # Queued to the GUI thread
+
+    def _deliver(self):
+        self._delivery_pending = False
+        if not self.active:
+            return
+        self.wakeups += 1
+        self._received = True
+        self.cursorMoved.emit(QCursor.pos())
+
+    def _verify(self):
+        if self.active and not self._received and QCursor.pos() != self._start_pos:
+            logging.warning("pynput delivered no mouse events, falling back to polling")
+            self.unavailable.emit()
+
+
+def create_cursor_source(parent=None, preferred=None):
+    """Create the best available cursor source.
+
+    preferred is 'pynput', 'poll' or None for automatic; it defaults to the
+    DESKTOP_PET_CURSOR_SOURCE environment variable.
+    """
+    preferred = preferred or os.environ.get('DESKTOP_PET_CURSOR_SOURCE', 'auto')
+    if preferred != 'poll':
+        try:
+            return PynputCursorSource(parent)
+        except Exception as e:
+            logging.info(f"pynput unavailable ({e}), polling the cursor instead")
+    return AdaptivePollingSource(parent=parent)
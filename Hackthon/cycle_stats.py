@@ -0,0 +1,186 @@
+"""Cycle statistics over period records.
+
+Records are parsed once into compact arrays of date ordinals (array('i')),
+sorted by start date. Cycle lengths, the rolling average, variance and the
+average period length are computed in one pass when the history is
+loaded, then kept up to date with integer running sums. Adding or
+deleting a record anywhere in the history only changes the cycles on
+either side of it, so an update is a bisect, an array insert or delete,
+and a rescan of the last ROLLING_WINDOW cycles.
+
+Used by both the desktop pet's PeriodDialog and the Flask app, which store
+dates as 'yyyy-MM-dd' strings and date objects respectively.
+"""
+import math
+from array import array
+from bisect import bisect_left
+from datetime import date, timedelta
+
+# Gaps outside this range are treated as missed records, not cycles
+MIN_CYCLE = 15
+MAX_CYCLE = 90
+ROLLING_WINDOW = 6
+LUTEAL_PHASE = 14   # Days from ovulation to the next period
+
+
+def to_ordinal(value):
+    """Proleptic ordinal of a date, datetime or 'yyyy-MM-dd' string"""
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10]).toordinal()
+    return value.toordinal()
+
+
+class CycleStats:
+    """Incrementally maintained statistics over a set of periods"""
+
+    def __init__(self, window=ROLLING_WINDOW):
+        self.window = window
+        self.starts = array('i')
+        self.ends = array('i')
+        self._reset()
+
+    @classmethod
+    def from_records(cls, records, window=ROLLING_WINDOW):
+        """Build from dicts or objects with start_date and end_date"""
+        stats = cls(window)
+        pairs = []
+        for record in records:
+            if isinstance(record, dict):
+                start, end = record['start_date'], record['end_date']
+            else:
+                start, end = record.start_date, record.end_date
+            try:
+                pairs.append((to_ordinal(start), to_ordinal(end)))
+            except (TypeError, ValueError):
+                continue
+        pairs.sort()
+        stats.starts = array('i', (s for s, _ in pairs))
+        stats.ends = array('i', (e for _, e in pairs))
+        stats._rebuild()
+        return stats
+
+    def _reset(self):
+        self.cycle_count = 0         # Plausible cycle lengths only
+        self.cycle_sum = 0
+        self.cycle_sumsq = 0
+        self.rolling_sum = 0
+        self.rolling_count = 0
+        self.period_total = 0
+
+    def _rebuild(self):
+        self._reset()
+        for i in range(len(self.starts)):
+            self.period_total += self.ends[i] - self.starts[i] + 1
+            if i:
+                self._count_cycle(self.starts[i] - self.starts[i - 1], 1)
+        self._update_rolling()
+
+    def _count_cycle(self, length, sign):
+        """Add (sign 1) or remove (sign -1) one gap between consecutive starts"""
+        if MIN_CYCLE <= length <= MAX_CYCLE:
+            self.cycle_count += sign
+            self.cycle_sum += sign * length
+            self.cycle_sumsq += sign * length * length
+
+    def _update_rolling(self):
+        """Sum the last `window` plausible cycles, scanning back from the latest start"""
+        total = count = 0
+        i = len(self.starts) - 1
+        while i > 0 and count < self.window:
+            length = self.starts[i] - self.starts[i - 1]
+            if MIN_CYCLE <= length <= MAX_CYCLE:
+                total += length
+                count += 1
+            i -= 1
+        self.rolling_sum, self.rolling_count = total, count
+
+    def _relink(self, i, sign):
+        """Count record i in (sign 1) or out (sign -1) of the cycles around it"""
+        starts = self.starts
+        before = starts[i - 1] if i > 0 else None
+        after = starts[i + 1] if i + 1 < len(starts) else None
+        if before is not None and after is not None:
+            self._count_cycle(after - before, -sign)
+        if before is not None:
+            self._count_cycle(starts[i] - before, sign)
+        if after is not None:
+            self._count_cycle(after - starts[i], sign)
+        self.period_total += sign * (self.ends[i] - starts[i] + 1)
+
+    # Updates
+
+    def add(self, start_date, end_date):
+        start, end = to_ordinal(start_date), to_ordinal(end_date)
+        i = len(self.starts)
+        if self.starts and start < self.starts[-1]:
+            i = bisect_left(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self._relink(i, 1)
+        self._update_rolling()
+
+    def remove(self, start_date, end_date):
+        start, end = to_ordinal(start_date), to_ordinal(end_date)
+        i = bisect_left(self.starts, start)
+        while i < len(self.starts) and self.starts[i] == start:
+            if self.ends[i] == end:
+                self._relink(i, -1)
+                del self.starts[i]
+                del self.ends[i]
+                self._update_rolling()
+                return True
+            i += 1
+        return False
+
+    # Results
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def average_cycle(self):
+        return self.cycle_sum / self.cycle_count if self.cycle_count else None
+
+    @property
+    def rolling_average(self):
+        return self.rolling_sum / self.rolling_count if self.rolling_count else None
+
+    @property
+    def variance(self):
+        n = self.cycle_count
+        if n < 2:
+            return None
+        # Exact in integers, so no drift however many updates are applied
+        return (n * self.cycle_sumsq - self.cycle_sum ** 2) / (n * (n - 1))
+
+    @property
+    def average_period(self):
+        return self.period_total / len(self.starts) if self.starts else None
+
+    def predict(self):
+        """Next period start, ovulation day and fertile window, or None without enough history"""
+        cycle = self.rolling_average
+        if cycle is None:
+            return None
+        next_start = date.fromordinal(self.starts[-1]) + timedelta(days=round(cycle))
+        ovulation = next_start - timedelta(days=LUTEAL_PHASE)
+        return {
+            'next_start': next_start,
+            'ovulation': ovulation,
+            'fertile_start': ovulation - timedelta(days=5),
+            'fertile_end': ovulation + timedelta(days=1),
+        }
+
+    def summary(self):
+        """Everything a view needs, rounded for display"""
+        variance = self.variance
+        return {
+            'records': len(self.starts),
+            'cycles': self.cycle_count,
+            'average_cycle': None if self.average_cycle is None else round(self.average_cycle, 1),
+            'rolling_average': None if self.rolling_average is None else round(self.rolling_average, 1),
+            'variance': None if variance is None else round(variance, 1),
+            'std_dev': None if variance is None else round(math.sqrt(variance), 1),
+            'average_period': None if self.average_period is None else round(self.average_period, 1),
+            'prediction': self.predict(),
+        }
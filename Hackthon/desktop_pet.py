@@ -1,37 +1,63 @@
+import time
+LAUNCH_TIME = time.perf_counter()  # Before the Qt imports, so startup timing includes them
+
 import sys
 import signal
-import json
+import socket
 import os
-import time
 import logging
-from datetime import datetime, timedelta
-from pathlib import Path
 import traceback
+import threading
 
-from PySide6.QtWidgets import (QApplication, QLabel, QWidget, QMenu, QSystemTrayIcon,
-                              QCalendarWidget, QInputDialog, QMessageBox, QDialog,
-                              QVBoxLayout, QHBoxLayout, QPushButton, QSpinBox, QLineEdit,
-                              QScrollArea, QFrame, QCheckBox, QTextEdit)
-from PySide6.QtCore import Qt, QPoint, QTimer, QDateTime, QTime, QSize, QUrl
-from PySide6.QtGui import QMovie, QMouseEvent, QCursor, QAction, QFont, QPalette, QColor
-from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
+from PySide6.QtWidgets import QApplication, QLabel, QWidget, QMenu, QDialog
+from PySide6.QtCore import Qt, QPoint, QTimer, QSize, QSocketNotifier, Signal
+from PySide6.QtGui import QMouseEvent, QCursor
 
 from ui_style import apply_light_purple_theme  # Import the UI styling
+from cursor_input import create_cursor_source, AdaptivePollingSource
+from motion import MotionEngine
+from sprite_cache import SpriteCache, SpriteAnimation, read_source_size
+from power import PowerManager, IDLE, FROZEN
+from pet_store import open_store
+from reminders import ReminderScheduler, SNOOZE_MINUTES
+import perf
+from perf import timed
+
+# 确保数据目录存在
+DATA_DIR = os.path.join(os.path.expanduser('~'), '.desktop_pet')
+if not os.path.exists(DATA_DIR):
+    os.makedirs(DATA_DIR)
 
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler(os.path.join(os.path.expanduser('~'), '.desktop_pet', 'app.log')),
+        logging.FileHandler(os.path.join(DATA_DIR, 'app.log')),
         logging.StreamHandler()
     ]
 )
 
-# 确保数据目录存在
-DATA_DIR = os.path.join(os.path.expanduser('~'), '.desktop_pet')
-if not os.path.exists(DATA_DIR):
-    os.makedirs(DATA_DIR)
+# Changes made within this window are written to disk together
+SAVE_WINDOW_MS = int(os.environ.get('DESKTOP_PET_SAVE_WINDOW_MS', 300))
+
+# Storage backend: 'json' (pet_data.json plus journal) or 'sqlite'
+STORE_BACKEND = os.environ.get('DESKTOP_PET_STORE', 'json')
+# SQLite database to use; point it at app.db to share data with the web app
+STORE_DB_PATH = os.environ.get('DESKTOP_PET_DB')
+
+# Web app to sync notes, todos and periods with, e.g. http://127.0.0.1:5000 (JSON store only)
+SYNC_URL = os.environ.get('DESKTOP_PET_SYNC_URL')
+SYNC_INTERVAL_MS = 60 * 1000
+
+# How long the pet stays happy after a reminder comes due
+REMINDER_HAPPY_MS = 5000
+
+# Frame delays are stretched this much while the user is away
+IDLE_SLOWDOWN = 4
+
+# move_speed used to be pixels per 50 ms tick; the motion engine works in pixels per second
+MOVE_SPEED_SCALE = 20
 
 def resource_path(relative_path):
     """Get absolute path to resource, works for dev and for PyInstaller"""
@@ -43,546 +69,17 @@ def resource_path(relative_path):
     
     return os.path.join(base_path, relative_path)
 
-class ScrollableDialog(QDialog):
-    def __init__(self, title, parent=None):
-        super().__init__(parent, Qt.WindowType.Window)
-        self.setWindowTitle(title)
-        self.setMinimumSize(400, 500)
-        
-        # Main layout
-        layout = QVBoxLayout(self)
-        
-        # Scrollable area
-        scroll = QScrollArea()
-        scroll.setWidgetResizable(True)
-        layout.addWidget(scroll)
-        
-        # Content widget
-        self.content_widget = QWidget()
-        self.content_layout = QVBoxLayout(self.content_widget)
-        scroll.setWidget(self.content_widget)
-
-class TodoListDialog(ScrollableDialog):
-    def __init__(self, parent=None):
-        logging.info("TodoListDialog: __init__ called")
-        try:
-            super().__init__("Todo List", parent)
-            self.parent_widget = parent
-            # List frame for todos
-            self.list_frame = QFrame()
-            self.list_layout = QVBoxLayout(self.list_frame)
-            self.content_layout.addWidget(self.list_frame)
-            # Input frame for new todo
-            input_frame = QFrame()
-            input_layout = QHBoxLayout(input_frame)
-            # Text input
-            self.text_input = QLineEdit()
-            self.text_input.setPlaceholderText("Add new todo...")
-            self.text_input.returnPressed.connect(self.add_todo)  # Add todo when Enter is pressed
-            input_layout.addWidget(self.text_input)
-            # Add button
-            add_button = QPushButton("Add")
-            add_button.clicked.connect(self.add_todo)
-            input_layout.addWidget(add_button)
-            self.content_layout.addWidget(input_frame)
-            # Load existing todos
-            self.load_todos()
-        except Exception as e:
-            logging.error(f"Exception in TodoListDialog.__init__: {e}\n{traceback.format_exc()}")
-            raise
-        logging.info("TodoListDialog: __init__ finished")
-
-    def load_todos(self):
-        todos = self.parent_widget.data.get('todos', []) if hasattr(self.parent_widget, 'data') else []
-        if not todos:
-            label = QLabel("No todos yet")
-            label.setStyleSheet("color: gray;")
-            self.list_layout.addWidget(label)
-        else:
-            for todo in todos:
-                self.add_todo_widget(todo)
-
-    def add_todo_widget(self, todo):
-        frame = QFrame()
-        layout = QHBoxLayout(frame)
-        # Checkbox
-        checkbox = QCheckBox()
-        checkbox.setChecked(todo.get('completed', False))
-        checkbox.stateChanged.connect(lambda state, t=todo: self.toggle_todo(t, state))
-        layout.addWidget(checkbox)
-        # Todo text
-        label = QLabel(todo['text'])
-        label.setWordWrap(True)
-        if todo.get('completed', False):
-            label.setStyleSheet("text-decoration: line-through; color: gray;")
-        layout.addWidget(label)
-        # Delete button
-        delete_btn = QPushButton("×")
-        delete_btn.setFixedSize(30, 30)  # Set fixed size for delete button
-        delete_btn.setStyleSheet("""
-            QPushButton {
-                color: #FF4444;
-                border: none;
-                font-size: 16px;
-                padding: 2px 8px;
-            }
-            QPushButton:hover {
-                background-color: #FFE0E0;
-                border-radius: 3px;
-            }
-        """)
-        delete_btn.clicked.connect(lambda: self.delete_todo(todo, frame))
-        layout.addWidget(delete_btn)
-        self.list_layout.addWidget(frame)
-
-    def add_todo(self):
-        text = self.text_input.text().strip()
-        if text:
-            todo = {
-                'text': text,
-                'completed': False
-            }
-            # Initialize todos list if it doesn't exist
-            if not hasattr(self.parent_widget, 'data'):
-                self.parent_widget.data = {}
-            if 'todos' not in self.parent_widget.data:
-                self.parent_widget.data['todos'] = []
-            self.parent_widget.data['todos'].append(todo)
-            self.parent_widget.save_data()
-            # Clear input
-            self.text_input.clear()
-            # Clear existing todos and reload
-            while self.list_layout.count():
-                item = self.list_layout.takeAt(0)
-                if item.widget():
-                    item.widget().deleteLater()
-            self.load_todos()
-
-    def toggle_todo(self, todo, state):
-        todo['completed'] = (state == Qt.CheckState.Checked.value)
-        self.parent_widget.save_data()
-        # Update the label style
-        frame = self.sender().parent()
-        label = frame.findChild(QLabel)
-        if label:
-            if todo['completed']:
-                label.setStyleSheet("text-decoration: line-through; color: gray;")
-            else:
-                label.setStyleSheet("")
-
-    def delete_todo(self, todo, frame):
-        if todo in self.parent_widget.data['todos']:
-            self.parent_widget.data['todos'].remove(todo)
-            self.parent_widget.save_data()
-            frame.deleteLater()
-            # Show "No todos" if list is empty
-            if not self.parent_widget.data['todos']:
-                label = QLabel("No todos yet")
-                label.setStyleSheet("color: gray;")
-                self.list_layout.addWidget(label)
-
-class NotesDialog(ScrollableDialog):
-    def __init__(self, parent=None):
-        super().__init__("Notes", parent)
-        self.parent_widget = parent
-        
-        # List frame for notes
-        self.list_frame = QFrame()
-        self.list_layout = QVBoxLayout(self.list_frame)
-        self.content_layout.addWidget(self.list_frame)
-        
-        # Input frame
-        input_frame = QFrame()
-        input_layout = QVBoxLayout(input_frame)
-        
-        self.text_edit = QTextEdit()
-        input_layout.addWidget(self.text_edit)
-        
-        save_button = QPushButton("Save Note")
-        save_button.clicked.connect(self.save_note)
-        input_layout.addWidget(save_button)
-        
-        self.content_layout.addWidget(input_frame)
-        
-        # Load existing notes
-        self.load_notes()
-    
-    def load_notes(self):
-        notes = self.parent_widget.data['notes'] if hasattr(self.parent_widget, 'data') else []
-        if not notes:
-            label = QLabel("No notes")
-            label.setStyleSheet("color: gray;")
-            label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.list_layout.addWidget(label)
-        else:
-            for note in notes:
-                self.add_note_widget(note)
-    
-    def save_note(self):
-        text = self.text_edit.toPlainText().strip()
-        if text:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            note = {"timestamp": timestamp, "text": text}
-            self.parent_widget.data['notes'].append(note)
-            self.parent_widget.save_data()
-            
-            # Clear existing notes and reload
-            while self.list_layout.count():
-                item = self.list_layout.takeAt(0)
-                if item.widget():
-                    item.widget().deleteLater()
-            
-            self.load_notes()
-            self.text_edit.clear()
-    
-    def add_note_widget(self, note):
-        frame = QFrame()
-        layout = QVBoxLayout(frame)
-        
-        timestamp_label = QLabel(note['timestamp'])
-        timestamp_label.setStyleSheet("color: gray;")
-        layout.addWidget(timestamp_label)
-        
-        text_label = QLabel(note['text'])
-        text_label.setWordWrap(True)
-        layout.addWidget(text_label)
-        
-        delete_btn = QPushButton("Delete")
-        delete_btn.clicked.connect(lambda: self.delete_note(note, frame))
-        layout.addWidget(delete_btn)
-        
-        self.list_layout.addWidget(frame)
+def animation_path(state):
+    """GIF backing an animation state: idle, happy or moving"""
+    return resource_path(f"Hackthon/{state}.gif")
 
-    def delete_note(self, note, frame):
-        if note in self.parent_widget.data['notes']:
-            self.parent_widget.data['notes'].remove(note)
-            self.parent_widget.save_data()
-            frame.deleteLater()
-            
-            # Show "No notes" if list is empty
-            if not self.parent_widget.data['notes']:
-                label = QLabel("No notes")
-                label.setStyleSheet("color: gray;")
-                label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                self.list_layout.addWidget(label)
-
-class SettingsDialog(QDialog):
-    def __init__(self, parent=None):
-        super().__init__(parent, Qt.WindowType.Window)  # 使用独立窗口
-        self.setWindowTitle('Settings')
-        layout = QVBoxLayout()
-        
-        # Mouse following setting
-        follow_layout = QHBoxLayout()
-        self.follow_checkbox = QCheckBox("Enable Mouse Following")
-        self.follow_checkbox.setChecked(parent.follow_mouse if parent else True)
-        follow_layout.addWidget(self.follow_checkbox)
-        layout.addLayout(follow_layout)
-        
-        # Speed setting
-        speed_layout = QHBoxLayout()
-        self.speed_input = QSpinBox()
-        self.speed_input.setRange(1, 20)
-        self.speed_input.setValue(parent.move_speed if parent else 5)
-        speed_layout.addWidget(QLabel("Movement Speed:"))
-        speed_layout.addWidget(self.speed_input)
-        layout.addLayout(speed_layout)
-        
-        # Size setting
-        size_layout = QHBoxLayout()
-        self.size_slider = QSpinBox()
-        self.size_slider.setRange(50, 200)  # Size range from 50% to 200%
-        self.size_slider.setValue(parent.pet_size if parent else 100)
-        self.size_slider.setSuffix("%")
-        size_layout.addWidget(QLabel("Pet Size:"))
-        size_layout.addWidget(self.size_slider)
-        layout.addLayout(size_layout)
-        
-        # Volume setting
-        volume_layout = QHBoxLayout()
-        self.volume_slider = QSpinBox()
-        self.volume_slider.setRange(0, 100)
-        self.volume_slider.setValue(int(parent.audio_output.volume() * 100) if parent else 100)
-        self.volume_slider.setSuffix("%")
-        volume_layout.addWidget(QLabel("Sound Volume:"))
-        volume_layout.addWidget(self.volume_slider)
-        layout.addLayout(volume_layout)
-        
-        # OK button
-        ok_button = QPushButton('Apply')
-        ok_button.clicked.connect(self.accept)
-        layout.addWidget(ok_button)
-        
-        self.setLayout(layout)
-
-    def accept(self):
-        if self.parent():
-            self.parent().move_speed = self.speed_input.value()
-            self.parent().follow_mouse = self.follow_checkbox.isChecked()
-            new_size = self.size_slider.value()
-            if new_size != self.parent().pet_size:
-                self.parent().pet_size = new_size
-                self.parent().update_pet_size()
-                self.parent().data['pet_size'] = self.parent().pet_size
-                self.parent().save_data()
-            # Apply volume setting
-            self.parent().audio_output.setVolume(self.volume_slider.value() / 100.0)
-        super().accept()
-
-class PeriodDialog(QDialog):
-    def __init__(self, parent=None):
-        super().__init__(parent, Qt.WindowType.Window)
-        self.parent_widget = parent
-        self.setWindowTitle("Period Tracking")
-        self.setMinimumSize(400, 500)  # Reduced overall size
-        
-        # Initialize date selection variables
-        self.start_date = None
-        self.end_date = None
-        self.is_selecting_start = True
-        
-        # Main layout
-        layout = QVBoxLayout(self)
-        layout.setSpacing(20)
-        
-        # Instructions label
-        instructions = QLabel("Click on calendar to select start date, then end date")
-        instructions.setStyleSheet("color: #6A5ACD; font-weight: bold;")
-        layout.addWidget(instructions)
-        
-        # Calendar with styling
-        self.calendar = QCalendarWidget()
-        self.calendar.setMinimumSize(300, 300)  # Reduced calendar size
-        self.calendar.setVerticalHeaderFormat(QCalendarWidget.VerticalHeaderFormat.NoVerticalHeader)  # Hide week numbers
-        self.calendar.setStyleSheet("""
-            QCalendarWidget {
-                background-color: #E6E6FA;
-                border: 1px solid #C8C8E6;
-                border-radius: 5px;
-            }
-            QCalendarWidget QToolButton {
-                color: #6A5ACD;
-                background-color: transparent;
-                border: none;
-                font-size: 14px;  /* Reduced font size */
-                font-weight: bold;
-                padding: 3px;  /* Reduced padding */
-            }
-            QCalendarWidget QToolButton:hover {
-                background-color: #D8D8F0;
-                border-radius: 3px;
-            }
-            QCalendarWidget QMenu {
-                background-color: #E6E6FA;
-                border: 1px solid #C8C8E6;
-            }
-            QCalendarWidget QSpinBox {
-                background-color: #FFFFFF;
-                border: 1px solid #C8C8E6;
-                border-radius: 3px;
-                padding: 2px;  /* Reduced padding */
-            }
-            QCalendarWidget QAbstractItemView:enabled {
-                background-color: #E6E6FA;
-                color: #323250;
-                selection-background-color: #6A5ACD;
-                selection-color: white;
-                font-size: 12px;  /* Reduced font size */
-            }
-            QCalendarWidget QAbstractItemView:disabled {
-                color: #A0A0A0;
-            }
-            /* Highlight weekends */
-            QCalendarWidget QAbstractItemView:enabled[dayOfWeek="6"],
-            QCalendarWidget QAbstractItemView:enabled[dayOfWeek="7"] {
-                color: #6A5ACD;
-                font-weight: bold;
-            }
-        """)
-        self.calendar.clicked.connect(self.handle_date_selection)
-        layout.addWidget(self.calendar)
-        
-        # Record button with styling
-        record_button = QPushButton("Record Period")
-        record_button.setStyleSheet("""
-            QPushButton {
-                background-color: #6A5ACD;
-                color: white;
-                font-size: 14px;
-                padding: 8px;  /* Reduced padding */
-                border-radius: 5px;
-            }
-            QPushButton:hover {
-                background-color: #5A4ABD;
-            }
-            QPushButton:disabled {
-                background-color: #C8C8E6;
-                color: #A0A0A0;
-            }
-        """)
-        record_button.clicked.connect(self.record_period)
-        record_button.setEnabled(False)  # Disable until both dates are selected
-        self.record_button = record_button
-        layout.addWidget(record_button)
-        
-        # Selected date range display - moved to bottom
-        self.range_label = QLabel("Selected Range: None")
-        self.range_label.setStyleSheet("color: #6A5ACD; font-weight: bold; font-size: 14px;")
-        self.range_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        layout.addWidget(self.range_label)
-        
-        # History section
-        history_label = QLabel("History:")
-        history_label.setStyleSheet("font-weight: bold; font-size: 14px;")
-        layout.addWidget(history_label)
-        
-        # Scrollable area for history
-        scroll = QScrollArea()
-        scroll.setWidgetResizable(True)
-        scroll.setStyleSheet("""
-            QScrollArea {
-                border: 1px solid #C8C8E6;
-                border-radius: 5px;
-            }
-        """)
-        layout.addWidget(scroll)
-        
-        history_widget = QWidget()
-        self.history_layout = QVBoxLayout(history_widget)
-        self.history_layout.setSpacing(10)
-        scroll.setWidget(history_widget)
-        
-        # Load history
-        self.load_history()
-    
-    def handle_date_selection(self, date):
-        if self.is_selecting_start:
-            self.start_date = date
-            self.is_selecting_start = False
-            self.range_label.setText(f"Selected Range: {date.toString('yyyy-MM-dd')} to ...")
-            self.highlight_date_range()
-        else:
-            self.end_date = date
-            if self.end_date < self.start_date:
-                # Swap dates if end date is before start date
-                self.start_date, self.end_date = self.end_date, self.start_date
-            
-            self.range_label.setText(f"Selected Range: {self.start_date.toString('yyyy-MM-dd')} to {self.end_date.toString('yyyy-MM-dd')}")
-            self.record_button.setEnabled(True)
-            self.is_selecting_start = True
-            self.highlight_date_range()
-    
-    def highlight_date_range(self):
-        if not self.start_date:
-            return
-            
-        # Reset calendar style
-        base_style = self.calendar.styleSheet()
-        self.calendar.setStyleSheet(base_style)
-        
-        # Add highlighting for the range
-        if self.end_date:
-            current_date = self.start_date
-            while current_date <= self.end_date:
-                date_str = current_date.toString("yyyy-MM-dd")
-                style = self.calendar.styleSheet()
-                style += f"""
-                    QCalendarWidget QAbstractItemView:enabled[date="{date_str}"] {{
-                        background-color: #6A5ACD;
-                        color: white;
-                    }}
-                """
-                self.calendar.setStyleSheet(style)
-                current_date = current_date.addDays(1)
-        else:
-            # Highlight only start date
-            date_str = self.start_date.toString("yyyy-MM-dd")
-            style = self.calendar.styleSheet()
-            style += f"""
-                QCalendarWidget QAbstractItemView:enabled[date="{date_str}"] {{
-                    background-color: #6A5ACD;
-                    color: white;
-                }}
-            """
-            self.calendar.setStyleSheet(style)
-    
-    def load_history(self):
-        records = self.parent_widget.data.get('period_records', [])
-        if not records:
-            label = QLabel("No records yet")
-            label.setStyleSheet("color: gray;")
-            self.history_layout.addWidget(label)
-        else:
-            # Sort records by start date
-            records.sort(key=lambda x: x['start_date'], reverse=True)
-            for record in records:
-                # Create a frame for each record
-                record_frame = QFrame()
-                record_layout = QHBoxLayout(record_frame)
-                
-                # Date label
-                label = QLabel(f"From {record['start_date']} to {record['end_date']}")
-                record_layout.addWidget(label)
-                
-                # Delete button
-                delete_btn = QPushButton("Delete")
-                delete_btn.clicked.connect(lambda checked, r=record: self.delete_record(r))
-                record_layout.addWidget(delete_btn)
-                
-                self.history_layout.addWidget(record_frame)
-    
-    def delete_record(self, record):
-        if record in self.parent_widget.data['period_records']:
-            self.parent_widget.data['period_records'].remove(record)
-            self.parent_widget.save_data()
-            
-            # Clear and reload history
-            while self.history_layout.count():
-                item = self.history_layout.takeAt(0)
-                if item.widget():
-                    item.widget().deleteLater()
-            
-            self.load_history()
-            QMessageBox.information(self, "Success", "Record deleted successfully!")
-    
-    def record_period(self):
-        if not self.start_date or not self.end_date:
-            return
-        
-        # Create new record
-        new_record = {
-            'start_date': self.start_date.toString("yyyy-MM-dd"),
-            'end_date': self.end_date.toString("yyyy-MM-dd")
-        }
-        
-        # Initialize period_records if it doesn't exist
-        if 'period_records' not in self.parent_widget.data:
-            self.parent_widget.data['period_records'] = []
-        
-        # Add the new record
-        self.parent_widget.data['period_records'].append(new_record)
-        self.parent_widget.save_data()
-        
-        # Reset selection
-        self.start_date = None
-        self.end_date = None
-        self.is_selecting_start = True
-        self.range_label.setText("Selected Range: None")
-        self.record_button.setEnabled(False)
-        
-        # Reset calendar highlighting
-        self.calendar.setStyleSheet(self.calendar.styleSheet())
-        
-        # Clear and reload history
-        while self.history_layout.count():
-            item = self.history_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-        
-        self.load_history()
-        QMessageBox.information(self, "Success", "Period recorded successfully!")
+def elapsed_since_launch():
+    """Milliseconds since the module started loading"""
+    return (time.perf_counter() - LAUNCH_TIME) * 1000
 
 class DesktopPet(QWidget):
+    syncFinished = Signal(object, object)  # request payload, response or exception
+
     def __init__(self):
         super().__init__()
         
@@ -607,61 +104,49 @@ class DesktopPet(QWidget):
         self.pet_label.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
         self.pet_label.setStyleSheet("background: transparent;")
         
-        # Initialize states and movies
-        self.current_state = 'idle'
-        self.movies = self.load_animations()
-        self.current_movie = self.movies['idle']
-        
-        # Set up the pet display
-        self.pet_label.setMovie(self.current_movie)
-        self.current_movie.start()
-        
         # Initialize movement variables
         self.dragging = False
         self.offset = QPoint()
-        self.target_pos = None
-        self.move_timer = QTimer(self)
-        self.move_timer.timeout.connect(self.move_to_target)
+        self.motion = MotionEngine(self, parent=self)
+        self.motion.arrived.connect(self.on_target_reached)
         self.move_speed = 5
         self.follow_mouse = True  # Add mouse following state
         self.pet_size = 100  # Default size is 100%
-        
-        # Initialize data storage
-        self.data_file = os.path.join(DATA_DIR, 'pet_data.json')
-        self.load_data()
+        self.volume = 1.0
+        
+        # Subsystems below are set up in stages once the first frame is on screen
+        self.ready = False
+        self.store = None
+        self.cursor_source = None
+        self.move_sound = None
+        self.sync_client = None
+        self.syncing = False
+        self.reminders = None
+        self.lag_monitor = None
+        self.perf_overlay = None
+        self.startup_times = {}
+        
+        # Initialize states; only a cached still of the idle animation is loaded now
+        self.current_state = 'idle'
+        # Only the playing animation is held outside the cache, so its byte budget bounds them all
+        self.sprite_cache = SpriteCache(os.path.join(DATA_DIR, 'sprite_cache'))
+        self.animation = SpriteAnimation(self.pet_label, parent=self)
+        thumbnail = self.sprite_cache.load_thumbnail()
+        if thumbnail is not None:
+            self.pet_label.setPixmap(thumbnail)
+            self.pet_label.setFixedSize(thumbnail.size())
         
         # Store dialog instances
         self.settings_dialog = None
         self.todo_dialog = None
         self.notes_dialog = None
         self.period_dialog = None
+        self.reminders_dialog = None
         
-        # Set up global mouse tracking
-        self.global_timer = QTimer(self)
-        self.global_timer.timeout.connect(self.check_global_mouse)
-        self.global_timer.start(100)  # Check every 100ms
-        
-        # Initialize media player for sound effects
-        self.media_player = QMediaPlayer()
-        self.audio_output = QAudioOutput()
-        self.media_player.setAudioOutput(self.audio_output)
-        self.audio_output.setVolume(1.0)  # Set volume to 100%
-        
-        # Load the sound file with absolute path and error handling
-        sound_path = resource_path("Hackthon/oiia-oiia-sound.mp3")
-        logging.info(f"Loading sound file from: {sound_path}")
-        
-        if not os.path.exists(sound_path):
-            logging.error(f"Sound file not found at: {sound_path}")
-        else:
-            logging.info("Sound file exists, attempting to load...")
-            self.media_player.setSource(QUrl.fromLocalFile(sound_path))
-            # Stop any auto-play
-            self.media_player.stop()
-            
-        # Connect error handler and media status handler for looping
-        self.media_player.errorOccurred.connect(self.handle_media_error)
-        self.media_player.mediaStatusChanged.connect(self.handle_media_status)
+        # Slow down or freeze when hidden, idle, locked or behind a modal dialog
+        self.power = PowerManager(parent=self)
+        self.power.stateChanged.connect(self.apply_power_state)
+        QApplication.instance().applicationStateChanged.connect(self.handle_application_state)
         
         # Apply additional styling specific to the pet window
         self.setStyleSheet("""
@@ -679,65 +164,188 @@ class DesktopPet(QWidget):
         self.raise_()
         self.activateWindow()
         
-        # Apply initial size
-        self.update_pet_size()
+        # In case no paint event arrives (e.g. the window starts off screen)
+        QTimer.singleShot(1000, self.finish_startup)
+    
+    def paintEvent(self, event):
+        """Start the deferred startup stages once the first frame has been painted"""
+        super().paintEvent(event)
+        if 'first_paint' not in self.startup_times:
+            self.startup_times['first_paint'] = elapsed_since_launch()
+            QTimer.singleShot(0, self.finish_startup)
+    
+    def finish_startup(self):
+        """Second stage: everything needed to interact with the pet"""
+        if self.ready:
+            return
+        # Initialize data storage first, animations are decoded at the saved size
+        self.load_data()
+        
+        # Set up global mouse tracking, pushed by OS events when possible
+        self.cursor_source = create_cursor_source(self)
+        self.cursor_source.cursorMoved.connect(self.check_global_mouse)
+        if hasattr(self.cursor_source, 'unavailable'):
+            self.cursor_source.unavailable.connect(self.fall_back_to_polling)
+        
+        self.ready = True
+        self.startup_times['interactive'] = elapsed_since_launch()
+        self.apply_power_state(self.power.state)
+        # The thumbnail stays up until the idle animation arrives in play_sprite, decoded off the GUI thread
+        self.show_state()
+        QTimer.singleShot(0, self.finish_loading)
+    
+    def finish_loading(self):
+        """Last stage: sound and, when enabled, the lag monitor"""
+        self.init_multimedia()
+        if perf.ENABLED:
+            from perf_overlay import LagMonitor
+            self.lag_monitor = LagMonitor(parent=self)
+    
+    def init_multimedia(self):
+        """Set up the movement sound"""
+        from sound import LoopingSound  # Imported late so QtMultimedia doesn't slow startup
+        sound_path = resource_path("Hackthon/oiia-oiia-sound.mp3")
+        logging.info(f"Loading sound file from: {sound_path}")
+        self.move_sound = LoopingSound(sound_path, os.path.join(DATA_DIR, 'sound_cache'), parent=self)
+        self.move_sound.set_volume(self.volume)
+    
+    def play_move_sound(self):
+        """Start the movement sound from the beginning"""
+        if self.move_sound:
+            self.move_sound.play()
+    
+    def stop_move_sound(self):
+        if self.move_sound:
+            self.move_sound.stop()
+    
+    def set_volume(self, volume):
+        """Set the sound volume, from 0.0 to 1.0"""
+        self.volume = volume
+        if self.move_sound:
+            self.move_sound.set_volume(volume)
     
     def update_pet_size(self):
         """Update the pet's size based on the size setting"""
-        if not self.current_movie:
+        self.show_state(keep_frame=True)
+    
+    def show_state(self, keep_frame=False):
+        """Play the current state's animation at the current size.
+
+        The sprite cache calls back right away when it has the frames, and
+        otherwise once they are read or decoded on a pool thread.
+        """
+        state, size = self.current_state, self.scaled_size()
+        self.sprite_cache.request([animation_path(state)], size, lambda sprites: self.play_sprite(
+            state, size, sprites[animation_path(state)], keep_frame))
+    
+    @timed(name='pet.play_sprite')
+    def play_sprite(self, state, size, sprite, keep_frame):
+        """Show a requested animation, unless the state or size changed while it loaded"""
+        if state != self.current_state or size != self.scaled_size():
             return
-            
-        # Get the original size of the current frame
-        original_size = self.current_movie.currentPixmap().size()
-        
-        # Calculate new size based on percentage
-        new_width = int(original_size.width() * self.pet_size / 100)
-        new_height = int(original_size.height() * self.pet_size / 100)
-        
-        # Set the new size for all movies
-        for movie in self.movies.values():
-            movie.setScaledSize(QSize(new_width, new_height))
+        self.animation.play(sprite, keep_frame=keep_frame)
+        if state == 'idle':
+            self.sprite_cache.save_thumbnail(sprite)
         
         # Set the new size for the label
-        self.pet_label.setFixedSize(new_width, new_height)
-        self.adjustSize()
+        if self.pet_label.size() != size:
+            self.pet_label.setFixedSize(size)
+            self.adjustSize()
+        
+        if self.ready and self.reminders is None:
+            # Started once the pet is animated; overdue reminders fire right away
+            self.reminders = ReminderScheduler(self.store, parent=self)
+            self.reminders.remindersDue.connect(self.show_due_reminders)
+            self.reminders.load()
+            self.startup_times['loaded'] = elapsed_since_launch()
+            logging.info("Startup timing: " + ", ".join(
+                f"{stage} {ms:.0f} ms" for stage, ms in self.startup_times.items()))
+
+    def scaled_size(self):
+        """Size of the pet at the current pet_size, based on the idle animation"""
+        original_size = read_source_size(animation_path('idle'))
+        return QSize(int(original_size.width() * self.pet_size / 100),
+                     int(original_size.height() * self.pet_size / 100))
 
-    def load_animations(self):
-        """Load all animation states"""
-        movies = {}
-        for state in ['idle', 'happy', 'moving']:
-            movie = QMovie(resource_path(f"Hackthon/{state}.gif"))
-            if movie.isValid():
-                movies[state] = movie
-            else:
-                # Create an empty movie as fallback
-                movies[state] = QMovie()
-        return movies
-    
     def load_data(self):
-        """Load saved data"""
-        if os.path.exists(self.data_file):
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
-                # Load saved size
-                self.pet_size = self.data.get('pet_size', 100)
-        else:
-            self.data = {
-                'notes': [],
-                'period_records': [],
-                'todos': [],
-                'pet_size': 100
-            }
+        """Load saved data, replaying any journaled changes"""
+        self.store = open_store(DATA_DIR, STORE_BACKEND, flush_interval=SAVE_WINDOW_MS / 1000,
+                                db_path=STORE_DB_PATH)
+        # Load saved size
+        self.pet_size = self.store.get_setting('pet_size', 100)
+        if SYNC_URL and STORE_BACKEND == 'json':
+            from sync import SyncClient
+            self.sync_client = SyncClient(self.store, SYNC_URL)
+            self.syncFinished.connect(self.finish_sync)
+            self.sync_timer = QTimer(self)
+            self.sync_timer.timeout.connect(self.start_sync)
+            self.sync_timer.start(SYNC_INTERVAL_MS)
+            QTimer.singleShot(0, self.start_sync)
+    
+    def start_sync(self):
+        """Push local changes and pull the server's; the request runs off the GUI thread"""
+        if self.syncing:
+            return
+        self.syncing = True
+        payload = self.sync_client.prepare()
+        
+        def run():
+            try:
+                result = self.sync_client.exchange(payload)
+            except Exception as e:
+                result = e
+            self.syncFinished.emit(payload, result)  # Delivered on the GUI thread
+        
+        threading.Thread(target=run, name='pet-sync', daemon=True).start()
     
+    def finish_sync(self, payload, result):
+        self.syncing = False
+        if isinstance(result, Exception):
+            logging.warning(f"Sync with {SYNC_URL} failed: {result}")
+            return
+        pulled = self.sync_client.apply(payload, result)
+        if pulled:
+            logging.info(f"Sync pulled {pulled} changes")
+            # Every open list shows the pulled records, keeping its search
+            for dialog in (self.todo_dialog, self.notes_dialog):
+                if dialog:
+                    dialog.reload()
+            if self.period_dialog:
+                self.period_dialog.reload()
+        if result['more'] or payload['more']:
+            self.start_sync()
+    
+    def show_due_reminders(self, reminders):
+        """Cheer up and show what came due, with the option to snooze it"""
+        logging.info(f"{len(reminders)} reminders due")
+        if not self.dragging:
+            self.change_state('happy')
+            QTimer.singleShot(REMINDER_HAPPY_MS, self.end_reminder_cheer)
+        from dialogs import ReminderNotice
+        notice = ReminderNotice(reminders, SNOOZE_MINUTES, self)
+        notice.buttonClicked.connect(
+            lambda button: button is notice.snooze_button and self.reminders.snooze(notice.reminders))
+        notice.show()
+        if self.reminders_dialog:
+            self.reminders_dialog.load_reminders()
+    
+    def end_reminder_cheer(self):
+        if self.current_state == 'happy' and not self.dragging:
+            self.change_state('idle')
+    
+    @timed(name='pet.save_data')
     def save_data(self):
-        """Save data to file"""
-        with open(self.data_file, 'w') as f:
-            json.dump(self.data, f)
+        """Write pending changes now instead of waiting for the save window"""
+        self.store.flush()
     
     def mousePressEvent(self, event: QMouseEvent):
         """Handle mouse press events"""
+        if not self.ready:
+            return
+        self.power.note_activity()
         if event.button() == Qt.MouseButton.LeftButton:
             self.dragging = True
+            self.motion.stop()
             self.offset = event.position().toPoint()
             self.change_state('happy')
     
@@ -753,24 +361,44 @@ class DesktopPet(QWidget):
             self.dragging = False
             self.change_state('idle')
     
+    @timed(name='pet.change_state')
     def change_state(self, new_state):
         """Change the pet's state and animation"""
-        if new_state != self.current_state and new_state in self.movies:
+        if new_state != self.current_state:
             old_state = self.current_state
             self.current_state = new_state
-            self.pet_label.setMovie(self.movies[new_state])
-            self.movies[new_state].start()
+            self.show_state()
             
             # Stop sound if we're changing from moving to any other state
             if old_state == 'moving' and new_state != 'moving':
-                self.media_player.stop()
+                self.stop_move_sound()
+    
+    def set_follow_mouse(self, enabled):
+        """Turn mouse following on or off; when off, cursor tracking stops entirely"""
+        self.follow_mouse = enabled
+        if enabled:
+            self.cursor_source.start()
+        else:
+            self.cursor_source.stop()
+    
+    def fall_back_to_polling(self):
+        """Replace a cursor source that is not delivering events with adaptive polling"""
+        self.cursor_source.stop()
+        self.cursor_source.deleteLater()
+        self.cursor_source = AdaptivePollingSource(parent=self)
+        self.cursor_source.cursorMoved.connect(self.check_global_mouse)
+        if self.follow_mouse:
+            self.cursor_source.start()
     
-    def check_global_mouse(self):
-        """Check global mouse position and handle following behavior"""
+    @timed(name='pet.check_global_mouse')
+    def check_global_mouse(self, cursor_pos=None):
+        """Handle a new global mouse position and the following behavior"""
+        self.power.note_activity()
         if self.dragging or not self.follow_mouse:  # Check if following is enabled
             return
             
-        cursor_pos = QCursor.pos()
+        if cursor_pos is None:
+            cursor_pos = QCursor.pos()
         
         # Calculate target position (center pet on cursor)
         target_x = cursor_pos.x() - self.width() // 2
@@ -783,51 +411,70 @@ class DesktopPet(QWidget):
         distance = (dx * dx + dy * dy) ** 0.5
         
         if distance > 100:  # Only follow if cursor is more than 100 pixels away
-            self.target_pos = QPoint(target_x, target_y)
+            target_pos = QPoint(target_x, target_y)
             # Only start playing sound if we're transitioning to moving state
             if self.current_state != 'moving':
                 self.change_state('moving')
                 # Start playing sound when movement begins
-                self.media_player.setPosition(0)  # Reset to start of sound
-                self.media_player.play()
+                self.play_move_sound()
             
-            if not self.move_timer.isActive():
-                self.move_timer.start(50)
+            self.move_to_target(target_pos)
+        elif self.motion.is_moving():
+            # Close enough to stop following, but finish the approach to where the cursor is now
+            self.move_to_target(QPoint(target_x, target_y))
         else:
             # If we're not moving anymore, change state back to idle
             if self.current_state == 'moving':
                 self.change_state('idle')
                 # Stop sound when movement stops
-                self.media_player.stop()
+                self.stop_move_sound()
     
-    def move_to_target(self):
-        """Move pet towards target position"""
-        if not self.target_pos:
-            return
-        
-        current_pos = self.pos()
-        dx = self.target_pos.x() - current_pos.x()
-        dy = self.target_pos.y() - current_pos.y()
-        distance = (dx * dx + dy * dy) ** 0.5
-        
-        if distance <= self.move_speed:
-            # Reached target
-            self.move(self.target_pos.x(), self.target_pos.y())
-            self.target_pos = None
-            self.move_timer.stop()
+    @timed(name='pet.move_to_target')
+    def move_to_target(self, target_pos):
+        """Move pet towards target position, steering the running motion if there is one"""
+        self.motion.set_target(target_pos, speed=self.move_speed * MOVE_SPEED_SCALE)
+    
+    def on_target_reached(self):
+        """Go back to idle once the pet has caught up with the cursor"""
+        self.change_state('idle')
+    
+    def apply_power_state(self, state):
+        """Scale animation and cursor tracking back to match the power state"""
+        if not self.ready:
+            return  # finish_startup applies the state once everything exists
+        if state == FROZEN:
+            # Settle into idle first so the moving sound stops too
+            self.motion.stop()
             self.change_state('idle')
+            self.animation.pause()
+            self.cursor_source.stop()
         else:
-            # Move towards target
-            ratio = self.move_speed / distance
-            new_x = current_pos.x() + int(dx * ratio)
-            new_y = current_pos.y() + int(dy * ratio)
-            self.move(new_x, new_y)
+            self.animation.set_slowdown(IDLE_SLOWDOWN if state == IDLE else 1)
+            self.animation.resume()
+            if self.follow_mouse:
+                self.cursor_source.start()
+    
+    def handle_application_state(self, state):
+        """Treat a hidden or suspended application like a hidden pet"""
+        hidden = state in (Qt.ApplicationState.ApplicationHidden, Qt.ApplicationState.ApplicationSuspended)
+        self.power.set_frozen('app_hidden', hidden)
+    
+    def showEvent(self, event):
+        self.power.set_frozen('hidden', False)
+        super().showEvent(event)
+    
+    def hideEvent(self, event):
+        self.power.set_frozen('hidden', True)
+        super().hideEvent(event)
     
     def closeEvent(self, event):
         """Clean up when closing"""
-        self.global_timer.stop()
-        self.move_timer.stop()
-        self.save_data()
+        if self.cursor_source:
+            self.cursor_source.stop()
+        self.motion.stop()
+        self.sprite_cache.stop()
+        if self.store:
+            self.save_data()
         super().closeEvent(event)
 
     def cleanup(self):
@@ -840,17 +487,32 @@ class DesktopPet(QWidget):
             self.notes_dialog.close()
         if hasattr(self, 'period_dialog') and self.period_dialog:
             self.period_dialog.close()
-        
-        # Stop and release media player
-        self.media_player.stop()
-        self.media_player.setSource(QUrl())
-        self.global_timer.stop()
-        self.move_timer.stop()
-        self.save_data()
+        if self.reminders_dialog:
+            self.reminders_dialog.close()
+        if self.perf_overlay:
+            self.perf_overlay.close()
+        if self.reminders:
+            self.reminders.stop()
+            logging.info(f"Reminders fired: {self.reminders.fired}")
+        
+        if self.move_sound:
+            self.move_sound.stop()
+            logging.info(f"Sound stats: {self.move_sound.stats()}")
+        if self.cursor_source:
+            self.cursor_source.stop()
+            logging.info(f"Cursor source stats: {self.cursor_source.stats()}")
+        self.power.report()
+        if perf.ENABLED:
+            self.dump_perf()
+        self.motion.stop()
+        if self.store:
+            self.store.close()
         QApplication.quit()
 
     def contextMenuEvent(self, event):
         """Handle right-click menu"""
+        if not self.ready:
+            return
         menu = QMenu(self)
         
         # Notes
@@ -862,26 +524,44 @@ class DesktopPet(QWidget):
         # Todo List
         menu.addAction("Todo List", self.show_todo_list)
         
+        # Reminders
+        if self.reminders:
+            menu.addAction("Reminders", self.show_reminders_dialog)
+        
         # Settings
         menu.addAction("Settings", self.show_settings)
         
+        # Timings, only while DESKTOP_PET_PERF recording is on
+        if perf.ENABLED:
+            menu.addSeparator()
+            overlay = menu.addAction("Performance Overlay", self.toggle_perf_overlay)
+            overlay.setCheckable(True)
+            overlay.setChecked(bool(self.perf_overlay and self.perf_overlay.isVisible()))
+            menu.addAction("Dump Performance Data", self.dump_perf)
+        
         # Exit option
         menu.addSeparator()
         menu.addAction("Exit", self.cleanup)
         
-        menu.exec(event.globalPos())
+        with self.power.frozen_while('menu'):
+            menu.exec(event.globalPos())
 
     def show_todo_list(self):
         """Show todo list dialog"""
         logging.info("show_todo_list called")
+        from dialogs import TodoListDialog  # Dialogs are imported on first use
         try:
-            dialog = TodoListDialog(self)
-            dialog.exec()  # Show modally for testing
+            self.todo_dialog = TodoListDialog(self)
+            with self.power.frozen_while('dialog'):
+                self.todo_dialog.exec()  # Show modally for testing
         except Exception as e:
             logging.error(f"Exception in show_todo_list: {e}\n{traceback.format_exc()}")
+        finally:
+            self.todo_dialog = None
 
     def show_notes(self):
         if not self.notes_dialog:
+            from dialogs import NotesDialog
             self.notes_dialog = NotesDialog(self)
         self.notes_dialog.show()
         self.notes_dialog.raise_()
@@ -889,40 +569,80 @@ class DesktopPet(QWidget):
     def show_period_dialog(self):
         """Show period tracking dialog"""
         if not self.period_dialog:
+            from dialogs import PeriodDialog
             self.period_dialog = PeriodDialog(self)
         self.period_dialog.show()
         self.period_dialog.raise_()
 
+    def show_reminders_dialog(self):
+        """Show upcoming reminders"""
+        if not self.reminders_dialog:
+            from dialogs import RemindersDialog
+            self.reminders_dialog = RemindersDialog(self)
+        self.reminders_dialog.load_reminders()
+        self.reminders_dialog.show()
+        self.reminders_dialog.raise_()
+
+    def toggle_perf_overlay(self):
+        """Show or hide the timings panel next to the pet"""
+        if not self.perf_overlay:
+            from perf_overlay import PerfOverlay
+            self.perf_overlay = PerfOverlay()
+        if self.perf_overlay.isVisible():
+            self.perf_overlay.hide()
+        else:
+            self.perf_overlay.move(self.frameGeometry().topRight())
+            self.perf_overlay.show()
+
+    def dump_perf(self):
+        """Write the timings as JSON and as a Chrome trace to the data directory"""
+        try:
+            paths = perf.recorder.dump(DATA_DIR)
+            logging.info(f"Performance data written to {', '.join(paths)}")
+        except OSError as e:
+            logging.error(f"Failed to write performance data: {e}")
+
     def show_settings(self):
         """Show settings dialog"""
         if not self.settings_dialog:
+            from dialogs import SettingsDialog
             self.settings_dialog = SettingsDialog(self)
-        if self.settings_dialog.exec() == QDialog.DialogCode.Accepted:
+        with self.power.frozen_while('dialog'):
+            result = self.settings_dialog.exec()
+        if result == QDialog.DialogCode.Accepted:
             self.move_speed = self.settings_dialog.speed_input.value()
-            self.follow_mouse = self.settings_dialog.follow_checkbox.isChecked()
+            self.set_follow_mouse(self.settings_dialog.follow_checkbox.isChecked())
             new_size = self.settings_dialog.size_slider.value()
             if new_size != self.pet_size:
                 self.pet_size = new_size
                 self.update_pet_size()
                 # Save size to data
-                self.data['pet_size'] = self.pet_size
-                self.save_data()
+                self.store.set('pet_size', self.pet_size)
 
-    def handle_media_status(self, status):
-        """Handle media status changes for looping"""
-        # When the media reaches the end, if we're still in moving state, loop it
-        if status == QMediaPlayer.MediaStatus.EndOfMedia and self.current_state == 'moving':
-            self.media_player.setPosition(0)  # Reset to start
-            self.media_player.play()  # Play again
+def install_signal_wakeup(app):
+    """Let Python signal handlers run as soon as a signal arrives.
 
-    def handle_media_error(self, error, error_string):
-        """Handle media player errors"""
-        logging.error(f"Media player error {error}: {error_string}")
+    Qt's event loop doesn't return to Python on its own, so the signal is
+    written to a socket that a QSocketNotifier watches. This replaces a
+    timer waking the process several times a second just in case.
+    """
+    read_sock, write_sock = socket.socketpair()
+    read_sock.setblocking(False)
+    write_sock.setblocking(False)
+    signal.set_wakeup_fd(write_sock.fileno())
+    notifier = QSocketNotifier(read_sock.fileno(), QSocketNotifier.Type.Read, app)
+    notifier.activated.connect(lambda: read_sock.recv(64))
+    return read_sock, write_sock, notifier
 
 def signal_handler(signum, frame):
     """Handle interrupt signals"""
     if 'pet' in globals():
-        pet.cleanup()
+        try:
+            pet.cleanup()
+        finally:
+            # Never lose queued writes, even if closing the UI failed
+            if pet.store:
+                pet.store.close()
     sys.exit(0)
 
 if __name__ == '__main__':
@@ -949,8 +669,6 @@ if __name__ == '__main__':
     pet = DesktopPet()
     
     # Allow clean shutdown on Ctrl+C
-    timer = QTimer()
-    timer.timeout.connect(lambda: None)  # Let Python process signals
-    timer.start(200)
+    signal_wakeup = install_signal_wakeup(app)
     
     sys.exit(app.exec()) 
\ No newline at end of file
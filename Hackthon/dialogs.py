@@ -0,0 +1,642 @@
+"""Dialogs opened from the pet's context menu.
+
+Kept out of desktop_pet.py so they are only imported the first time one is
+opened, which keeps them off the startup path.
+"""
+import logging
+import traceback
+from collections import Counter
+from datetime import datetime
+
+from PySide6.QtWidgets import (QLabel, QWidget, QMessageBox, QDialog, QCalendarWidget,
+                              QVBoxLayout, QHBoxLayout, QPushButton, QSpinBox, QLineEdit,
+                              QScrollArea, QFrame, QCheckBox, QTextEdit, QListView,
+                              QAbstractItemView, QListWidget, QListWidgetItem, QComboBox,
+                              QDateTimeEdit)
+from PySide6.QtCore import Qt, QDate, QDateTime, QTimer
+from PySide6.QtGui import QColor, QTextCharFormat
+
+from bulk_io import NOTE_MAX_LENGTH
+from record_models import RecordListModel, TodoDelegate, NoteDelegate
+from cycle_stats import CycleStats
+from pet_store import period_position
+from perf import timed
+
+class ListDialog(QDialog):
+    """Dialog showing one collection of the store in a virtualized list view"""
+    def __init__(self, title, collection, delegate, empty_text, parent=None):
+        super().__init__(parent, Qt.WindowType.Window)
+        self.setWindowTitle(title)
+        self.setMinimumSize(400, 500)
+        self.parent_widget = parent
+        
+        self.empty_text = empty_text
+        
+        # Main layout
+        self.content_layout = QVBoxLayout(self)
+        
+        # Search box; the query runs once typing pauses
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search...")
+        self.search_input.setClearButtonEnabled(True)
+        self.content_layout.addWidget(self.search_input)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.run_search)
+        self.search_input.textChanged.connect(self.search_timer.start)
+        
+        # List view, only visible rows are painted
+        self.model = RecordListModel(parent.store, collection, parent=self)
+        self.list_view = QListView()
+        self.list_view.setModel(self.model)
+        self.list_view.setItemDelegate(delegate)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.list_view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.list_view.setMouseTracking(True)  # Hover highlight on the delete button
+        self.content_layout.addWidget(self.list_view)
+        
+        # Placeholder shown instead of the list when it is empty
+        self.empty_label = QLabel(empty_text)
+        self.empty_label.setStyleSheet("color: gray;")
+        self.empty_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.content_layout.addWidget(self.empty_label)
+        
+        self.model.modelReset.connect(self.update_placeholder)
+        self.model.rowsInserted.connect(self.update_placeholder)
+        self.model.rowsRemoved.connect(self.update_placeholder)
+        self.update_placeholder()
+    
+    def run_search(self):
+        self.model.set_query(self.search_input.text())
+    
+    def reload(self):
+        """Fetch the list again after records changed elsewhere, e.g. by a sync"""
+        self.search_timer.stop()
+        self.run_search()
+    
+    def clear_search(self):
+        """Show the whole list again, e.g. before adding a record"""
+        self.search_timer.stop()
+        self.search_input.blockSignals(True)
+        self.search_input.clear()
+        self.search_input.blockSignals(False)
+        if self.model.query:
+            self.model.set_query('')
+    
+    def update_placeholder(self):
+        empty = self.model.total() == 0
+        self.empty_label.setText("No matches" if self.model.query else self.empty_text)
+        self.empty_label.setVisible(empty)
+        self.list_view.setVisible(not empty)
+
+class TodoListDialog(ListDialog):
+    def __init__(self, parent=None):
+        logging.info("TodoListDialog: __init__ called")
+        try:
+            delegate = TodoDelegate()
+            super().__init__("Todo List", 'todos', delegate, "No todos yet", parent)
+            delegate.setParent(self)
+            delegate.deleteRequested.connect(self.delete_todo)
+            # Input frame for new todo
+            input_frame = QFrame()
+            input_layout = QHBoxLayout(input_frame)
+            # Text input
+            self.text_input = QLineEdit()
+            self.text_input.setPlaceholderText("Add new todo...")
+            self.text_input.returnPressed.connect(self.add_todo)  # Add todo when Enter is pressed
+            input_layout.addWidget(self.text_input)
+            # Add button
+            add_button = QPushButton("Add")
+            add_button.clicked.connect(self.add_todo)
+            input_layout.addWidget(add_button)
+            self.content_layout.addWidget(input_frame)
+            # Load existing todos
+            self.load_todos()
+        except Exception as e:
+            logging.error(f"Exception in TodoListDialog.__init__: {e}\n{traceback.format_exc()}")
+            raise
+        logging.info("TodoListDialog: __init__ finished")
+
+    @timed(name='dialog.load_todos')
+    def load_todos(self):
+        # The view pulls pages from the model as it scrolls
+        self.model.reload()
+
+    def add_todo(self):
+        text = self.text_input.text().strip()
+        if text:
+            todo = {
+                'text': text,
+                'completed': False
+            }
+            self.clear_search()
+            self.model.append_record(todo)
+            # Clear input
+            self.text_input.clear()
+            self.list_view.scrollToBottom()
+
+    def delete_todo(self, row):
+        self.model.remove_row(row)
+
+class NotesDialog(ListDialog):
+    def __init__(self, parent=None):
+        delegate = NoteDelegate()
+        super().__init__("Notes", 'notes', delegate, "No notes", parent)
+        delegate.setParent(self)
+        delegate.deleteRequested.connect(self.delete_note)
+        
+        # Input frame
+        input_frame = QFrame()
+        input_layout = QVBoxLayout(input_frame)
+        
+        self.text_edit = QTextEdit()
+        self.text_edit.setMaximumHeight(120)
+        input_layout.addWidget(self.text_edit)
+        
+        save_button = QPushButton("Save Note")
+        save_button.clicked.connect(self.save_note)
+        input_layout.addWidget(save_button)
+        
+        self.content_layout.addWidget(input_frame)
+        
+        # Load existing notes
+        self.load_notes()
+    
+    @timed(name='dialog.load_notes')
+    def load_notes(self):
+        # The view pulls pages from the model as it scrolls
+        self.model.reload()
+    
+    def save_note(self):
+        text = self.text_edit.toPlainText().strip()
+        if len(text) > NOTE_MAX_LENGTH:
+            QMessageBox.warning(self, "Note too long",
+                                f"Notes can be at most {NOTE_MAX_LENGTH} characters; this one has {len(text)}.")
+            return
+        if text:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            note = {"timestamp": timestamp, "text": text}
+            self.clear_search()
+            self.model.append_record(note)
+            self.text_edit.clear()
+            self.list_view.scrollToBottom()
+
+    def delete_note(self, row):
+        self.model.remove_row(row)
+
+class SettingsDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent, Qt.WindowType.Window)  # 使用独立窗口
+        self.setWindowTitle('Settings')
+        layout = QVBoxLayout()
+        
+        # Mouse following setting
+        follow_layout = QHBoxLayout()
+        self.follow_checkbox = QCheckBox("Enable Mouse Following")
+        self.follow_checkbox.setChecked(parent.follow_mouse if parent else True)
+        follow_layout.addWidget(self.follow_checkbox)
+        layout.addLayout(follow_layout)
+        
+        # Speed setting
+        speed_layout = QHBoxLayout()
+        self.speed_input = QSpinBox()
+        self.speed_input.setRange(1, 20)
+        self.speed_input.setValue(parent.move_speed if parent else 5)
+        speed_layout.addWidget(QLabel("Movement Speed:"))
+        speed_layout.addWidget(self.speed_input)
+        layout.addLayout(speed_layout)
+        
+        # Size setting
+        size_layout = QHBoxLayout()
+        self.size_slider = QSpinBox()
+        self.size_slider.setRange(50, 200)  # Size range from 50% to 200%
+        self.size_slider.setValue(parent.pet_size if parent else 100)
+        self.size_slider.setSuffix("%")
+        size_layout.addWidget(QLabel("Pet Size:"))
+        size_layout.addWidget(self.size_slider)
+        layout.addLayout(size_layout)
+        
+        # Volume setting
+        volume_layout = QHBoxLayout()
+        self.volume_slider = QSpinBox()
+        self.volume_slider.setRange(0, 100)
+        self.volume_slider.setValue(int(parent.volume * 100) if parent else 100)
+        self.volume_slider.setSuffix("%")
+        volume_layout.addWidget(QLabel("Sound Volume:"))
+        volume_layout.addWidget(self.volume_slider)
+        layout.addLayout(volume_layout)
+        
+        # OK button
+        ok_button = QPushButton('Apply')
+        ok_button.clicked.connect(self.accept)
+        layout.addWidget(ok_button)
+        
+        self.setLayout(layout)
+
+    def accept(self):
+        if self.parent():
+            self.parent().move_speed = self.speed_input.value()
+            self.parent().set_follow_mouse(self.follow_checkbox.isChecked())
+            new_size = self.size_slider.value()
+            if new_size != self.parent().pet_size:
+                self.parent().pet_size = new_size
+                self.parent().update_pet_size()
+                self.parent().store.set('pet_size', self.parent().pet_size)
+            # Apply volume setting
+            self.parent().set_volume(self.volume_slider.value() / 100.0)
+        super().accept()
+
+def date_format(background, foreground):
+    """Text format for a highlighted calendar day"""
+    fmt = QTextCharFormat()
+    fmt.setBackground(QColor(background))
+    fmt.setForeground(QColor(foreground))
+    return fmt
+
+def julian_day(text):
+    """Julian day of a yyyy-MM-dd string, or None if it isn't a valid date"""
+    date = QDate.fromString(text, "yyyy-MM-dd")
+    return date.toJulianDay() if date.isValid() else None
+
+class PeriodDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent, Qt.WindowType.Window)
+        self.parent_widget = parent
+        self.setWindowTitle("Period Tracking")
+        self.setMinimumSize(400, 500)  # Reduced overall size
+        
+        # Initialize date selection variables
+        self.start_date = None
+        self.end_date = None
+        self.is_selecting_start = True
+        
+        # Highlighted days as Julian day numbers, counting overlapping periods, and the format applied to each
+        self.recorded_days = Counter()
+        self.day_formats = {}
+        self.stats = None  # CycleStats, built from the first load and then kept up to date
+        self.history = []  # Records shown in the history, newest first, and their rows
+        self.history_rows = []
+        self.formats = {
+            'recorded': date_format("#C8B8F0", "#323250"),
+            'selected': date_format("#6A5ACD", "white"),
+        }
+        
+        # Main layout
+        layout = QVBoxLayout(self)
+        layout.setSpacing(20)
+        
+        # Instructions label
+        instructions = QLabel("Click on calendar to select start date, then end date")
+        instructions.setStyleSheet("color: #6A5ACD; font-weight: bold;")
+        layout.addWidget(instructions)
+        
+        # Calendar with styling
+        self.calendar = QCalendarWidget()
+        self.calendar.setMinimumSize(300, 300)  # Reduced calendar size
+        self.calendar.setVerticalHeaderFormat(QCalendarWidget.VerticalHeaderFormat.NoVerticalHeader)  # Hide week numbers
+        self.calendar.setStyleSheet("""
+            QCalendarWidget {
+                background-color: #E6E6FA;
+                border: 1px solid #C8C8E6;
+                border-radius: 5px;
+            }
+            QCalendarWidget QToolButton {
+                color: #6A5ACD;
+                background-color: transparent;
+                border: none;
+                font-size: 14px;  /* Reduced font size */
+                font-weight: bold;
+                padding: 3px;  /* Reduced padding */
+            }
+            QCalendarWidget QToolButton:hover {
+                background-color: #D8D8F0;
+                border-radius: 3px;
+            }
+            QCalendarWidget QMenu {
+                background-color: #E6E6FA;
+                border: 1px solid #C8C8E6;
+            }
+            QCalendarWidget QSpinBox {
+                background-color: #FFFFFF;
+                border: 1px solid #C8C8E6;
+                border-radius: 3px;
+                padding: 2px;  /* Reduced padding */
+            }
+            QCalendarWidget QAbstractItemView:enabled {
+                background-color: #E6E6FA;
+                color: #323250;
+                selection-background-color: #6A5ACD;
+                selection-color: white;
+                font-size: 12px;  /* Reduced font size */
+            }
+            QCalendarWidget QAbstractItemView:disabled {
+                color: #A0A0A0;
+            }
+            /* Highlight weekends */
+            QCalendarWidget QAbstractItemView:enabled[dayOfWeek="6"],
+            QCalendarWidget QAbstractItemView:enabled[dayOfWeek="7"] {
+                color: #6A5ACD;
+                font-weight: bold;
+            }
+        """)
+        self.calendar.clicked.connect(self.handle_date_selection)
+        layout.addWidget(self.calendar)
+        
+        # Record button with styling
+        record_button = QPushButton("Record Period")
+        record_button.setStyleSheet("""
+            QPushButton {
+                background-color: #6A5ACD;
+                color: white;
+                font-size: 14px;
+                padding: 8px;  /* Reduced padding */
+                border-radius: 5px;
+            }
+            QPushButton:hover {
+                background-color: #5A4ABD;
+            }
+            QPushButton:disabled {
+                background-color: #C8C8E6;
+                color: #A0A0A0;
+            }
+        """)
+        record_button.clicked.connect(self.record_period)
+        record_button.setEnabled(False)  # Disable until both dates are selected
+        self.record_button = record_button
+        layout.addWidget(record_button)
+        
+        # Selected date range display - moved to bottom
+        self.range_label = QLabel("Selected Range: None")
+        self.range_label.setStyleSheet("color: #6A5ACD; font-weight: bold; font-size: 14px;")
+        self.range_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(self.range_label)
+        
+        # Cycle statistics and prediction
+        self.stats_label = QLabel()
+        self.stats_label.setStyleSheet("color: #323250; font-size: 13px;")
+        self.stats_label.setWordWrap(True)
+        layout.addWidget(self.stats_label)
+        
+        # History section
+        history_label = QLabel("History:")
+        history_label.setStyleSheet("font-weight: bold; font-size: 14px;")
+        layout.addWidget(history_label)
+        
+        # Scrollable area for history
+        scroll = QScrollArea()
+        scroll.setWidgetResizable(True)
+        scroll.setStyleSheet("""
+            QScrollArea {
+                border: 1px solid #C8C8E6;
+                border-radius: 5px;
+            }
+        """)
+        layout.addWidget(scroll)
+        
+        history_widget = QWidget()
+        self.history_layout = QVBoxLayout(history_widget)
+        self.history_layout.setSpacing(10)
+        self.empty_label = QLabel("No records yet")
+        self.empty_label.setStyleSheet("color: gray;")
+        self.history_layout.addWidget(self.empty_label)
+        self.history_layout.addStretch()
+        scroll.setWidget(history_widget)
+        
+        # Load history
+        self.load_history()
+    
+    def handle_date_selection(self, date):
+        if self.is_selecting_start:
+            self.start_date = date
+            self.is_selecting_start = False
+            self.range_label.setText(f"Selected Range: {date.toString('yyyy-MM-dd')} to ...")
+            self.highlight_date_range()
+        else:
+            self.end_date = date
+            if self.end_date < self.start_date:
+                # Swap dates if end date is before start date
+                self.start_date, self.end_date = self.end_date, self.start_date
+            
+            self.range_label.setText(f"Selected Range: {self.start_date.toString('yyyy-MM-dd')} to {self.end_date.toString('yyyy-MM-dd')}")
+            self.record_button.setEnabled(True)
+            self.is_selecting_start = True
+            self.highlight_date_range()
+    
+    def highlight_date_range(self):
+        """Highlight recorded periods and the current selection on the calendar"""
+        wanted = dict.fromkeys(self.recorded_days, 'recorded')
+        if self.start_date:
+            end_date = self.end_date or self.start_date
+            wanted.update(dict.fromkeys(
+                range(self.start_date.toJulianDay(), end_date.toJulianDay() + 1), 'selected'))
+        
+        # Only touch days whose format changes; the calendar repaints once for all of them
+        for day in self.day_formats.keys() - wanted.keys():
+            self.calendar.setDateTextFormat(QDate.fromJulianDay(day), QTextCharFormat())
+        for day, kind in wanted.items():
+            if self.day_formats.get(day) != kind:
+                self.calendar.setDateTextFormat(QDate.fromJulianDay(day), self.formats[kind])
+        self.day_formats = wanted
+    
+    @timed(name='dialog.load_history')
+    def load_history(self):
+        """Build the history, highlights and statistics; later changes update them in place"""
+        # Records come back sorted by start date, newest first
+        records = self.parent_widget.store.fetch('period_records')
+        for record in records:
+            self.count_days(record, 1)
+        self.highlight_date_range()
+        self.stats = CycleStats.from_records(records)
+        self.update_stats_label()
+        for record in records:
+            self.insert_row(len(self.history), record)
+    
+    def count_days(self, record, sign):
+        start, end = julian_day(record['start_date']), julian_day(record['end_date'])
+        if start is not None and end is not None:
+            for day in range(start, end + 1):
+                self.recorded_days[day] += sign
+                if not self.recorded_days[day]:
+                    del self.recorded_days[day]
+    
+    def insert_row(self, i, record):
+        # Create a frame for the record
+        record_frame = QFrame()
+        record_layout = QHBoxLayout(record_frame)
+        
+        # Date label
+        label = QLabel(f"From {record['start_date']} to {record['end_date']}")
+        record_layout.addWidget(label)
+        
+        # Delete button
+        delete_btn = QPushButton("Delete")
+        delete_btn.clicked.connect(lambda checked, r=record: self.delete_record(r))
+        record_layout.addWidget(delete_btn)
+        
+        self.history.insert(i, record)
+        self.history_rows.insert(i, record_frame)
+        self.history_layout.insertWidget(i, record_frame)
+        self.empty_label.hide()
+    
+    def remove_row(self, record):
+        for i, shown in enumerate(self.history):
+            if shown is record:
+                del self.history[i]
+                self.drop_row(self.history_rows.pop(i))
+                break
+        self.empty_label.setVisible(not self.history)
+    
+    def drop_row(self, frame):
+        # Out of the layout now, so row positions stay in step with self.history
+        self.history_layout.removeWidget(frame)
+        frame.hide()
+        frame.deleteLater()
+    
+    def update_stats_label(self):
+        summary = self.stats.summary()
+        if summary['average_cycle'] is None:
+            self.stats_label.setText("Record at least two periods to see cycle statistics")
+            return
+        spread = f" ± {summary['std_dev']}" if summary['std_dev'] is not None else ""
+        text = (f"Average cycle: {summary['average_cycle']}{spread} days"
+                f" (last {min(summary['cycles'], self.stats.window)}: {summary['rolling_average']})")
+        text += f"\nAverage period: {summary['average_period']} days"
+        prediction = summary['prediction']
+        text += (f"\nNext period: {prediction['next_start']:%Y-%m-%d}"
+                 f"\nFertile window: {prediction['fertile_start']:%Y-%m-%d} to {prediction['fertile_end']:%Y-%m-%d}")
+        self.stats_label.setText(text)
+    
+    def reload(self):
+        """Rebuild history and statistics after records changed elsewhere, e.g. by a sync"""
+        while self.history_rows:
+            self.drop_row(self.history_rows.pop())
+        self.history = []
+        self.recorded_days = Counter()
+        self.empty_label.show()
+        self.load_history()
+    
+    def delete_record(self, record):
+        if self.parent_widget.store.delete('period_records', record):
+            self.stats.remove(record['start_date'], record['end_date'])
+            self.update_stats_label()
+            self.count_days(record, -1)
+            self.highlight_date_range()
+            self.remove_row(record)
+            QMessageBox.information(self, "Success", "Record deleted successfully!")
+    
+    def record_period(self):
+        if not self.start_date or not self.end_date:
+            return
+        
+        # Create new record
+        new_record = {
+            'start_date': self.start_date.toString("yyyy-MM-dd"),
+            'end_date': self.end_date.toString("yyyy-MM-dd")
+        }
+        
+        # Add the new record
+        self.parent_widget.store.add('period_records', new_record)
+        self.stats.add(new_record['start_date'], new_record['end_date'])
+        
+        # Reset selection
+        self.start_date = None
+        self.end_date = None
+        self.is_selecting_start = True
+        self.range_label.setText("Selected Range: None")
+        self.record_button.setEnabled(False)
+        
+        # Show the new period; only its row and its days change
+        self.update_stats_label()
+        self.count_days(new_record, 1)
+        self.highlight_date_range()
+        self.insert_row(period_position(self.history, new_record), new_record)
+        QMessageBox.information(self, "Success", "Period recorded successfully!")
+
+class RemindersDialog(QDialog):
+    """Upcoming reminders, and a form to add one"""
+    def __init__(self, parent=None):
+        super().__init__(parent, Qt.WindowType.Window)
+        self.setWindowTitle("Reminders")
+        self.setMinimumSize(400, 450)
+        self.scheduler = parent.reminders
+        layout = QVBoxLayout(self)
+        
+        # Only the next reminders are listed, however many are scheduled
+        self.list_widget = QListWidget()
+        layout.addWidget(self.list_widget)
+        delete_button = QPushButton("Delete Selected")
+        delete_button.clicked.connect(self.delete_selected)
+        layout.addWidget(delete_button)
+        
+        # Input frame for a new reminder
+        input_frame = QFrame()
+        input_layout = QVBoxLayout(input_frame)
+        self.text_input = QLineEdit()
+        self.text_input.setPlaceholderText("Remind me to...")
+        self.text_input.setMaxLength(200)
+        self.text_input.returnPressed.connect(self.add_reminder)
+        input_layout.addWidget(self.text_input)
+        when_layout = QHBoxLayout()
+        self.due_input = QDateTimeEdit(QDateTime.currentDateTime().addSecs(3600))
+        self.due_input.setDisplayFormat("yyyy-MM-dd HH:mm")
+        self.due_input.setCalendarPopup(True)
+        when_layout.addWidget(self.due_input)
+        self.recurrence_input = QComboBox()
+        for label, recurrence in (("Once", ''), ("Hourly", 'hourly'), ("Daily", 'daily'),
+                                  ("Weekdays", 'weekdays'), ("Weekly", 'weekly')):
+            self.recurrence_input.addItem(label, recurrence)
+        when_layout.addWidget(self.recurrence_input)
+        add_button = QPushButton("Add")
+        add_button.clicked.connect(self.add_reminder)
+        when_layout.addWidget(add_button)
+        input_layout.addLayout(when_layout)
+        layout.addWidget(input_frame)
+        
+        self.load_reminders()
+    
+    @timed(name='dialog.load_reminders')
+    def load_reminders(self):
+        self.list_widget.clear()
+        for reminder in self.scheduler.upcoming():
+            label = f"{reminder['due'][:16]}  {reminder['text']}"
+            if reminder.get('recurrence'):
+                label += f"  ({reminder['recurrence']})"
+            item = QListWidgetItem(label)
+            item.setData(Qt.ItemDataRole.UserRole, reminder['id'])
+            self.list_widget.addItem(item)
+    
+    def add_reminder(self):
+        text = self.text_input.text().strip()
+        if text:
+            due = self.due_input.dateTime().toPython().replace(second=0, microsecond=0)
+            self.scheduler.add(text, due, self.recurrence_input.currentData())
+            self.text_input.clear()
+            self.load_reminders()
+    
+    def delete_selected(self):
+        item = self.list_widget.currentItem()
+        if item is not None:
+            self.scheduler.cancel(item.data(Qt.ItemDataRole.UserRole))
+            self.load_reminders()
+
+class ReminderNotice(QMessageBox):
+    """Non-modal notice for reminders that came due, with a snooze button"""
+    MAX_LINES = 10
+    
+    def __init__(self, reminders, snooze_minutes, parent=None):
+        super().__init__(parent)
+        self.reminders = reminders
+        self.setWindowTitle("Reminder")
+        self.setIcon(QMessageBox.Icon.Information)
+        self.setWindowModality(Qt.WindowModality.NonModal)
+        self.setWindowFlag(Qt.WindowType.WindowStaysOnTopHint)
+        self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        lines = [reminder['text'] for reminder in reminders[:self.MAX_LINES]]
+        if len(reminders) > self.MAX_LINES:
+            lines.append(f"... and {len(reminders) - self.MAX_LINES} more")
+        self.setText("\n".join(lines))
+        self.snooze_button = self.addButton(f"Snooze {snooze_minutes} min",
+                                            QMessageBox.ButtonRole.ActionRole)
+        self.addButton(QMessageBox.StandardButton.Ok)
@@ -0,0 +1,138 @@
+"""Live change events for the web UI, streamed as server-sent events.
+
+Commits publish their changes to an in-process broker (see
+models.change_listeners), which copies them into one bounded queue per
+connected browser. A client too slow to keep up is not allowed to grow its
+queue: its backlog is dropped and it is told to reload instead.
+
+Each worker process has its own broker. Changes committed by other
+processes (another gunicorn worker, a desktop pet syncing through one) are
+picked up by tailing the sync change log, once a second and only while
+browsers are connected.
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+QUEUE_SIZE = 256
+HEARTBEAT_SECONDS = 15
+POLL_SECONDS = 1.0
+RECENT_LOCAL = 4096
+
+
+def format_sse(event):
+    """One SSE message; the change log seq becomes the event id"""
+    lines = f"data: {json.dumps(event)}\n\n"
+    return f"id: {event['seq']}\n{lines}" if event.get('seq') else lines
+
+
+class Subscriber:
+    """One connected browser"""
+
+    def __init__(self, size):
+        self.queue = queue.Queue(size)
+        self.overflowed = False
+
+
+class EventBroker:
+    """Fans change events out to subscribers' bounded queues"""
+
+    def __init__(self, poll=None, queue_size=QUEUE_SIZE, max_subscribers=32):
+        self.poll = poll    # cursor -> (events, cursor), for other processes' changes
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._local = deque(maxlen=RECENT_LOCAL)
+        self._local_seqs = set()
+        self._tail = None
+        self.published = 0
+        self.overflows = 0
+
+    def subscribe(self):
+        """A new subscriber, or None when max_subscribers streams are open"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscriber = Subscriber(self.queue_size)
+            self._subscribers.add(subscriber)
+            if self.poll is not None and (self._tail is None or not self._tail.is_alive()):
+                self._tail = threading.Thread(target=self._run_tail, name='event-tail', daemon=True)
+                self._tail.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, events):
+        """Queue this process's change events for every subscriber"""
+        with self._lock:
+            for event in events:
+                if len(self._local) == self._local.maxlen:
+                    self._local_seqs.discard(self._local[0])
+                self._local.append(event.get('seq'))
+                self._local_seqs.add(event.get('seq'))
+        self._deliver(events)
+
+    def _deliver(self, events):
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self.published += len(events)
+        for subscriber in subscribers:
+            if subscriber.overflowed:
+                continue
+            for event in events:
+                try:
+                    subscriber.queue.put_nowait(event)
+                except queue.Full:
+                    subscriber.overflowed = True
+                    self.overflows += 1
+                    break
+
+    def _run_tail(self):
+        """Deliver changes other processes logged, while anyone is subscribed"""
+        cursor = None
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    return
+            try:
+                events, cursor = self.poll(cursor)
+            except Exception as e:
+                logging.error(f"Polling the change log failed: {e}")
+                events = []
+            with self._lock:
+                events = [e for e in events if e['seq'] not in self._local_seqs]
+            if events:
+                self._deliver(events)
+            time.sleep(POLL_SECONDS)
+
+    def stream(self, subscriber, heartbeat=HEARTBEAT_SECONDS):
+        """SSE text for one subscriber, until the client goes away"""
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                if subscriber.overflowed:
+                    # Replaying a long backlog would cost more than reloading the lists
+                    while not subscriber.queue.empty():
+                        subscriber.queue.get_nowait()
+                    subscriber.overflowed = False
+                    yield format_sse({'type': 'resync'})
+                try:
+                    event = subscriber.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    # Keeps proxies from closing the stream, and finds closed clients
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        with self._lock:
+            return {'subscribers': len(self._subscribers), 'published': self.published,
+                    'overflows': self.overflows}
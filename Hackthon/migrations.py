@@ -0,0 +1,134 @@
+"""Versioned schema changes for the Flask app's SQLite database.
+
+db.create_all() only creates tables that are missing, so changes to tables
+that already exist are made here. Each migration is a function applied
+once, in order, and the number applied is kept in the database's PRAGMA
+user_version. init_db() applies the pending ones at startup; this module
+applies them to a database file directly:
+
+    python migrations.py instance/app.db
+    python migrations.py instance/app.db --status
+
+Migrations can run against a database that is being served. Each one is a
+single BEGIN IMMEDIATE transaction: other writers wait for it on their
+busy_timeout, and readers, in WAL mode, keep seeing the old schema until
+it commits. Building an index holds the write lock for about a second per
+million rows.
+
+New migrations go at the end of MIGRATIONS and must never be reordered.
+Write them so they also succeed on a fresh database, where create_all()
+has already built the tables the way the models now declare them.
+"""
+import argparse
+import logging
+import sqlite3
+import time
+
+from bulk_io import NOTE_MAX_LENGTH
+
+
+def add_listing_indexes(cursor):
+    """Indexes for the columns the lists sort and filter by"""
+    # Every SQLite index also holds the rowid, so (start_date) serves ORDER BY start_date, id
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_note_timestamp ON note (timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_period_record_start_date ON period_record (start_date)")
+    # Open todos first is ORDER BY completed, id; a NULL would sort ahead of both and break paging
+    cursor.execute("UPDATE todo SET completed = 0 WHERE completed IS NULL")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_todo_completed ON todo (completed)")
+
+
+def add_sync_change_kind_seq_index(cursor):
+    """Latest change per kind in one index lookup, for the cycle statistics' version"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_sync_change_kind_seq ON sync_change (kind, seq)")
+
+
+# Shared with sqlite_store's schema. Rows already longer are kept; only new text is checked.
+NOTE_LENGTH_TRIGGERS = tuple(
+    f"""CREATE TRIGGER IF NOT EXISTS note_text_length_{name} BEFORE {event} ON note
+    WHEN length(NEW.text) > {NOTE_MAX_LENGTH}
+    BEGIN SELECT RAISE(ABORT, 'note text is longer than {NOTE_MAX_LENGTH} characters'); END"""
+    for name, event in (('insert', 'INSERT'), ('update', 'UPDATE OF text')))
+
+
+def limit_note_length(cursor):
+    """Reject note text longer than NOTE_MAX_LENGTH.
+
+    SQLite can't add a CHECK constraint to an existing table without
+    rebuilding it, and its FTS triggers with it, so the limit is checked by
+    triggers instead. Adding them doesn't touch any rows.
+    """
+    for statement in NOTE_LENGTH_TRIGGERS:
+        cursor.execute(statement)
+
+
+MIGRATIONS = [
+    add_listing_indexes,
+    add_sync_change_kind_seq_index,
+    limit_note_length,
+]
+
+
+def schema_version(cursor):
+    return cursor.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply the pending migrations on a DB-API connection to SQLite. Returns how many ran.
+
+    The connection must be in autocommit mode (isolation_level=None).
+    """
+    cursor = conn.cursor()
+    applied = 0
+    try:
+        while True:
+            # Other processes may be starting up too; the version is read again under the write lock
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                version = schema_version(cursor)
+                if version >= len(MIGRATIONS):
+                    cursor.execute("ROLLBACK")
+                    return applied
+                migration = MIGRATIONS[version]
+                started = time.perf_counter()
+                migration(cursor)
+                cursor.execute(f"PRAGMA user_version = {version + 1}")
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            logging.info(f"Applied migration {version + 1} ({migration.__name__}) "
+                         f"in {time.perf_counter() - started:.2f} s")
+            applied += 1
+    finally:
+        cursor.close()
+
+
+def status(conn):
+    """(version, [(number, name, applied), ...]) of a database"""
+    cursor = conn.cursor()
+    try:
+        version = schema_version(cursor)
+    finally:
+        cursor.close()
+    return version, [(number, migration.__name__, number <= version)
+                     for number, migration in enumerate(MIGRATIONS, 1)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations to the web app's database")
+    parser.add_argument('db', help="SQLite database, e.g. instance/app.db")
+    parser.add_argument('--status', action='store_true', help="only list the migrations and whether they ran")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    try:
+        if not args.status:
+            migrate(conn)
+        version, migrations = status(conn)
+    finally:
+        conn.close()
+    print(f"{args.db}: schema version {version} of {len(MIGRATIONS)}")
+    for number, name, applied in migrations:
+        print(f"  {number:3d} {name:<40} {'applied' if applied else 'pending'}")
@@ -0,0 +1,331 @@
+"""Database models of the Flask app, shared by app.py and the API blueprint.
+
+Kept apart from app.py so api.py can import them: app.py runs as
+__main__, and importing it from the blueprint would load it a second time.
+"""
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from flask import g, has_request_context, request
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from bulk_io import NOTE_MAX_LENGTH
+from cycle_stats import CycleStats
+from migrations import migrate
+from search_index import install_fts, fts_query, like_prefix_patterns, tokenize, LIKE_ESCAPE
+
+db = SQLAlchemy()
+
+# Pooled connections shared by the server's threads. isolation_level=None hands
+# transaction control to begin_sqlite() below instead of pysqlite; the app
+# hooks both listeners up with configure_engine().
+ENGINE_OPTIONS = {
+    'pool_size': 10,
+    'max_overflow': 20,
+    'pool_pre_ping': True,
+    'connect_args': {'check_same_thread': False, 'isolation_level': None},
+}
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+def configure_sqlite(dbapi_connection, connection_record):
+    """WAL lets readers run alongside the writer; busy_timeout makes writers wait, not fail"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA busy_timeout=5000')
+    # In WAL mode NORMAL only syncs at checkpoints, so commits from many requests share an fsync
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+def begin_sqlite(connection):
+    """Open a write request's first transaction with BEGIN IMMEDIATE.
+
+    A deferred transaction that reads first and then writes has to upgrade
+    its lock, and SQLite fails that upgrade at once with "database is
+    locked" instead of waiting on busy_timeout. Taking the write lock up
+    front makes concurrent writers queue instead.
+
+    Transactions after the request's first commit, such as attributes
+    reloaded to build the response, start deferred, so they don't queue
+    for the write lock a second time and hold it until teardown.
+    """
+    if connection.dialect.name != 'sqlite':
+        return
+    if has_request_context() and request.method in WRITE_METHODS and not g.get('write_began'):
+        g.write_began = True
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+    else:
+        connection.exec_driver_sql('BEGIN')
+
+def configure_engine(engine):
+    """Register the SQLite listeners above on the app's engine"""
+    event.listen(engine, 'connect', configure_sqlite)
+    event.listen(engine, 'begin', begin_sqlite)
+
+class Todo(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    text = db.Column(db.String(200), nullable=False)
+    completed = db.Column(db.Boolean, default=False, index=True)
+
+    def to_dict(self):
+        return {'id': self.id, 'text': self.text, 'completed': bool(self.completed)}
+
+class Note(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    text = db.Column(db.String(NOTE_MAX_LENGTH), nullable=False)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def to_dict(self):
+        timestamp = self.timestamp.isoformat(sep=' ', timespec='seconds') if self.timestamp else None
+        return {'id': self.id, 'text': self.text, 'timestamp': timestamp}
+
+class PeriodRecord(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    start_date = db.Column(db.Date, nullable=False, index=True)
+    end_date = db.Column(db.Date, nullable=False)
+
+    def to_dict(self):
+        return {'id': self.id, 'start_date': self.start_date.isoformat(),
+                'end_date': self.end_date.isoformat()}
+
+class SyncChange(db.Model):
+    """Latest change of every synced record, tombstones included.
+
+    seq grows with every change, so what a sync client hasn't seen yet is
+    the rows past its cursor. uid identifies a record on every side.
+    """
+    uid = db.Column(db.String(64), primary_key=True)
+    kind = db.Column(db.String(16), nullable=False)
+    row_id = db.Column(db.Integer)
+    seq = db.Column(db.Integer, nullable=False, unique=True)
+    updated_at = db.Column(db.Float, nullable=False)
+    origin = db.Column(db.String(64), nullable=False)
+    deleted = db.Column(db.Boolean, nullable=False, default=False)
+    __table_args__ = (db.Index('ix_sync_change_row', 'kind', 'row_id'),
+                      db.Index('ix_sync_change_kind_seq', 'kind', 'seq'))
+
+# Synced models, by the collection names the desktop pet uses
+SYNC_MODELS = {'notes': Note, 'todos': Todo, 'period_records': PeriodRecord}
+SYNC_KINDS = {model: kind for kind, model in SYNC_MODELS.items()}
+SERVER_ORIGIN = 'server'
+
+def next_seq(connection):
+    return connection.execute(db.text("SELECT COALESCE(MAX(seq), 0) + 1 FROM sync_change")).scalar()
+
+def log_changes(connection, changes, origin=SERVER_ORIGIN):
+    """Log (kind, row_id, deleted) changes made on the server. Returns their seqs."""
+    seq = next_seq(connection)
+    seqs = []
+    now = time.time()
+    for kind, row_id, deleted in changes:
+        uid = connection.execute(db.text(
+            "SELECT uid FROM sync_change WHERE kind = :kind AND row_id = :row_id AND NOT deleted"),
+            {'kind': kind, 'row_id': row_id}).scalar() or uuid.uuid4().hex
+        connection.execute(db.text(
+            "INSERT OR REPLACE INTO sync_change (uid, kind, row_id, seq, updated_at, origin, deleted) "
+            "VALUES (:uid, :kind, :row_id, :seq, :updated_at, :origin, :deleted)"),
+            {'uid': uid, 'kind': kind, 'row_id': row_id, 'seq': seq,
+             'updated_at': now, 'origin': origin, 'deleted': deleted})
+        seqs.append(seq)
+        seq += 1
+    return seqs
+
+def log_inserted(connection, kind, row_ids):
+    """Log rows inserted in bulk; they are new, so no uid lookups are needed. Returns their seqs."""
+    seq = next_seq(connection)
+    now = time.time()
+    connection.execute(db.text(
+        "INSERT INTO sync_change (uid, kind, row_id, seq, updated_at, origin, deleted) "
+        "VALUES (:uid, :kind, :row_id, :seq, :updated_at, :origin, 0)"),
+        [{'uid': uuid.uuid4().hex, 'kind': kind, 'row_id': row_id, 'seq': seq + i,
+          'updated_at': now, 'origin': SERVER_ORIGIN} for i, row_id in enumerate(row_ids)])
+    return range(seq, seq + len(row_ids))
+
+# Change events. Each commit hands the events of its changes to every
+# listener, e.g. the SSE broker in app.py; a rollback drops them.
+change_listeners = []
+EVENT_RESOURCES = {'notes': 'notes', 'todos': 'todos', 'period_records': 'periods'}
+
+def change_event(seq, kind, change, row_id, item=None):
+    """change is 'created', 'updated' or 'deleted'; item is the row as the API returns it"""
+    return {'seq': seq, 'type': change, 'resource': EVENT_RESOURCES[kind], 'id': row_id, 'item': item}
+
+def queue_events(session, events):
+    session.info.setdefault('change_events', []).extend(events)
+
+@event.listens_for(Session, 'after_commit')
+def publish_events(session):
+    events = session.info.pop('change_events', None)
+    if events:
+        for listener in change_listeners:
+            listener(events)
+
+@event.listens_for(Session, 'after_rollback')
+def drop_events(session):
+    session.info.pop('change_events', None)
+
+@event.listens_for(Session, 'after_flush')
+def log_session_changes(session, flush_context):
+    """Log every ORM change to a synced model. The sync route logs its own."""
+    if session.info.get('sync_applying'):
+        return
+    changes = [(obj, 'created') for obj in session.new]
+    changes += [(obj, 'updated') for obj in session.dirty if session.is_modified(obj)]
+    changes += [(obj, 'deleted') for obj in session.deleted]
+    changes = [(obj, change) for obj, change in changes if type(obj) in SYNC_KINDS]
+    if not changes:
+        return
+    seqs = log_changes(session.connection(), [(SYNC_KINDS[type(obj)], obj.id, change == 'deleted')
+                                              for obj, change in changes])
+    queue_events(session, [
+        change_event(seq, SYNC_KINDS[type(obj)], change, obj.id, None if change == 'deleted' else obj.to_dict())
+        for (obj, change), seq in zip(changes, seqs)])
+
+def change_versions(cursor=None):
+    """(resource, seq) of the changes logged after cursor by any process. Returns (changes, cursor).
+
+    With no cursor, the latest change of each resource.
+    """
+    if cursor is None:
+        rows = db.session.execute(db.text("SELECT kind, MAX(seq) FROM sync_change GROUP BY kind")).all()
+    else:
+        rows = db.session.execute(db.text("SELECT kind, seq FROM sync_change WHERE seq > :cursor"),
+                                  {'cursor': cursor}).all()
+    changes = [(EVENT_RESOURCES[kind], seq) for kind, seq in rows]
+    return changes, max([seq for _, seq in changes] + [cursor or 0])
+
+def load_rows(changes):
+    """(kind, row_id) -> row for the live rows of logged changes, one query per kind"""
+    rows = {}
+    for kind, model in SYNC_MODELS.items():
+        ids = [c.row_id for c in changes if c.kind == kind and not c.deleted]
+        if ids:
+            rows.update(((kind, row.id), row) for row in model.query.filter(model.id.in_(ids)))
+    return rows
+
+def change_events(cursor=None, limit=500):
+    """Events for changes logged after cursor by any process. Returns (events, cursor).
+
+    The log only keeps the latest state of a record, so a change shows up
+    as 'updated' or 'deleted'. With no cursor, starts from the current end.
+    """
+    if cursor is None:
+        return [], next_seq(db.session.connection()) - 1
+    changes = SyncChange.query.filter(SyncChange.seq > cursor).order_by(SyncChange.seq).limit(limit).all()
+    rows = load_rows(changes)
+    events = []
+    for change in changes:
+        row = None if change.deleted else rows.get((change.kind, change.row_id))
+        events.append(change_event(change.seq, change.kind, 'updated' if row else 'deleted',
+                                   change.row_id, row.to_dict() if row else None))
+    return events, changes[-1].seq if changes else cursor
+
+def backfill_sync_log(connection):
+    """Log rows that predate the sync log, so a first sync sees them"""
+    for kind, model in SYNC_MODELS.items():
+        connection.execute(db.text(
+            f"INSERT INTO sync_change (uid, kind, row_id, seq, updated_at, origin, deleted) "
+            f"SELECT lower(hex(randomblob(16))), :kind, id, "
+            f"(SELECT COALESCE(MAX(seq), 0) FROM sync_change) + ROW_NUMBER() OVER (ORDER BY id), "
+            f":now, :origin, 0 FROM {model.__tablename__} "
+            f"WHERE id NOT IN (SELECT row_id FROM sync_change WHERE kind = :kind AND NOT deleted)"),
+            {'kind': kind, 'now': time.time(), 'origin': SERVER_ORIGIN})
+
+# Set by init_db() once the FTS5 indexes exist; otherwise search falls back to LIKE
+fts_enabled = False
+
+def init_db():
+    """Create the tables, apply schema migrations, and set up the full-text indexes and the sync log"""
+    global fts_enabled
+    db.create_all()
+    with db.engine.begin() as connection:
+        backfill_sync_log(connection)
+    connection = db.engine.raw_connection()
+    try:
+        # Fresh databases get their indexes from the models; migrations bring older ones up to date
+        if db.engine.dialect.name == 'sqlite':
+            migrate(connection)
+        fts_enabled = install_fts(connection)
+    finally:
+        connection.close()
+
+def search_filter(model, query, window=None):
+    """WHERE clause for the rows of model whose text has every word of query as a prefix.
+
+    A clause rather than rows, so search results are ordered and paged like
+    the list. For a list ordered by id alone, window is (descending, last id
+    or None, count): FTS5 then walks its matches in id order and stops after
+    the page instead of collecting them all.
+    """
+    words = tokenize(query)
+    if not words:
+        return db.false()
+    if fts_enabled:
+        fts = model.__tablename__ + '_fts'
+        sql = f"SELECT rowid FROM {fts} WHERE {fts} MATCH :query"
+        params = {'query': fts_query(query)}
+        if window:
+            descending, after, count = window
+            if after is not None:
+                sql += f" AND rowid {'<' if descending else '>'} :after"
+                params['after'] = after
+            sql += f" ORDER BY rowid {'DESC' if descending else 'ASC'} LIMIT :count"
+            params['count'] = count
+        matches = db.text(sql).bindparams(**params).columns(db.column('rowid'))
+        return model.id.in_(matches)
+    return db.and_(*[db.or_(*[model.text.like(pattern, escape=LIKE_ESCAPE)
+                              for pattern in like_prefix_patterns(word)])
+                     for word in words])
+
+# Cycle statistics, built on first use and then updated as periods change.
+# They are kept with cycle_version, the seq of the latest periods change
+# they include, so changes made by other worker processes or by sync and
+# bulk import show up as a newer version and trigger a rebuild.
+cycle_stats = None
+cycle_version = -1
+cycle_lock = threading.Lock()
+
+def periods_version(connection):
+    """seq of the latest logged change to a period record (ix_sync_change_kind_seq)"""
+    return connection.execute(db.text(
+        "SELECT COALESCE(MAX(seq), 0) FROM sync_change WHERE kind = 'period_records'")).scalar()
+
+def get_cycle_stats(version):
+    """Cycle statistics including at least the periods changes up to seq version"""
+    global cycle_stats, cycle_version
+    with cycle_lock:
+        if cycle_stats is None or cycle_version < version:
+            # The version and the records are read in one transaction, so they agree
+            cycle_version = periods_version(db.session.connection())
+            cycle_stats = CycleStats.from_records(PeriodRecord.query.all())
+        return cycle_stats
+
+def commit_periods(removed=(), added=()):
+    """Commit the session, updating the cycle statistics with the removed and added
+    (start_date, end_date) periods.
+
+    Write requests hold the write lock from their first statement, so the
+    version read here is the one this change follows. The statistics are
+    only updated in place if they were built on exactly that version;
+    otherwise they are left to be rebuilt on next use.
+    """
+    global cycle_version
+    connection = db.session.connection()
+    previous = periods_version(connection)
+    db.session.flush()
+    version = periods_version(connection)
+    db.session.commit()
+    with cycle_lock:
+        if cycle_stats is None or cycle_version != previous:
+            return
+        for start_date, end_date in removed:
+            cycle_stats.remove(start_date, end_date)
+        for start_date, end_date in added:
+            cycle_stats.add(start_date, end_date)
+        cycle_version = version
@@ -0,0 +1,96 @@
+"""Time-based movement of the pet window.
+
+MotionEngine is a QAbstractAnimation that runs for as long as there is a
+target. Qt's animation driver calls updateCurrentTime once per frame, in
+step with the display where the platform supports it. Each frame moves the
+pet by speed * elapsed time, so speed no longer depends on timer jitter and
+a stall is made up for on the next frame. The position is kept as floats
+between frames, and move() is only called when the rounded position changes.
+New targets are folded into the running animation instead of restarting it.
+"""
+import math
+
+from PySide6.QtCore import QAbstractAnimation, QPointF, Signal
+
+from perf import timed
+
+
+class MotionEngine(QAbstractAnimation):
+    """Moves a widget towards a target at a speed in pixels per second"""
+
+    arrived = Signal()
+
+    accel_time = 0.15    # Seconds to reach full speed from rest
+    slow_radius = 60.0   # Start easing out this many pixels before the target
+    min_ease = 0.25      # Never slow below this fraction of full speed
+    max_step = 0.1       # Longest frame gap we make up for, in seconds
+
+    def __init__(self, widget, parent=None):
+        super().__init__(parent)
+        self.widget = widget
+        self.speed = 100.0
+        self.target = None
+        self._pos = QPointF()
+        self._last_ms = 0
+        self._moving_for = 0.0
+        self.frames = 0
+        self.moves = 0
+
+    def duration(self):
+        # Runs until the target is reached
+        return -1
+
+    def set_target(self, point, speed=None):
+        """Move towards point; if already moving, just steer to the new target"""
+        self.target = QPointF(point)
+        if speed is not None:
+            self.speed = float(speed)
+        if self.state() != QAbstractAnimation.State.Running:
+            self._pos = QPointF(self.widget.pos())
+            self._last_ms = 0
+            self._moving_for = 0.0
+            self.start()
+
+    def is_moving(self):
+        return self.state() == QAbstractAnimation.State.Running
+
+    @timed(name='motion.frame')
+    def updateCurrentTime(self, current_ms):
+        if self.target is None:
+            self.stop()
+            return
+        dt = min((current_ms - self._last_ms) / 1000.0, self.max_step)
+        self._last_ms = current_ms
+        if dt <= 0:
+            return
+        self.frames += 1
+        self._moving_for += dt
+
+        dx = self.target.x() - self._pos.x()
+        dy = self.target.y() - self._pos.y()
+        remaining = math.hypot(dx, dy)
+        # Ease in from rest, ease out near the target
+        ease = min(1.0, self._moving_for / self.accel_time) * \
+            max(self.min_ease, min(1.0, remaining / self.slow_radius))
+        step = self.speed * max(ease, self.min_ease) * dt
+
+        if remaining <= step:
+            self._pos = QPointF(self.target)
+            self._apply()
+            self.target = None
+            self.stop()
+            self.arrived.emit()
+            return
+        self._pos += QPointF(dx, dy) * (step / remaining)
+        self._apply()
+
+    def _apply(self):
+        """Move the widget only if the whole-pixel position changed"""
+        x, y = round(self._pos.x()), round(self._pos.y())
+        current = self.widget.pos()
+        if x != current.x() or y != current.y():
+            self.widget.move(x, y)
+            self.moves += 1
+
+    def stats(self):
+        return {'frames': self.frames, 'moves': self.moves}
@@ -0,0 +1,167 @@
+"""Timing of the desktop pet's hot paths.
+
+Recording is off unless DESKTOP_PET_PERF=1 is set. When it is off, timed()
+hands the function back untouched and span() returns a shared no-op
+context, so the instrumentation costs nothing.
+
+When it is on, every instrumented name gets a call count and a histogram
+of latencies in power-of-two microsecond buckets, and the most recent
+calls are kept as spans. dump() writes both to the data directory: a
+summary as JSON, and the spans in Chrome trace format, which
+chrome://tracing and https://ui.perfetto.dev open.
+
+Recording is meant for the GUI thread; calls from other threads are
+recorded too, but their counts may race.
+"""
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+ENABLED = os.environ.get('DESKTOP_PET_PERF', '') not in ('', '0')
+
+MAX_SPANS = 20000
+BUCKETS = 32
+
+
+class Histogram:
+    """Latencies in microseconds, bucketed by power of two"""
+
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, us):
+        self.count += 1
+        self.total += us
+        if us > self.max:
+            self.max = us
+        # Bucket i holds values below 2**i
+        self.buckets[min(us.bit_length(), BUCKETS - 1)] += 1
+
+    def percentile(self, q):
+        """Upper bound of the bucket the q-th quantile falls in"""
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= target:
+                return min((1 << i) - 1, self.max)
+        return self.max
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total_ms': round(self.total / 1000, 3),
+            'mean_us': round(self.total / self.count, 1) if self.count else 0,
+            'p50_us': self.percentile(0.5),
+            'p95_us': self.percentile(0.95),
+            'p99_us': self.percentile(0.99),
+            'max_us': self.max,
+            'buckets': {f'<{1 << i}us': n for i, n in enumerate(self.buckets) if n},
+        }
+
+
+class Recorder:
+    """Histograms per name, and the most recent spans for a trace"""
+
+    def __init__(self, max_spans=MAX_SPANS):
+        self.histograms = {}
+        self.spans = deque(maxlen=max_spans)
+        self.started = time.perf_counter_ns()
+
+    def record(self, name, start_ns, end_ns):
+        """One call of name that ran from start_ns to end_ns (perf_counter_ns)"""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.add((end_ns - start_ns) // 1000)
+        self.spans.append((name, start_ns, end_ns - start_ns, threading.get_ident()))
+
+    def observe(self, name, duration_ns):
+        """A duration measured some other way, e.g. event loop lag; not traced"""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.add(duration_ns // 1000)
+
+    def summary(self):
+        """name -> histogram summary, most total time first"""
+        ranked = sorted(self.histograms.items(), key=lambda item: item[1].total, reverse=True)
+        return {name: histogram.as_dict() for name, histogram in ranked}
+
+    def chrome_trace(self):
+        """Spans as complete ('X') events in the Chrome trace event format"""
+        pid = os.getpid()
+        events = [{'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                   'ts': (start - self.started) / 1000, 'dur': duration / 1000}
+                  for name, start, duration, tid in list(self.spans)]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def dump(self, directory):
+        """Write the summary and the trace to directory. Returns their paths."""
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        summary_path = os.path.join(directory, f'perf-{stamp}.json')
+        trace_path = os.path.join(directory, f'perf-{stamp}.trace.json')
+        uptime = (time.perf_counter_ns() - self.started) / 1e9
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump({'uptime_s': round(uptime, 1), 'timings': self.summary()}, f, indent=2)
+        with open(trace_path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+        return summary_path, trace_path
+
+    def reset(self):
+        self.histograms.clear()
+        self.spans.clear()
+
+
+recorder = Recorder() if ENABLED else None
+
+NO_SPAN = contextlib.nullcontext()
+
+
+class Span:
+    """Context manager recording the time spent inside it"""
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        recorder.record(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+def span(name):
+    """with span('name'): ... records the block while recording is on"""
+    return Span(name) if ENABLED else NO_SPAN
+
+
+def timed(func=None, *, name=None):
+    """Decorator recording each call, under name or the function's qualified name"""
+    if func is None:
+        return lambda f: timed(f, name=name)
+    if not ENABLED:
+        return func
+    label = name or func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            recorder.record(label, start, time.perf_counter_ns())
+    return wrapper
@@ -0,0 +1,76 @@
+"""Qt side of the performance instrumentation (see perf).
+
+LagMonitor measures how late the event loop runs a timer, which is the
+delay the user sees as jank. PerfOverlay is a small always-on-top panel
+showing the recorded timings. Both are only created while DESKTOP_PET_PERF
+recording is on.
+"""
+import time
+
+from PySide6.QtCore import QObject, Qt, QTimer
+from PySide6.QtGui import QFont
+from PySide6.QtWidgets import QLabel, QVBoxLayout, QWidget
+
+import perf
+
+LAG_NAME = 'qt.event_loop_lag'
+
+
+class LagMonitor(QObject):
+    """Records how late a periodic timer fires, as event loop lag"""
+
+    def __init__(self, interval_ms=100, parent=None):
+        super().__init__(parent)
+        self.interval_ns = interval_ms * 1_000_000
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._tick)
+        self._last = None
+        self._timer.start(interval_ms)
+
+    def _tick(self):
+        now = time.perf_counter_ns()
+        if self._last is not None:
+            perf.recorder.observe(LAG_NAME, max(0, now - self._last - self.interval_ns))
+        self._last = now
+
+    def stop(self):
+        self._timer.stop()
+        self._last = None
+
+
+class PerfOverlay(QWidget):
+    """Table of the slowest instrumented paths, refreshed while shown"""
+
+    ROWS = 14
+
+    def __init__(self, parent=None):
+        super().__init__(parent, Qt.WindowType.Tool | Qt.WindowType.FramelessWindowHint |
+                         Qt.WindowType.WindowStaysOnTopHint)
+        self.setAttribute(Qt.WidgetAttribute.WA_ShowWithoutActivating)
+        self.setStyleSheet("background-color: rgba(30, 30, 30, 210); color: #e0e0e0;")
+        self.label = QLabel()
+        self.label.setFont(QFont("monospace", 9))
+        self.label.setTextFormat(Qt.TextFormat.PlainText)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(8, 6, 8, 6)
+        layout.addWidget(self.label)
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.refresh)
+
+    def refresh(self):
+        lines = [f"{'name':<32} {'calls':>7} {'mean':>8} {'p95':>8} {'max':>8}"]
+        for name, stats in list(perf.recorder.summary().items())[:self.ROWS]:
+            lines.append(f"{name[-32:]:<32} {stats['count']:>7} {stats['mean_us']:>6.0f}us "
+                         f"{stats['p95_us']:>6}us {stats['max_us']:>6}us")
+        self.label.setText("\n".join(lines))
+        self.adjustSize()
+
+    def showEvent(self, event):
+        self.refresh()
+        self._timer.start(1000)  # Only refreshed while visible
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self._timer.stop()
+        super().hideEvent(event)
@@ -0,0 +1,170 @@
+"""Power management for the pet.
+
+PowerManager decides how much work the pet should be doing:
+
+- active: normal animation speed and cursor tracking
+- idle: the user hasn't touched the mouse for a while, so the animation
+  runs at a fraction of its frame rate
+- frozen: the pet is hidden, the screen is locked, or a menu or modal
+  dialog is open. The animation holds its current frame and cursor
+  tracking is suspended.
+
+It also measures process CPU time spent in each state and logs an
+estimate of the CPU time saved every hour.
+"""
+import logging
+import sys
+import time
+from contextlib import contextmanager
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+ACTIVE = 'active'
+IDLE = 'idle'
+FROZEN = 'frozen'
+
+
+def screen_lock_probe():
+    """A function telling whether the screen is locked, or None if this platform can't tell"""
+    if sys.platform == 'win32':
+        import ctypes
+        user32 = ctypes.windll.user32
+
+        def locked():
+            # The input desktop can't be opened while the lock screen is up
+            desktop = user32.OpenInputDesktop(0, False, 0x0100)  # DESKTOP_SWITCHDESKTOP
+            if not desktop:
+                return True
+            user32.CloseDesktop(desktop)
+            return False
+        return locked
+    if sys.platform == 'darwin':
+        try:
+            import Quartz
+        except ImportError:
+            return None
+
+        def locked():
+            session = Quartz.CGSessionCopyCurrentDictionary()
+            return bool(session and session.get('CGSSessionScreenIsLocked', 0))
+        return locked
+    return None
+
+
+class PowerManager(QObject):
+    """Tracks visibility, user activity and screen lock, and reports a power state"""
+
+    stateChanged = Signal(str)
+
+    def __init__(self, idle_after=300, lock_check_interval=10, report_interval=3600, parent=None):
+        super().__init__(parent)
+        self.state = ACTIVE
+        self._freeze_reasons = set()
+        self._inactive = False
+
+        # Inactivity: one single-shot timer, restarted on activity
+        self._idle_timer = QTimer(self)
+        self._idle_timer.setSingleShot(True)
+        self._idle_timer.timeout.connect(self._went_idle)
+        self._idle_timer.start(idle_after * 1000)
+        self._last_activity = time.monotonic()
+
+        # Screen lock, polled only where the platform lets us ask
+        self._lock_probe = screen_lock_probe()
+        if self._lock_probe is not None:
+            self._lock_timer = QTimer(self)
+            self._lock_timer.timeout.connect(self._check_lock)
+            self._lock_timer.start(lock_check_interval * 1000)
+
+        # CPU accounting per state
+        self._cpu = {ACTIVE: 0.0, IDLE: 0.0, FROZEN: 0.0}
+        self._wall = {ACTIVE: 0.0, IDLE: 0.0, FROZEN: 0.0}
+        self._mark_cpu = time.process_time()
+        self._mark_wall = time.monotonic()
+        self._report_timer = QTimer(self)
+        self._report_timer.timeout.connect(self.report)
+        self._report_timer.start(report_interval * 1000)
+
+    # Inputs
+
+    def note_activity(self):
+        """Call when the user moves the mouse or interacts with the pet"""
+        # Restarting the timer on every cursor event is wasteful, once a second is plenty
+        now = time.monotonic()
+        if now - self._last_activity < 1 and not self._inactive:
+            return
+        self._last_activity = now
+        self._idle_timer.start()
+        if self._inactive:
+            self._inactive = False
+            self._update()
+
+    def set_frozen(self, reason, frozen):
+        """Add or remove a reason to freeze, e.g. 'hidden', 'locked', 'menu', 'dialog'"""
+        if frozen:
+            self._freeze_reasons.add(reason)
+        else:
+            self._freeze_reasons.discard(reason)
+        self._update()
+
+    @contextmanager
+    def frozen_while(self, reason):
+        """Freeze for the duration of a with block, such as a modal exec()"""
+        self.set_frozen(reason, True)
+        try:
+            yield
+        finally:
+            self.set_frozen(reason, False)
+
+    def _went_idle(self):
+        self._inactive = True
+        self._update()
+
+    def _check_lock(self):
+        try:
+            locked = self._lock_probe()
+        except Exception as e:
+            logging.warning(f"Screen lock check failed, disabling it: {e}")
+            self._lock_timer.stop()
+            return
+        if locked != ('locked' in self._freeze_reasons):
+            self.set_frozen('locked', locked)
+
+    def _update(self):
+        if self._freeze_reasons:
+            state = FROZEN
+        elif self._inactive:
+            state = IDLE
+        else:
+            state = ACTIVE
+        if state != self.state:
+            self._account()
+            logging.info(f"Power state {self.state} -> {state}")
+            self.state = state
+            self.stateChanged.emit(state)
+
+    # Instrumentation
+
+    def _account(self):
+        """Charge CPU and wall time since the last mark to the current state"""
+        cpu, wall = time.process_time(), time.monotonic()
+        self._cpu[self.state] += cpu - self._mark_cpu
+        self._wall[self.state] += wall - self._mark_wall
+        self._mark_cpu, self._mark_wall = cpu, wall
+
+    def stats(self):
+        """CPU use per state and the CPU time saved compared to staying active"""
+        self._account()
+        active_rate = self._cpu[ACTIVE] / self._wall[ACTIVE] if self._wall[ACTIVE] else 0.0
+        saved = sum(max(0.0, active_rate * self._wall[s] - self._cpu[s]) for s in (IDLE, FROZEN))
+        total_wall = sum(self._wall.values())
+        return {
+            'state': self.state,
+            'wall_seconds': {s: round(v, 1) for s, v in self._wall.items()},
+            'cpu_seconds': {s: round(v, 3) for s, v in self._cpu.items()},
+            'cpu_saved_seconds': round(saved, 3),
+            'cpu_saved_per_hour': round(saved * 3600 / total_wall, 3) if total_wall else 0.0,
+        }
+
+    def report(self):
+        logging.info(f"Power stats: {self.stats()}")
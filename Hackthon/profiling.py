@@ -0,0 +1,197 @@
+"""SQL profiling for the Flask app, for debugging and load tests.
+
+Turned on with SQL_PROFILING=1. Every request then gets:
+
+- a Server-Timing header with its SQL time and statement count, which the
+  browser's network panel shows next to the request
+- a warning in the log when it runs the same SELECT many times over, the
+  shape of an N+1 query
+
+/_perf lists the slowest routes and statements collected since startup.
+Statements slower than SQL_SLOW_MS (default 25) keep their parameters, and
+on SQLite /_perf shows their EXPLAIN QUERY PLAN.
+
+Statements run while a streamed response body is being sent happen after
+the request's hooks and are counted toward no route.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import jsonify, render_template, request
+from sqlalchemy import event
+
+SLOW_MS = float(os.environ.get('SQL_SLOW_MS', 25))
+N_PLUS_ONE = 10   # The same SELECT this many times in one request is reported
+MAX_ROWS = 50     # Rows per table on /_perf
+EXPLAINABLE = re.compile(r'\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b', re.IGNORECASE)
+
+
+def normalize(statement):
+    """Statement text with whitespace and expanded IN lists folded, as a key"""
+    statement = ' '.join(statement.split())
+    return re.sub(r'\bIN \(\?(?:, \?)+\)', 'IN (?, ...)', statement)
+
+
+def route_key():
+    """METHOD /path with numeric segments folded, e.g. PATCH /api/todos/<id>"""
+    return request.method + ' ' + re.sub(r'/\d+(?=/|$)', '/<id>', request.path)
+
+
+class RequestProfile:
+    """SQL run by one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.statements = Counter()
+
+
+class Profiler:
+    """Collects per-request SQL timings and keeps totals per route and statement"""
+
+    def __init__(self, engine, slow_ms=SLOW_MS):
+        self.engine = engine
+        self.slow_ms = slow_ms
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.routes = {}      # route -> totals
+        self.statements = {}  # normalized statement -> totals
+        self.n_plus_one = {}  # (route, statement) -> requests it showed up in
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+        event.listen(engine, 'handle_error', self._execute_failed)
+
+    # SQLAlchemy events
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('profile_started', []).append(time.perf_counter())
+
+    def _execute_failed(self, context):
+        # after_cursor_execute doesn't run for a failed statement; drop its start time here
+        started = context.connection.info.get('profile_started') if context.connection is not None else None
+        if started and context.execution_context is not None:
+            started.pop()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = (time.perf_counter() - conn.info['profile_started'].pop()) * 1000
+        key = normalize(statement)
+        profile = getattr(self._local, 'profile', None)
+        if profile is not None:
+            profile.queries += 1
+            profile.sql_ms += elapsed
+            profile.statements[key] += 1
+        with self._lock:
+            totals = self.statements.get(key)
+            if totals is None:
+                totals = self.statements[key] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                                 'slow': 0, 'example': None, 'parameters': None,
+                                                 'plan': None}
+            totals['count'] += 1
+            totals['total_ms'] += elapsed
+            totals['max_ms'] = max(totals['max_ms'], elapsed)
+            if elapsed >= self.slow_ms:
+                totals['slow'] += 1
+                if not executemany:
+                    # The statement as run; the key may have its IN lists folded
+                    totals['example'] = statement
+                    totals['parameters'] = parameters
+
+    # Request hooks
+
+    def start_request(self):
+        self._local.profile = RequestProfile()
+
+    def finish_request(self, response):
+        profile = getattr(self._local, 'profile', None)
+        if profile is None:
+            return response
+        self._local.profile = None
+        total_ms = (time.perf_counter() - profile.started) * 1000
+        route = route_key()
+        response.headers['Server-Timing'] = (
+            f'db;dur={profile.sql_ms:.1f};desc="{profile.queries} queries", total;dur={total_ms:.1f}')
+        repeated = [key for key, n in profile.statements.items()
+                    if n >= N_PLUS_ONE and key.startswith('SELECT')]
+        with self._lock:
+            totals = self.routes.get(route)
+            if totals is None:
+                totals = self.routes[route] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                               'queries': 0, 'sql_ms': 0.0}
+            totals['count'] += 1
+            totals['total_ms'] += total_ms
+            totals['max_ms'] = max(totals['max_ms'], total_ms)
+            totals['queries'] += profile.queries
+            totals['sql_ms'] += profile.sql_ms
+            for key in repeated:
+                seen = self.n_plus_one.get((route, key), 0)
+                self.n_plus_one[(route, key)] = seen + 1
+                if not seen:
+                    logging.warning(f"Possible N+1 in {route}: ran {profile.statements[key]} times: {key}")
+        return response
+
+    def discard_request(self, exc=None):
+        self._local.profile = None
+
+    # Reporting
+
+    def explain(self, statement, parameters):
+        """SQLite's EXPLAIN QUERY PLAN for a statement, as text lines"""
+        # A slow BEGIN IMMEDIATE is a wait for the write lock, with nothing to explain
+        if self.engine.dialect.name != 'sqlite' or not EXPLAINABLE.match(statement):
+            return None
+        connection = self.engine.raw_connection()
+        try:
+            rows = connection.cursor().execute('EXPLAIN QUERY PLAN ' + statement, parameters or ()).fetchall()
+            return [row[-1] for row in rows]
+        except Exception as e:
+            return [f"EXPLAIN failed: {e}"]
+        finally:
+            connection.close()
+
+    def report(self, limit=MAX_ROWS):
+        """Slowest routes and statements, with plans for the slow statements"""
+        with self._lock:
+            routes = [dict(totals, route=route) for route, totals in self.routes.items()]
+            statements = [dict(totals, statement=key) for key, totals in self.statements.items()]
+            n_plus_one = [{'route': route, 'statement': key, 'requests': n}
+                          for (route, key), n in self.n_plus_one.items()]
+        for row in routes:
+            row['mean_ms'] = row['total_ms'] / row['count']
+            row['mean_queries'] = row['queries'] / row['count']
+        routes.sort(key=lambda row: row['mean_ms'], reverse=True)
+        statements.sort(key=lambda row: row['max_ms'], reverse=True)
+        statements = statements[:limit]
+        for row in statements:
+            if row['example'] is not None and row['plan'] is None:
+                # Kept on the totals, so each statement is explained once
+                row['plan'] = self.statements[row['statement']]['plan'] = \
+                    self.explain(row['example'], row['parameters'])
+            del row['example']
+            row['mean_ms'] = row['total_ms'] / row['count']
+            row['parameters'] = repr(row['parameters']) if row['parameters'] is not None else None
+        return {'slow_ms': self.slow_ms, 'routes': routes[:limit], 'statements': statements,
+                'n_plus_one': n_plus_one}
+
+
+def init_profiling(app, db):
+    """Profile every request of app and serve /_perf"""
+    with app.app_context():
+        profiler = Profiler(db.engine)
+    app.before_request(profiler.start_request)
+    app.after_request(profiler.finish_request)
+    app.teardown_request(profiler.discard_request)
+
+    @app.route('/_perf')
+    def perf_report():
+        report = profiler.report()
+        if request.args.get('format') == 'json':
+            return jsonify(report)
+        return render_template('perf.html', report=report)
+
+    logging.info(f"SQL profiling on; statements over {profiler.slow_ms:g} ms are explained at /_perf")
+    return profiler
@@ -0,0 +1,278 @@
+"""List models and delegates for the Notes and Todo List dialogs.
+
+Rows are fetched from the store a page at a time as the view scrolls
+(canFetchMore/fetchMore), and each row is painted by a delegate instead of
+being built out of widgets. Adding or deleting a record inserts or removes
+one row, so the cost of an edit does not depend on the size of the history.
+"""
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QSize, QEvent, Signal
+from PySide6.QtGui import QColor, QFont, QFontMetrics
+from PySide6.QtWidgets import QStyledItemDelegate, QStyle, QStyleOptionButton, QApplication
+
+from search_index import matches
+
+RecordRole = Qt.ItemDataRole.UserRole + 1
+
+TEXT_COLOR = QColor('#323250')
+MUTED_COLOR = QColor('gray')
+DELETE_COLOR = QColor('#FF4444')
+DELETE_HOVER_COLOR = QColor('#FFE0E0')
+ROW_COLOR = QColor('#E6E6FA')
+SEPARATOR_COLOR = QColor('#C8C8E6')
+
+
+class RecordListModel(QAbstractListModel):
+    """One collection of the pet's store, loaded page by page"""
+
+    def __init__(self, store, collection, page_size=200, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.collection = collection
+        self.page_size = page_size
+        self.query = ''
+        self._records = []
+        self._total = 0
+        self._more_matches = False
+
+    def reload(self):
+        """Drop everything fetched so far and start again from the first page"""
+        self.query = ''
+        self.beginResetModel()
+        self._records = []
+        self._total = self.store.count(self.collection)
+        self.endResetModel()
+
+    def set_query(self, query):
+        """Show only records matching query, or everything again if it is blank.
+
+        Matches are fetched a page at a time too; their count isn't known
+        up front, so a short page marks the end.
+        """
+        self.query = query.strip()
+        if not self.query:
+            self.reload()
+            return
+        self.beginResetModel()
+        self._records = self.store.search(self.collection, self.query, limit=self.page_size)
+        self._total = len(self._records)
+        self._more_matches = len(self._records) == self.page_size
+        self.endResetModel()
+
+    def record(self, row):
+        return self._records[row]
+
+    def total(self):
+        """Number of records in the store, fetched or not"""
+        return self._total
+
+    # Qt model interface
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._records)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        if self.query:
+            return self._more_matches
+        return len(self._records) < self._total
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        if self.query:
+            page = self.store.search(self.collection, self.query, offset=len(self._records),
+                                     limit=self.page_size)
+            self._more_matches = len(page) == self.page_size
+            self._total += len(page)
+        else:
+            page = self.store.fetch(self.collection, offset=len(self._records), limit=self.page_size)
+        if not page:
+            self._total = len(self._records)
+            return
+        first = len(self._records)
+        self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+        self._records.extend(page)
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self._records[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole or role == Qt.ItemDataRole.ToolTipRole:
+            return record.get('text')
+        if role == Qt.ItemDataRole.CheckStateRole and self.collection == 'todos':
+            return Qt.CheckState.Checked if record.get('completed', False) else Qt.CheckState.Unchecked
+        if role == RecordRole:
+            return record
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if not index.isValid() or role != Qt.ItemDataRole.CheckStateRole:
+            return False
+        checked = value in (Qt.CheckState.Checked, Qt.CheckState.Checked.value)
+        self.store.update(self.collection, self._records[index.row()], completed=checked)
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def flags(self, index):
+        flags = Qt.ItemFlag.ItemIsEnabled
+        if index.isValid() and self.collection == 'todos':
+            flags |= Qt.ItemFlag.ItemIsUserCheckable
+        return flags
+
+    # Edits
+
+    def append_record(self, record):
+        """Save a new record and show it at the end of the list, if it matches the search"""
+        self.store.add(self.collection, record)
+        if self.query:
+            if not matches(record.get('text'), self.query) or self._more_matches:
+                # Hidden by the search, or a later page will bring it in
+                return record
+        self._total += 1
+        if len(self._records) == self._total - 1:
+            # Everything before it is already fetched, so the new row is visible now
+            row = len(self._records)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._records.append(record)
+            self.endInsertRows()
+        return record
+
+    def remove_row(self, row):
+        """Delete the record shown in row"""
+        record = self._records[row]
+        if not self.store.delete(self.collection, record):
+            return False
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._records[row]
+        self._total -= 1
+        self.endRemoveRows()
+        return True
+
+
+class RecordDelegate(QStyledItemDelegate):
+    """Paints a fixed-height row with a delete "×" at the right edge"""
+
+    deleteRequested = Signal(int)
+
+    padding = 8
+    delete_size = 30
+
+    def delete_rect(self, option):
+        rect = option.rect
+        return QRect(rect.right() - self.delete_size - self.padding,
+                     rect.top() + (rect.height() - self.delete_size) // 2,
+                     self.delete_size, self.delete_size)
+
+    def paint_row(self, painter, option, index):
+        """The row's contents; by default its text on one elided line"""
+        left = option.rect.left() + self.padding
+        rect = QRect(left, option.rect.top(), self.delete_rect(option).left() - self.padding - left,
+                     option.rect.height())
+        painter.setFont(option.font)
+        painter.setPen(TEXT_COLOR)
+        text = QFontMetrics(option.font).elidedText(index.data() or '', Qt.TextElideMode.ElideRight, rect.width())
+        painter.drawText(rect, Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft, text)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        painter.fillRect(option.rect, ROW_COLOR)
+        painter.setPen(SEPARATOR_COLOR)
+        painter.drawLine(option.rect.bottomLeft(), option.rect.bottomRight())
+        self.paint_row(painter, option, index)
+        # Delete button
+        delete_rect = self.delete_rect(option)
+        if option.state & QStyle.StateFlag.State_MouseOver:
+            painter.setRenderHint(painter.RenderHint.Antialiasing)
+            painter.setBrush(DELETE_HOVER_COLOR)
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.drawRoundedRect(delete_rect, 3, 3)
+        font = QFont(option.font)
+        font.setPixelSize(16)
+        painter.setFont(font)
+        painter.setPen(DELETE_COLOR)
+        painter.drawText(delete_rect, Qt.AlignmentFlag.AlignCenter, "×")
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if (event.type() == QEvent.Type.MouseButtonRelease
+                and event.button() == Qt.MouseButton.LeftButton
+                and self.delete_rect(option).contains(event.position().toPoint())):
+            self.deleteRequested.emit(index.row())
+            return True
+        return super().editorEvent(event, model, option, index)
+
+
+class TodoDelegate(RecordDelegate):
+    """Checkbox, single elided line of text and a delete button"""
+
+    def check_rect(self, option):
+        size = 18
+        return QRect(option.rect.left() + self.padding,
+                     option.rect.top() + (option.rect.height() - size) // 2, size, size)
+
+    def text_rect(self, option):
+        left = self.check_rect(option).right() + self.padding
+        right = self.delete_rect(option).left() - self.padding
+        return QRect(left, option.rect.top(), right - left, option.rect.height())
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), max(QFontMetrics(option.font).height() + 2 * self.padding,
+                                              self.delete_size + 2 * self.padding))
+
+    def paint_row(self, painter, option, index):
+        completed = index.data(Qt.ItemDataRole.CheckStateRole) == Qt.CheckState.Checked
+        check = QStyleOptionButton()
+        check.rect = self.check_rect(option)
+        check.state = QStyle.StateFlag.State_Enabled | (
+            QStyle.StateFlag.State_On if completed else QStyle.StateFlag.State_Off)
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawPrimitive(QStyle.PrimitiveElement.PE_IndicatorCheckBox, check, painter, option.widget)
+
+        font = QFont(option.font)
+        font.setStrikeOut(completed)
+        painter.setFont(font)
+        painter.setPen(MUTED_COLOR if completed else TEXT_COLOR)
+        rect = self.text_rect(option)
+        text = QFontMetrics(font).elidedText(index.data() or '', Qt.TextElideMode.ElideRight, rect.width())
+        painter.drawText(rect, Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft, text)
+
+    def editorEvent(self, event, model, option, index):
+        if (event.type() == QEvent.Type.MouseButtonRelease
+                and event.button() == Qt.MouseButton.LeftButton
+                and self.check_rect(option).contains(event.position().toPoint())):
+            checked = index.data(Qt.ItemDataRole.CheckStateRole) == Qt.CheckState.Checked
+            new_state = Qt.CheckState.Unchecked if checked else Qt.CheckState.Checked
+            return model.setData(index, new_state, Qt.ItemDataRole.CheckStateRole)
+        return super().editorEvent(event, model, option, index)
+
+
+class NoteDelegate(RecordDelegate):
+    """Timestamp line plus up to three lines of note text; the full text is in the tooltip"""
+
+    max_lines = 3
+
+    def sizeHint(self, option, index):
+        line_height = QFontMetrics(option.font).lineSpacing()
+        return QSize(option.rect.width(), (1 + self.max_lines) * line_height + 2 * self.padding)
+
+    def paint_row(self, painter, option, index):
+        record = index.data(RecordRole)
+        metrics = QFontMetrics(option.font)
+        left = option.rect.left() + self.padding
+        width = self.delete_rect(option).left() - self.padding - left
+        top = option.rect.top() + self.padding
+
+        painter.setFont(option.font)
+        painter.setPen(MUTED_COLOR)
+        painter.drawText(QRect(left, top, width, metrics.height()),
+                         Qt.AlignmentFlag.AlignLeft, record.get('timestamp') or '')
+
+        painter.setPen(TEXT_COLOR)
+        text_rect = QRect(left, top + metrics.lineSpacing(), width, self.max_lines * metrics.lineSpacing())
+        # Only the first few lines can show, so don't lay out the whole note
+        text = (record.get('text') or '')[:self.max_lines * 200]
+        painter.drawText(text_rect, Qt.AlignmentFlag.AlignLeft | Qt.TextFlag.TextWordWrap, text)
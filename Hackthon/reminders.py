@@ -0,0 +1,208 @@
+"""Reminders: a min-heap of due times driving a single timer.
+
+Pending reminders sit in a heap keyed by due time, so adding one costs
+O(log n). Cancelling marks the heap entry dead and leaves it to be dropped
+when it reaches the top; the heap is rebuilt once dead entries outnumber
+live ones. Only one QTimer exists, armed for the earliest deadline, so the
+pet does no work between deadlines however many reminders there are.
+
+Reminders are records of the store's 'reminders' collection:
+
+    {'id': ..., 'text': 'Stretch', 'due': '2024-05-01 09:00:00', 'recurrence': 'daily'}
+
+A one-off reminder is deleted when it fires. A recurring one moves on to
+its next occurrence after now, so reminders missed while the pet wasn't
+running fire once on startup instead of once per missed occurrence.
+"""
+import heapq
+import itertools
+import logging
+import time
+from datetime import datetime, timedelta
+
+from PySide6.QtCore import QObject, Qt, QTimer, Signal
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# recurrence -> step between occurrences; 'weekdays' steps a day, skipping weekends
+RECURRENCES = {
+    '': None,
+    'hourly': timedelta(hours=1),
+    'daily': timedelta(days=1),
+    'weekdays': timedelta(days=1),
+    'weekly': timedelta(weeks=1),
+}
+
+SNOOZE_MINUTES = 10
+
+# Longest single wait. The timer runs on the monotonic clock, so after a
+# suspend or a wall clock change the deadline is checked again within this.
+MAX_WAIT_MS = 60 * 60 * 1000
+
+
+def parse_due(text):
+    return datetime.strptime(text[:19], TIME_FORMAT)
+
+
+def format_due(when):
+    return when.strftime(TIME_FORMAT)
+
+
+def next_occurrence(due, recurrence, now):
+    """First occurrence of a recurring reminder after now, or None for a one-off"""
+    step = RECURRENCES.get(recurrence)
+    if step is None:
+        return None
+    if due <= now:
+        # Jump straight past now instead of stepping through every missed occurrence
+        due += step * ((now - due) // step + 1)
+    if recurrence == 'weekdays':
+        while due.weekday() >= 5:
+            due += step
+    return due
+
+
+class ReminderQueue:
+    """Reminder ids in a min-heap by due time, with lazy cancellation"""
+
+    def __init__(self):
+        self._heap = []
+        self._entries = {}   # id -> live heap entry [due, order, id]
+        self._order = itertools.count()  # Breaks ties between equal due times
+        self._dead = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, reminder_id):
+        return reminder_id in self._entries
+
+    def push(self, reminder_id, due):
+        """Schedule an id at a timestamp, replacing its earlier schedule"""
+        self.cancel(reminder_id)
+        entry = [due, next(self._order), reminder_id]
+        self._entries[reminder_id] = entry
+        heapq.heappush(self._heap, entry)
+
+    def cancel(self, reminder_id):
+        entry = self._entries.pop(reminder_id, None)
+        if entry is None:
+            return False
+        entry[2] = None
+        self._dead += 1
+        if self._dead > len(self._entries):
+            self._heap = [e for e in self._heap if e[2] is not None]
+            heapq.heapify(self._heap)
+            self._dead = 0
+        return True
+
+    def _drop_dead(self):
+        while self._heap and self._heap[0][2] is None:
+            heapq.heappop(self._heap)
+            self._dead -= 1
+
+    def next_due(self):
+        """Timestamp of the earliest reminder, or None"""
+        self._drop_dead()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """Ids of every reminder due at or before now, earliest first"""
+        due = []
+        self._drop_dead()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, reminder_id = heapq.heappop(self._heap)
+            del self._entries[reminder_id]
+            due.append(reminder_id)
+            self._drop_dead()
+        return due
+
+    def upcoming(self, limit):
+        """(due, id) of the next limit reminders"""
+        return [(e[0], e[2]) for e in heapq.nsmallest(limit, self._entries.values())]
+
+
+class ReminderScheduler(QObject):
+    """Keeps the store's reminders scheduled and reports them as they come due"""
+
+    # Reminder records that came due together, e.g. after the pet was closed for a while
+    remindersDue = Signal(list)
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.queue = ReminderQueue()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)  # Coarse timers may be 5% late
+        self._timer.timeout.connect(self._fire)
+        self.fired = 0
+
+    def load(self):
+        """Schedule every stored reminder; overdue ones fire straight away"""
+        for reminder in self.store.iterate('reminders'):
+            try:
+                self.queue.push(reminder['id'], parse_due(reminder['due']).timestamp())
+            except (KeyError, TypeError, ValueError):
+                logging.warning(f"Skipping malformed reminder: {reminder!r}")
+        logging.info(f"Scheduled {len(self.queue)} reminders")
+        self._arm()
+
+    def add(self, text, due, recurrence=''):
+        """Store and schedule a reminder; due is a datetime"""
+        if recurrence not in RECURRENCES:
+            raise ValueError(f"unknown recurrence {recurrence!r}")
+        reminder = self.store.add('reminders', {'text': text, 'due': format_due(due),
+                                                'recurrence': recurrence})
+        self.queue.push(reminder['id'], due.timestamp())
+        self._arm()
+        return reminder
+
+    def cancel(self, reminder_id):
+        """Unschedule and delete a reminder"""
+        reminder = self.store.get('reminders', reminder_id)
+        self.queue.cancel(reminder_id)
+        if reminder is not None:
+            self.store.delete('reminders', reminder)
+        self._arm()
+
+    def snooze(self, reminders, minutes=SNOOZE_MINUTES):
+        """Remind again in a few minutes, as one-off copies of fired reminders"""
+        due = datetime.now().replace(microsecond=0) + timedelta(minutes=minutes)
+        for reminder in reminders:
+            self.add(reminder['text'], due)
+
+    def upcoming(self, limit=200):
+        """The next limit reminder records, earliest first"""
+        records = (self.store.get('reminders', reminder_id) for _, reminder_id in self.queue.upcoming(limit))
+        return [record for record in records if record is not None]
+
+    def _arm(self):
+        due = self.queue.next_due()
+        if due is None:
+            self._timer.stop()
+            return
+        wait = max(0, int((due - time.time()) * 1000))
+        self._timer.start(min(wait, MAX_WAIT_MS))
+
+    def _fire(self):
+        now = datetime.now()
+        fired = []
+        for reminder_id in self.queue.pop_due(now.timestamp()):
+            reminder = self.store.get('reminders', reminder_id)
+            if reminder is None:
+                continue
+            fired.append(dict(reminder))
+            following = next_occurrence(parse_due(reminder['due']), reminder.get('recurrence') or '', now)
+            if following is None:
+                self.store.delete('reminders', reminder)
+            else:
+                self.store.update('reminders', reminder, due=format_due(following))
+                self.queue.push(reminder_id, following.timestamp())
+        self._arm()
+        if fired:
+            self.fired += len(fired)
+            self.remindersDue.emit(fired)
+
+    def stop(self):
+        self._timer.stop()
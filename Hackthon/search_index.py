@@ -0,0 +1,214 @@
+"""Full-text search over notes and todos.
+
+SearchIndex is an in-memory inverted index, used with the JSON store. It
+maps each word to the ids of the records containing it, and is updated
+as records are added, edited and deleted. Words are also kept in a sorted
+list, so every word starting with a prefix is found with two bisects.
+
+With SQLite the same job is done by FTS5 tables that triggers keep in
+sync with the todo and note tables. The DDL and the query builder below
+are shared by sqlite_store and the Flask app.
+
+Every word of a query has to match, and each one matches as a prefix, so
+results narrow as the user types.
+"""
+import heapq
+import itertools
+import logging
+import re
+import sqlite3
+from bisect import bisect_left, insort
+
+TOKEN_RE = re.compile(r'\w+')
+
+# collection -> (table, text column)
+SEARCHABLE = {
+    'notes': ('note', 'text'),
+    'todos': ('todo', 'text'),
+}
+
+
+def tokenize(text):
+    """Lowercased words of text"""
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def matches(text, query):
+    """Whether every word of query starts some word of text, as a search would find it"""
+    words = tokenize(text)
+    return all(any(word.startswith(term) for word in words) for term in tokenize(query))
+
+
+def contains(postings, order):
+    """Whether any of the sorted postings holds order"""
+    for posting in postings:
+        i = bisect_left(posting, order)
+        if i < len(posting) and posting[i] == order:
+            return True
+    return False
+
+
+class SearchIndex:
+    """Inverted index with prefix lookups.
+
+    Each record gets an order number when it is first added, and postings
+    are lists of order numbers kept sorted. A query walks the postings of
+    its most selective word in order and stops as soon as it has enough
+    results, so common words cost no more than rare ones.
+    """
+
+    # Prefixes matching more words than this are answered with a set union
+    # rather than a merge of that many postings
+    max_merge = 64
+
+    def __init__(self):
+        self._postings = {}   # word -> sorted order numbers of records containing it
+        self._words = []      # every word, sorted
+        self._docs = {}       # id -> (order number, its words)
+        self._ids = {}        # order number -> id
+        self._next_order = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, doc_id, text):
+        """Index a record's text, replacing what was indexed for it before"""
+        if doc_id in self._docs:
+            # An edited record keeps its place in the results
+            order = self._docs[doc_id][0]
+            self.remove(doc_id)
+        else:
+            order = self._next_order
+            self._next_order += 1
+        words = set(tokenize(text))
+        self._docs[doc_id] = (order, words)
+        self._ids[order] = doc_id
+        for word in words:
+            posting = self._postings.get(word)
+            if posting is None:
+                posting = self._postings[word] = []
+                insort(self._words, word)
+            if not posting or posting[-1] < order:
+                posting.append(order)
+            else:
+                insort(posting, order)
+
+    def remove(self, doc_id):
+        """Drop a record from the index. Returns False if it wasn't indexed."""
+        entry = self._docs.pop(doc_id, None)
+        if entry is None:
+            return False
+        order, words = entry
+        del self._ids[order]
+        for word in words:
+            posting = self._postings[word]
+            del posting[bisect_left(posting, order)]
+            if not posting:
+                del self._postings[word]
+                del self._words[bisect_left(self._words, word)]
+        return True
+
+    def _prefix_postings(self, prefix):
+        """Postings of every word starting with prefix"""
+        lo = bisect_left(self._words, prefix)
+        hi = bisect_left(self._words, prefix + '\U0010ffff', lo)
+        return [self._postings[word] for word in self._words[lo:hi]]
+
+    def _in_order(self, postings):
+        """Order numbers in any of postings, ascending and without repeats"""
+        if len(postings) == 1:
+            return iter(postings[0])
+        if len(postings) > self.max_merge:
+            return iter(sorted(set().union(*postings)))
+        return (order for order, _ in itertools.groupby(heapq.merge(*postings)))
+
+    def search(self, query, limit=None):
+        """Ids of records matching every word of query, in the order they were added"""
+        groups = []
+        for prefix in set(tokenize(query)):
+            postings = self._prefix_postings(prefix)
+            if not postings:
+                return []
+            groups.append((sum(map(len, postings)), prefix, postings))
+        if not groups:
+            return []
+        # Walk the most selective prefix and check each record against the others:
+        # by bisecting their postings when there are few, else by the record's words
+        groups.sort(key=lambda group: group[0])
+        lookups = [postings for _, _, postings in groups[1:] if len(postings) <= 4]
+        prefixes = [prefix for _, prefix, postings in groups[1:] if len(postings) > 4]
+        results = []
+        for order in self._in_order(groups[0][2]):
+            if not all(contains(postings, order) for postings in lookups):
+                continue
+            doc_id = self._ids[order]
+            if prefixes:
+                words = self._docs[doc_id][1]
+                if not all(any(w.startswith(p) for w in words) for p in prefixes):
+                    continue
+            results.append(doc_id)
+            if len(results) == limit:
+                break
+        return results
+
+
+# SQLite FTS5
+
+def fts_statements(table, column):
+    """DDL for an FTS5 index on table.column, kept in sync by triggers"""
+    fts = f'{table}_fts'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{column}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 0', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts} (rowid, {column}) VALUES (new.id, new.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {column} ON {table} BEGIN "
+        f"INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+        f"INSERT INTO {fts} (rowid, {column}) VALUES (new.id, new.{column}); END",
+    ]
+
+
+def install_fts(conn):
+    """Create the FTS5 indexes on a DB-API connection to SQLite.
+
+    Returns False if this SQLite build has no FTS5. Rows that existed before
+    the index are indexed once, when it is created.
+    """
+    cursor = conn.cursor()
+    try:
+        for table, column in SEARCHABLE.values():
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (f'{table}_fts',))
+            created = cursor.fetchone() is None
+            for statement in fts_statements(table, column):
+                cursor.execute(statement)
+            if created:
+                cursor.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+                logging.info(f"Built full-text index for {table}")
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        logging.warning(f"Full-text search unavailable, falling back to LIKE: {e}")
+        return False
+    finally:
+        cursor.close()
+    return True
+
+
+def fts_query(query):
+    """FTS5 MATCH expression requiring every word of query as a prefix"""
+    return ' '.join(f'"{word}"*' for word in tokenize(query))
+
+
+# Without FTS5, a word matches as a prefix at the start of the text or after one of these
+WORD_SEPARATORS = ' \n\t(["\'-/#'
+LIKE_ESCAPE = '\\'
+
+
+def like_prefix_patterns(word):
+    """LIKE patterns (ESCAPE LIKE_ESCAPE) matching text with a word starting with word"""
+    for char in (LIKE_ESCAPE, '%', '_'):
+        word = word.replace(char, LIKE_ESCAPE + char)
+    return [word + '%'] + [f'%{separator}{word}%' for separator in WORD_SEPARATORS]
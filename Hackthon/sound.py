@@ -0,0 +1,169 @@
+"""Low-latency looping sound effects.
+
+QMediaPlayer runs the whole media pipeline, MP3 decoding included, every
+time the movement sound starts, and loops by seeking back on EndOfMedia.
+LoopingSound decodes the MP3 to PCM once with QAudioDecoder, caches it as a
+WAV under DATA_DIR, and plays it with QSoundEffect. QSoundEffect keeps the
+samples in memory and loops them natively without a gap. The sound never
+overlaps itself, so one preloaded voice is enough.
+
+Decode CPU time and play-to-sound start latency are measured and logged.
+If the platform can't decode the MP3, playback falls back to QMediaPlayer.
+"""
+import array
+import hashlib
+import logging
+import os
+import time
+import wave
+
+from PySide6.QtCore import QObject, QUrl
+from PySide6.QtMultimedia import (QAudioDecoder, QAudioFormat, QSoundEffect, QMediaPlayer,
+                                  QAudioOutput)
+
+
+def wav_cache_path(source_path, cache_dir):
+    """Where the decoded PCM of source_path is cached"""
+    with open(source_path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:16]
+    return os.path.join(cache_dir, f'{digest}.wav')
+
+
+def pcm16(buffer):
+    """Samples of a QAudioBuffer as 16-bit PCM bytes, or None for unsupported formats"""
+    data = bytes(buffer.constData())[:buffer.byteCount()]
+    sample_format = buffer.format().sampleFormat()
+    if sample_format == QAudioFormat.SampleFormat.Int16:
+        return data
+    if sample_format == QAudioFormat.SampleFormat.Float:
+        floats = array.array('f', data)
+        return array.array('h', (int(max(-1.0, min(1.0, v)) * 32767) for v in floats)).tobytes()
+    return None
+
+
+class LoopingSound(QObject):
+    """A sound effect that loops while playing"""
+
+    def __init__(self, source_path, cache_dir, parent=None):
+        super().__init__(parent)
+        self.source_path = source_path
+        self.volume = 1.0
+        self.decode_wall_ms = None
+        self.decode_cpu_ms = None
+        self.start_latencies = []
+        self._play_requested_at = None
+        self._chunks = []
+        self._format = None
+        self._player = None
+        self._effect = QSoundEffect(self)
+        self._effect.setLoopCount(QSoundEffect.Loop.Infinite.value)
+        self._effect.playingChanged.connect(self._playing_changed)
+
+        os.makedirs(cache_dir, exist_ok=True)
+        if not os.path.exists(source_path):
+            logging.error(f"Sound file not found at: {source_path}")
+            return
+        self.wav_path = wav_cache_path(source_path, cache_dir)
+        if os.path.exists(self.wav_path):
+            logging.info(f"Using decoded sound from {self.wav_path}")
+            self._effect.setSource(QUrl.fromLocalFile(self.wav_path))
+        else:
+            self._decode()
+
+    # Decoding
+
+    def _decode(self):
+        """Decode the source once, asynchronously, into the WAV cache"""
+        logging.info(f"Decoding sound file {self.source_path}")
+        self._decode_started = (time.perf_counter(), time.process_time())
+        fmt = QAudioFormat()
+        fmt.setSampleFormat(QAudioFormat.SampleFormat.Int16)
+        self._decoder = QAudioDecoder(self)
+        self._decoder.setAudioFormat(fmt)
+        self._decoder.setSource(QUrl.fromLocalFile(self.source_path))
+        self._decoder.bufferReady.connect(self._buffer_ready)
+        self._decoder.finished.connect(self._decode_finished)
+        self._decoder.error.connect(self._decode_failed)
+        self._decoder.start()
+
+    def _buffer_ready(self):
+        buffer = self._decoder.read()
+        if self._format is None:
+            self._format = buffer.format()
+        data = pcm16(buffer)
+        if data is None:
+            self._decoder.stop()
+            self._decode_failed(None)
+            return
+        self._chunks.append(data)
+
+    def _decode_finished(self):
+        wall, cpu = self._decode_started
+        self.decode_wall_ms = (time.perf_counter() - wall) * 1000
+        self.decode_cpu_ms = (time.process_time() - cpu) * 1000
+        if not self._chunks:
+            self._decode_failed(None)
+            return
+        tmp_path = self.wav_path + '.tmp'
+        with wave.open(tmp_path, 'wb') as f:
+            f.setnchannels(self._format.channelCount())
+            f.setsampwidth(2)
+            f.setframerate(self._format.sampleRate())
+            f.writeframes(b''.join(self._chunks))
+        os.replace(tmp_path, self.wav_path)
+        self._chunks = []
+        logging.info(f"Decoded sound in {self.decode_wall_ms:.0f} ms "
+                     f"({self.decode_cpu_ms:.0f} ms CPU), cached at {self.wav_path}")
+        self._effect.setSource(QUrl.fromLocalFile(self.wav_path))
+
+    def _decode_failed(self, error):
+        if self._player is not None:
+            return
+        logging.warning(f"Could not decode {self.source_path} ({error}), using QMediaPlayer")
+        self._chunks = []
+        self._player = QMediaPlayer(self)
+        self._audio_output = QAudioOutput(self)
+        self._audio_output.setVolume(self.volume)
+        self._player.setAudioOutput(self._audio_output)
+        self._player.setLoops(QMediaPlayer.Loops.Infinite)
+        self._player.setSource(QUrl.fromLocalFile(self.source_path))
+        self._player.errorOccurred.connect(
+            lambda error, error_string: logging.error(f"Media player error {error}: {error_string}"))
+
+    # Playback
+
+    def play(self):
+        """Start the loop from the beginning"""
+        self._play_requested_at = time.perf_counter()
+        if self._player is not None:
+            self._player.setPosition(0)
+            self._player.play()
+        elif self._effect.isLoaded():
+            self._effect.play()
+
+    def stop(self):
+        if self._player is not None:
+            self._player.stop()
+        self._effect.stop()
+
+    def set_volume(self, volume):
+        self.volume = volume
+        self._effect.setVolume(volume)
+        if self._player is not None:
+            self._audio_output.setVolume(volume)
+
+    def _playing_changed(self):
+        if self._effect.isPlaying() and self._play_requested_at is not None:
+            self.start_latencies.append((time.perf_counter() - self._play_requested_at) * 1000)
+            self._play_requested_at = None
+
+    def stats(self):
+        latencies = sorted(self.start_latencies)
+        return {
+            'backend': 'QMediaPlayer' if self._player is not None else 'QSoundEffect',
+            'decode_wall_ms': None if self.decode_wall_ms is None else round(self.decode_wall_ms, 1),
+            'decode_cpu_ms': None if self.decode_cpu_ms is None else round(self.decode_cpu_ms, 1),
+            'plays': len(latencies),
+            'start_latency_median_ms': round(latencies[len(latencies) // 2], 1) if latencies else None,
+            'start_latency_max_ms': round(latencies[-1], 1) if latencies else None,
+        }
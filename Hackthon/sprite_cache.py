@@ -0,0 +1,349 @@
+"""Decoded, pre-scaled animation frames for the pet.
+
+QMovie decodes GIF frames over and over while it plays and has to start
+over whenever its scaled size changes. SpriteCache decodes each GIF once
+at the size the pet is shown at and keeps the frames as QPixmaps, with an
+LRU bound on the total bytes held in memory. Callers hold on to no more
+than the sprite they are playing, so the bound is what the pet uses. Decoded frames are also saved
+as a sprite sheet PNG under DATA_DIR, keyed by a hash of the GIF and the
+frame size, so later launches skip GIF decoding too. request() does the
+reading and decoding on a QThreadPool thread and only turns the frames
+into QPixmaps, which must be made on the GUI thread, when they arrive.
+SpriteAnimation plays a Sprite on a QLabel.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+from collections import OrderedDict
+
+from PySide6.QtCore import Qt, QObject, QRunnable, QSize, QRect, QThreadPool, QTimer, Signal, Slot
+from PySide6.QtGui import QImage, QImageReader, QPainter, QPixmap
+
+
+class Sprite:
+    """The frames of one animation at one size"""
+
+    def __init__(self, frames, delays, source_size):
+        self.frames = frames
+        self.delays = delays
+        self.source_size = source_size
+
+    @property
+    def size(self):
+        return self.frames[0].size() if self.frames else QSize()
+
+    @property
+    def nbytes(self):
+        return sum(f.width() * f.height() * 4 for f in self.frames)
+
+
+def read_source_size(path):
+    """Native frame size of an image file, without decoding it"""
+    return QImageReader(path).size()
+
+
+def decode_frames(path, size):
+    """Decode every frame of path, scaled to size. Returns (images, delays)."""
+    reader = QImageReader(path)
+    images, delays = [], []
+    while True:
+        image = reader.read()
+        if image.isNull():
+            break
+        if size.isValid() and image.size() != size:
+            image = image.scaled(size, Qt.AspectRatioMode.IgnoreAspectRatio,
+                                 Qt.TransformationMode.SmoothTransformation)
+        images.append(image.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied))
+        # GIFs with no delay play at about 10 fps in browsers; do the same
+        delays.append(reader.nextImageDelay() or 100)
+    return images, delays
+
+
+def sheet_grid(count):
+    """Columns and rows of a roughly square sprite sheet"""
+    columns = max(1, math.ceil(math.sqrt(count)))
+    return columns, max(1, math.ceil(count / columns))
+
+
+class DecodeSignals(QObject):
+    # (key, images, delays, source size, read from the disk cache)
+    decoded = Signal(object)
+
+
+class DecodeTask(QRunnable):
+    """Reads one sprite's frames as QImages on a pool thread"""
+
+    def __init__(self, cache, key):
+        super().__init__()
+        self.cache = cache
+        self.key = key
+        # Lives on the GUI thread, so emitting from the pool thread queues the call to the cache.
+        # It is the task's own, so a task still running when the cache is deleted emits into nothing.
+        self.signals = DecodeSignals()
+        self.signals.decoded.connect(cache._frames_decoded)
+
+    def run(self):
+        path, width, height = self.key
+        try:
+            result = (self.key,) + self.cache.read_frames(path, QSize(width, height))
+        except Exception:
+            logging.exception(f"Could not decode {path}")
+            result = (self.key, [], [], QSize(), False)
+        self.signals.decoded.emit(result)
+
+
+class SpriteCache(QObject):
+    """LRU of decoded sprites, backed by a sprite sheet cache on disk"""
+
+    # Any two of the pet's three animations at the default size
+    def __init__(self, cache_dir, max_bytes=192 * 1024 * 1024, parent=None):
+        super().__init__(parent)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._sprites = OrderedDict()
+        self._hashes = {}
+        self._thumbnail_size = None
+        self._decoding = set()   # Keys with a DecodeTask running
+        self._requests = []      # [(sprites so far, keys still missing, callback)]
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(2)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, path, size):
+        """The sprite for path scaled to size (a QSize), loaded right away on this thread"""
+        key = (path, size.width(), size.height())
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self._sprites.move_to_end(key)
+            self.hits += 1
+            return sprite
+        return self._add(key, *self.read_frames(path, size))
+
+    def request(self, paths, size, callback):
+        """Load the sprites for paths at size without blocking the GUI thread.
+
+        callback gets {path: sprite} once every one of them is in, right away
+        if they already are.
+        """
+        sprites, missing = {}, set()
+        for path in paths:
+            key = (path, size.width(), size.height())
+            sprite = self._sprites.get(key)
+            if sprite is not None:
+                self._sprites.move_to_end(key)
+                self.hits += 1
+                sprites[path] = sprite
+                continue
+            missing.add(key)
+            if key not in self._decoding:
+                self._decoding.add(key)
+                self._pool.start(DecodeTask(self, key))
+        if missing:
+            self._requests.append((sprites, missing, callback))
+        else:
+            callback(sprites)
+
+    def stop(self):
+        """Drop queued decodes and wait for the running ones; pending request() callbacks never run"""
+        self._pool.clear()
+        self._pool.waitForDone()
+        self._requests.clear()
+
+    def read_frames(self, path, size):
+        """(images, delays, source size, from disk) for path at size, as QImages.
+
+        Safe to call off the GUI thread: nothing here makes a QPixmap.
+        """
+        loaded = self._load_sheet(path, size)
+        if loaded is not None:
+            return loaded + (True,)
+        images, delays = decode_frames(path, size)
+        if images:
+            self._save_sheet(path, size, images, delays)
+        return images, delays, read_source_size(path), False
+
+    @Slot(object)
+    def _frames_decoded(self, result):
+        key = result[0]
+        self._decoding.discard(key)
+        sprite = self._add(*result)
+        for request in list(self._requests):
+            sprites, missing, callback = request
+            if key in missing:
+                missing.discard(key)
+                sprites[key[0]] = sprite
+                if not missing:
+                    self._requests.remove(request)
+                    callback(sprites)
+
+    def _add(self, key, images, delays, source_size, from_disk):
+        if from_disk:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+        sprite = Sprite([QPixmap.fromImage(image) for image in images], delays, source_size)
+        self._insert(key, sprite)
+        return sprite
+
+    def _insert(self, key, sprite):
+        self._sprites[key] = sprite
+        self.total_bytes += sprite.nbytes
+        # Evict least recently used sprites, but never the one just loaded
+        while self.total_bytes > self.max_bytes and len(self._sprites) > 1:
+            _, evicted = self._sprites.popitem(last=False)
+            self.total_bytes -= evicted.nbytes
+
+    def stats(self):
+        return {'sprites': len(self._sprites), 'bytes': self.total_bytes, 'hits': self.hits,
+                'disk_hits': self.disk_hits, 'misses': self.misses}
+
+    # Startup thumbnail
+
+    def thumbnail_path(self):
+        return os.path.join(self.cache_dir, 'startup_frame.png')
+
+    def load_thumbnail(self):
+        """The still shown while the pet starts up, or None on first launch"""
+        path = self.thumbnail_path()
+        if not os.path.exists(path):
+            return None
+        pixmap = QPixmap(path)
+        if pixmap.isNull():
+            return None
+        self._thumbnail_size = pixmap.size()
+        return pixmap
+
+    def save_thumbnail(self, sprite):
+        """Remember the first frame of sprite as the next startup still"""
+        if not sprite.frames:
+            return
+        frame = sprite.frames[0]
+        if self._thumbnail_size is None and os.path.exists(self.thumbnail_path()):
+            self._thumbnail_size = QImageReader(self.thumbnail_path()).size()
+        if self._thumbnail_size == frame.size():
+            return
+        if frame.save(self.thumbnail_path(), 'PNG'):
+            self._thumbnail_size = frame.size()
+        else:
+            logging.warning("Could not write the startup thumbnail")
+
+    # Disk cache
+
+    def _file_hash(self, path):
+        stat = os.stat(path)
+        cache_key = (path, stat.st_mtime_ns, stat.st_size)
+        if cache_key not in self._hashes:
+            with open(path, 'rb') as f:
+                self._hashes[cache_key] = hashlib.sha1(f.read()).hexdigest()[:16]
+        return self._hashes[cache_key]
+
+    def _sheet_paths(self, path, size):
+        name = f"{self._file_hash(path)}_{size.width()}x{size.height()}"
+        base = os.path.join(self.cache_dir, name)
+        return base + '.png', base + '.json'
+
+    def _load_sheet(self, path, size):
+        try:
+            sheet_path, meta_path = self._sheet_paths(path, size)
+            if not (os.path.exists(sheet_path) and os.path.exists(meta_path)):
+                return None
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            sheet = QImage(sheet_path)
+            if sheet.isNull():
+                return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring broken sprite cache for {path}: {e}")
+            return None
+        width, height = meta['width'], meta['height']
+        columns, _ = sheet_grid(len(meta['delays']))
+        frames = [sheet.copy(QRect((i % columns) * width, (i // columns) * height, width, height))
+                  for i in range(len(meta['delays']))]
+        return frames, meta['delays'], QSize(*meta['source_size'])
+
+    def _save_sheet(self, path, size, images, delays):
+        width, height = images[0].width(), images[0].height()
+        columns, rows = sheet_grid(len(images))
+        sheet = QImage(width * columns, height * rows, QImage.Format.Format_ARGB32_Premultiplied)
+        sheet.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(sheet)
+        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
+        for i, image in enumerate(images):
+            painter.drawImage((i % columns) * width, (i // columns) * height, image)
+        painter.end()
+        sheet_path, meta_path = self._sheet_paths(path, size)
+        source_size = read_source_size(path)
+        try:
+            # Write the sheet before its metadata, so a sheet is only used once complete
+            sheet.save(sheet_path + '.tmp.png')
+            os.replace(sheet_path + '.tmp.png', sheet_path)
+            with open(meta_path, 'w') as f:
+                json.dump({'width': width, 'height': height, 'delays': delays,
+                           'source_size': [source_size.width(), source_size.height()]}, f)
+        except OSError as e:
+            logging.warning(f"Could not write sprite cache for {path}: {e}")
+
+
+class SpriteAnimation(QObject):
+    """Plays a Sprite on a QLabel using each frame's own delay"""
+
+    def __init__(self, label, parent=None):
+        super().__init__(parent)
+        self.label = label
+        self.sprite = None
+        self.frame = 0
+        self.slowdown = 1
+        self.paused = False
+        self.frames_shown = 0
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._advance)
+
+    def play(self, sprite, keep_frame=False):
+        """Show sprite from its first frame, or from the current frame when resizing"""
+        self.sprite = sprite
+        if not sprite.frames:
+            self._timer.stop()
+            return
+        self.frame = self.frame % len(sprite.frames) if keep_frame else 0
+        self._show()
+
+    def stop(self):
+        self._timer.stop()
+
+    def set_slowdown(self, factor):
+        """Stretch every frame delay by factor to lower the frame rate"""
+        self.slowdown = factor
+
+    def pause(self):
+        """Hold the current frame; nothing runs until resume()"""
+        self.paused = True
+        self._timer.stop()
+
+    def resume(self):
+        if self.paused:
+            self.paused = False
+            if self.sprite and self.sprite.frames:
+                self._show()
+
+    def is_playing(self):
+        return self._timer.isActive()
+
+    def current_pixmap(self):
+        return self.sprite.frames[self.frame] if self.sprite and self.sprite.frames else QPixmap()
+
+    def _show(self):
+        self.label.setPixmap(self.sprite.frames[self.frame])
+        self.frames_shown += 1
+        if len(self.sprite.frames) > 1 and not self.paused:
+            self._timer.start(self.sprite.delays[self.frame] * self.slowdown)
+
+    def _advance(self):
+        self.frame = (self.frame + 1) % len(self.sprite.frames)
+        self._show()
@@ -0,0 +1,295 @@
+"""SQLite storage backend for the desktop pet.
+
+Uses the same todo/note/period_record tables that app.py's Flask models
+create, so the desktop pet can be pointed at instance/app.db or at its own
+database. Nothing is loaded up front: dialogs fetch the rows they show.
+All statements are constant, parameterized SQL, so sqlite3's statement
+cache reuses the prepared statements. Notes and todos are searched through
+FTS5 indexes that triggers keep up to date (see search_index).
+
+In the web app's database every write is also logged to its sync_change
+table, the way the app logs its own (see models.log_changes). The app's
+response cache, live updates, cycle statistics and sync all find changes
+there, so they see the pet's and bulk_io's writes too.
+"""
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+import uuid
+
+from migrations import NOTE_LENGTH_TRIGGERS
+from search_index import SEARCHABLE, install_fts, fts_query, like_prefix_patterns, tokenize, LIKE_ESCAPE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS todo (
+    id INTEGER NOT NULL,
+    text VARCHAR(200) NOT NULL,
+    completed BOOLEAN,
+    PRIMARY KEY (id)
+);
+CREATE TABLE IF NOT EXISTS note (
+    id INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    timestamp DATETIME,
+    PRIMARY KEY (id)
+);
+CREATE TABLE IF NOT EXISTS period_record (
+    id INTEGER NOT NULL,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    PRIMARY KEY (id)
+);
+CREATE TABLE IF NOT EXISTS reminder (
+    id INTEGER NOT NULL,
+    text VARCHAR(200) NOT NULL,
+    due DATETIME,
+    recurrence VARCHAR(16),
+    PRIMARY KEY (id)
+);
+CREATE TABLE IF NOT EXISTS setting (
+    key VARCHAR(64) NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (key)
+);
+CREATE INDEX IF NOT EXISTS ix_note_timestamp ON note (timestamp);
+CREATE INDEX IF NOT EXISTS ix_period_record_start_date ON period_record (start_date);
+CREATE INDEX IF NOT EXISTS ix_todo_completed ON todo (completed);
+""" + ''.join(f"{statement};\n" for statement in NOTE_LENGTH_TRIGGERS)
+
+# collection name -> (table, columns, ORDER BY used by the dialogs)
+TABLES = {
+    'todos': ('todo', ('text', 'completed'), 'id'),
+    # Flask stores microseconds; the desktop pet shows whole seconds
+    'notes': ('note', ('text', 'timestamp'), 'timestamp, id'),
+    'period_records': ('period_record', ('start_date', 'end_date'), 'start_date DESC, id DESC'),
+    # Desktop only, the web app has no reminders
+    'reminders': ('reminder', ('text', 'due', 'recurrence'), 'due, id'),
+}
+
+# Collections the web app logs to sync_change, under its sync kinds
+LOGGED = ('notes', 'todos', 'period_records')
+SERVER_ORIGIN = 'server'  # models.SERVER_ORIGIN: changes made on the web app's side
+
+
+def row_to_record(collection, row):
+    record = dict(row)
+    if collection == 'todos':
+        record['completed'] = bool(record['completed'])
+    elif collection == 'notes' and record['timestamp']:
+        record['timestamp'] = record['timestamp'][:19]
+    return record
+
+
+class SQLiteStore:
+    """Storage backend on top of an SQLite database"""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+        self._statements = {}
+        self.fts = False
+        self.sync_log = False
+
+    def load(self):
+        """Open the database and create missing tables and indexes"""
+        self.conn = sqlite3.connect(self.path, cached_statements=256)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self.fts = install_fts(self.conn)
+        self.sync_log = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sync_change'").fetchone() is not None
+        for collection, (table, columns, order) in TABLES.items():
+            self._statements[collection] = {
+                'count': f'SELECT COUNT(*) FROM {table}',
+                'fetch': f'SELECT id, {", ".join(columns)} FROM {table} ORDER BY {order} LIMIT ? OFFSET ?',
+                'get': f'SELECT id, {", ".join(columns)} FROM {table} WHERE id = ?',
+                'insert': f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+                'delete': f'DELETE FROM {table} WHERE id = ?',
+            }
+            if collection in SEARCHABLE:
+                # FTS5 pages through the matches in rowid order instead of sorting them all;
+                # rowids follow the display order of notes and todos, both oldest first
+                self._statements[collection]['search'] = (
+                    f'SELECT id, {", ".join(columns)} FROM {table} WHERE id IN '
+                    f'(SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ? ORDER BY rowid LIMIT ? OFFSET ?) '
+                    f'ORDER BY {order}')
+        return self
+
+    # Queries
+
+    def count(self, collection):
+        """Number of records in a collection"""
+        return self.conn.execute(self._statements[collection]['count']).fetchone()[0]
+
+    def fetch(self, collection, offset=0, limit=None):
+        """Records of a collection in display order"""
+        sql = self._statements[collection]['fetch']
+        rows = self.conn.execute(sql, (-1 if limit is None else limit, offset))
+        return [row_to_record(collection, row) for row in rows]
+
+    def get(self, collection, record_id):
+        """Look up a record by id"""
+        row = self.conn.execute(self._statements[collection]['get'], (record_id,)).fetchone()
+        return row_to_record(collection, row) if row else None
+
+    def search(self, collection, query, offset=0, limit=200):
+        """Records whose text contains every word of query, as a prefix, in display order"""
+        words = tokenize(query)
+        if not words:
+            return []
+        if self.fts:
+            rows = self.conn.execute(self._statements[collection]['search'], (fts_query(query), limit, offset))
+        else:
+            table, columns, order = TABLES[collection]
+            patterns = [like_prefix_patterns(word) for word in words]
+            word_clauses = ['(' + ' OR '.join([f"text LIKE ? ESCAPE '{LIKE_ESCAPE}'"] * len(p)) + ')'
+                            for p in patterns]
+            sql = (f'SELECT id, {", ".join(columns)} FROM {table} WHERE '
+                   + ' AND '.join(word_clauses) + f' ORDER BY {order} LIMIT ? OFFSET ?')
+            rows = self.conn.execute(sql, [pattern for p in patterns for pattern in p] + [limit, offset])
+        return [row_to_record(collection, row) for row in rows]
+
+    def iterate(self, collection, batch_size=1000):
+        """Every record of a collection in display order, read from a cursor in batches"""
+        cursor = self.conn.execute(self._statements[collection]['fetch'], (-1, 0))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield row_to_record(collection, row)
+
+    def get_setting(self, key, default=None):
+        row = self.conn.execute('SELECT value FROM setting WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    # Mutations
+
+    def add(self, collection, record):
+        """Insert a record and store its new id on it"""
+        columns = TABLES[collection][1]
+        with self.conn:
+            cursor = self.conn.execute(self._statements[collection]['insert'],
+                                       [record.get(c) for c in columns])
+            self._log(collection, cursor.lastrowid)
+        record['id'] = cursor.lastrowid
+        return record
+
+    def add_many(self, collection, records):
+        """Insert records in bulk with one executemany in one transaction"""
+        table, columns, _ = TABLES[collection]
+        logged = self.sync_log and collection in LOGGED
+        with self.conn:
+            if logged:
+                # Taking the write lock first keeps other writers' ids out of the range logged below
+                self.conn.execute('BEGIN IMMEDIATE')
+                last_id = self.conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}').fetchone()[0]
+            cursor = self.conn.executemany(self._statements[collection]['insert'],
+                                           ([r.get(c) for c in columns] for r in records))
+            if logged:
+                # New rows need no uid lookups, as in models.log_inserted
+                self.conn.execute(
+                    f"INSERT INTO sync_change (uid, kind, row_id, seq, updated_at, origin, deleted) "
+                    f"SELECT lower(hex(randomblob(16))), ?, id, "
+                    f"(SELECT COALESCE(MAX(seq), 0) FROM sync_change) + ROW_NUMBER() OVER (ORDER BY id), "
+                    f"?, ?, 0 FROM {table} WHERE id > ?",
+                    (collection, time.time(), SERVER_ORIGIN, last_id))
+        return cursor.rowcount
+
+    def update(self, collection, record, **fields):
+        """Change some fields of a record"""
+        table, columns, _ = TABLES[collection]
+        names = [name for name in fields if name in columns]
+        if names:
+            sql = f'UPDATE {table} SET {", ".join(f"{n} = ?" for n in names)} WHERE id = ?'
+            with self.conn:
+                cursor = self.conn.execute(sql, [fields[n] for n in names] + [record['id']])
+                if cursor.rowcount:
+                    self._log(collection, record['id'])
+        record.update(fields)
+        return record
+
+    def delete(self, collection, record):
+        """Remove a record. Returns False if it did not exist."""
+        with self.conn:
+            cursor = self.conn.execute(self._statements[collection]['delete'], (record['id'],))
+            if cursor.rowcount:
+                self._log(collection, record['id'], deleted=True)
+        return cursor.rowcount > 0
+
+    def _log(self, collection, row_id, deleted=False):
+        """Log a change to the web app's sync_change table, in the caller's transaction"""
+        if not (self.sync_log and collection in LOGGED):
+            return
+        row = self.conn.execute('SELECT uid FROM sync_change WHERE kind = ? AND row_id = ? AND NOT deleted',
+                                (collection, row_id)).fetchone()
+        self.conn.execute(
+            'INSERT OR REPLACE INTO sync_change (uid, kind, row_id, seq, updated_at, origin, deleted) '
+            'VALUES (?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM sync_change), ?, ?, ?)',
+            (row[0] if row else uuid.uuid4().hex, collection, row_id, time.time(), SERVER_ORIGIN, deleted))
+
+    def set(self, key, value):
+        """Set a setting such as pet_size"""
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO setting (key, value) VALUES (?, ?)',
+                              (key, json.dumps(value)))
+
+    # Lifecycle, matching JournalStore
+
+    def stats(self):
+        return {'pending': 0, 'coalesced': 0, 'batches': 0, 'compactions': 0}
+
+    def flush(self):
+        self.conn.commit()
+
+    def checkpoint(self):
+        self.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
+
+
+def migrate_json(json_path, db_path):
+    """Copy pet_data.json (and its journal) into an SQLite database in one transaction"""
+    from pet_store import JournalStore
+
+    source = JournalStore(json_path)
+    data = source.load()
+    source.close()
+    store = SQLiteStore(db_path).load()
+    try:
+        with store.conn:
+            for collection, (table, columns, _) in TABLES.items():
+                records = [r for r in data.get(collection, []) if isinstance(r, dict)]
+                store.conn.executemany(
+                    store._statements[collection]['insert'],
+                    ([r.get(c) for c in columns] for r in records))
+                logging.info(f"Migrated {len(records)} {collection} into {table}")
+            # Collections, and the JSON store's sync bookkeeping, aren't settings
+            skipped = ('notes', 'todos', 'period_records', 'reminders', 'tombstones', 'sync', 'pushed_rev')
+            for key, value in data.items():
+                if key not in skipped:
+                    store.conn.execute('INSERT OR REPLACE INTO setting (key, value) VALUES (?, ?)',
+                                       (key, json.dumps(value)))
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    # Usage: python sqlite_store.py path/to/pet_data.json path/to/pet_data.db
+    if len(sys.argv) != 3:
+        print("Usage: python sqlite_store.py <pet_data.json> <database.db>")
+        sys.exit(1)
+    if not os.path.exists(sys.argv[1]):
+        print(f"{sys.argv[1]} does not exist")
+        sys.exit(1)
+    logging.basicConfig(level=logging.INFO)
+    migrate_json(sys.argv[1], sys.argv[2])
@@ -0,0 +1,196 @@
+"""Two-way sync between the desktop pet's JSON store and the Flask app.
+
+The store stamps every local change with a revision number, and deletes
+leave tombstones (see pet_store). A sync round pushes the changes made
+since the last push, together with the server's cursor from the previous
+round. The server answers with the changes past that cursor. Only those
+deltas travel, so one edited note costs one small request however many
+notes there are.
+
+Records are matched across sides by uid. Records made on the desktop use
+their own id, and those made on the server get a fresh uuid. Conflicts
+go to the change with the later (updated_at, origin) on both sides, so
+every side picks the same winner. Changes the server rejects are kept in
+the sync state and pushed again every round until it takes them, the
+record is changed again, or a change from the server replaces it.
+
+Run one sync from the command line, with the web app running:
+
+    python sync.py --url http://127.0.0.1:5000 --data-dir ~/.desktop_pet
+"""
+import argparse
+import heapq
+import itertools
+import json
+import logging
+import os
+import re
+import urllib.error
+import urllib.request
+
+from bulk_io import FIELDS
+from pet_store import JournalStore, new_id
+
+SYNC_COLLECTIONS = tuple(FIELDS)
+PUSH_LIMIT = 500  # The server's page size
+UID_RE = re.compile(r'[0-9a-f]{32}')
+
+
+class SyncError(Exception):
+    pass
+
+
+class SyncClient:
+    """Sync state of a JournalStore and the rounds that update it.
+
+    prepare() and apply() touch the store and belong on the thread that owns
+    it; exchange() only does the HTTP request and can run anywhere.
+    """
+
+    def __init__(self, store, url, timeout=10):
+        self.store = store
+        self.url = url.rstrip('/') + '/api/sync'
+        self.timeout = timeout
+        state = store.get_setting('sync') or {}
+        self.client_id = state.get('client_id') or new_id()
+        self.cursor = state.get('cursor', 0)
+        self.rejected = dict(state.get('rejected', {}))  # uid -> collection, for changes to push again
+        self.pushed_rev = store.get_setting('pushed_rev', 0)
+
+    def uid(self, record_id):
+        # Ids given to pre-journal records ('notes-0') are only unique on this machine
+        return record_id if UID_RE.fullmatch(record_id) else f'{self.client_id}:{record_id}'
+
+    def local_id(self, uid):
+        prefix = self.client_id + ':'
+        return uid[len(prefix):] if uid.startswith(prefix) else uid
+
+    def prepare(self):
+        """Request body pushing the oldest local changes since the last push.
+
+        At most PUSH_LIMIT go in one request; 'rev' is the revision up to
+        which every change is included, and 'more' says whether any are left.
+        Records from before change tracking are stamped first, so the first
+        sync pushes them too.
+        """
+        stamped = self.store.stamp_untracked(SYNC_COLLECTIONS)
+        if stamped:
+            logging.info(f"Sync will push {stamped} records saved before change tracking")
+        pending = itertools.chain(
+            ((record['rev'], collection, record, deleted)
+             for collection, record, deleted in self.store.changes_since(self.pushed_rev)
+             if collection in SYNC_COLLECTIONS),
+            self._retries())
+        oldest = heapq.nsmallest(PUSH_LIMIT + 1, pending, key=lambda change: change[0])
+        more = len(oldest) > PUSH_LIMIT
+        oldest = oldest[:PUSH_LIMIT]
+        changes = [{
+            'uid': self.uid(record['id']),
+            'kind': collection,
+            'updated_at': record['updated_at'],
+            'deleted': deleted,
+            'record': None if deleted else {f: record.get(f) for f in FIELDS[collection]},
+        } for _, collection, record, deleted in oldest]
+        return {'client_id': self.client_id, 'cursor': self.cursor, 'changes': changes,
+                'rev': oldest[-1][0] if more else self.store.revision, 'more': more}
+
+    def _retries(self):
+        """Rejected changes not changed again since, which changes_since() no longer yields"""
+        for uid, collection in self.rejected.items():
+            record_id = self.local_id(uid)
+            record, deleted = self.store.get(collection, record_id), False
+            if record is None:
+                tomb = self.store.tombstone(collection, record_id)
+                record, deleted = tomb and dict(tomb, id=record_id), True
+            # A record changed again has a rev past pushed_rev and is pushed anyway
+            if record is not None and 0 < record.get('rev', 0) <= self.pushed_rev:
+                yield record['rev'], collection, record, deleted
+
+    def exchange(self, payload):
+        """Send a prepared request; returns the server's response"""
+        body = {key: payload[key] for key in ('client_id', 'cursor', 'changes')}
+        request = urllib.request.Request(self.url, data=json.dumps(body).encode(), method='POST',
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise SyncError(f"sync failed with HTTP {e.code}: {e.read()[:200]!r}")
+
+    def apply(self, payload, response):
+        """Apply the server's changes. Returns the number of records changed."""
+        # The ones pushed this round are rejected again or done with
+        pushed = {change['uid']: change['kind'] for change in payload['changes']}
+        self.rejected = {uid: kind for uid, kind in self.rejected.items() if uid not in pushed}
+        for problem in response.get('rejected', []):
+            logging.warning(f"Sync rejected {problem['uid']}: {problem['error']}")
+            if problem['uid'] in pushed:
+                self.rejected[problem['uid']] = pushed[problem['uid']]
+        applied = 0
+        for change in response['changes']:
+            if self._apply_change(change, payload['rev']):
+                applied += 1
+        self.cursor = response['cursor']
+        # Idle rounds change nothing, so they write nothing to the journal
+        if payload['rev'] != self.pushed_rev:
+            self.pushed_rev = payload['rev']
+            # Tombstones of rejected deletes are kept to push them again
+            self.store.mark_pushed(self.pushed_rev, keep={(kind, self.local_id(uid))
+                                                          for uid, kind in self.rejected.items()})
+        state = {'client_id': self.client_id, 'cursor': self.cursor, 'rejected': dict(self.rejected)}
+        if state != self.store.get_setting('sync'):
+            self.store.set('sync', state)
+        return applied
+
+    def _apply_change(self, change, pushed_rev):
+        collection = change['kind']
+        if collection not in SYNC_COLLECTIONS:
+            return False
+        record_id = self.local_id(change['uid'])
+        local = self.store.get(collection, record_id) or self.store.tombstone(collection, record_id)
+        # A local change made after prepare(), or rejected, isn't on the server yet: the later change wins
+        unpushed = local is not None and (local.get('rev', 0) > pushed_rev or change['uid'] in self.rejected)
+        if unpushed and (local['updated_at'], self.client_id) > (change['updated_at'], change['origin']):
+            return False
+        self.rejected.pop(change['uid'], None)  # The server's change replaces the rejected one
+        existing = self.store.get(collection, record_id)
+        if change['deleted']:
+            return existing is not None and self.store.delete(collection, existing, track=False)
+        # rev 0 marks the record as in step with the server
+        fields = dict(change['record'], updated_at=change['updated_at'], rev=0)
+        if existing is not None:
+            self.store.update(collection, existing, track=False, **fields)
+        else:
+            self.store.add(collection, dict(fields, id=record_id), track=False)
+        return True
+
+    def sync(self):
+        """Run rounds until the server has nothing more. Returns (pushed, pulled)."""
+        pushed = pulled = 0
+        while True:
+            payload = self.prepare()
+            response = self.exchange(payload)
+            pushed += len(payload['changes'])
+            pulled += self.apply(payload, response)
+            if not response['more'] and not payload['more']:
+                return pushed, pulled
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync the desktop pet's data with the web app")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--data-dir', default=os.path.join(os.path.expanduser('~'), '.desktop_pet'))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    os.makedirs(args.data_dir, exist_ok=True)
+    store = JournalStore(os.path.join(args.data_dir, 'pet_data.json'))
+    store.load()
+    try:
+        pushed, pulled = SyncClient(store, args.url).sync()
+        print(f"Pushed {pushed} changes, pulled {pulled}")
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
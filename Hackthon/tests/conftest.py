@@ -0,0 +1,59 @@
+"""Fixtures for the tests.
+
+From Hackthon/: python -m pytest tests
+
+HOME points at a scratch directory so nothing touches the real
+~/.desktop_pet, and the web app runs on a scratch database. The app is
+imported once per session, so tests share that database; each test works
+with records it makes itself.
+"""
+import os
+import sys
+import tempfile
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+TEST_HOME = tempfile.mkdtemp(prefix='pet-test-')
+os.environ['HOME'] = os.environ['USERPROFILE'] = TEST_HOME
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TEST_HOME, 'app.db')
+os.environ.pop('SQL_PROFILING', None)
+
+HACKTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HACKTHON_DIR)
+
+import pytest
+
+
+@pytest.fixture(scope='session')
+def web_app():
+    from app import app
+    from models import init_db
+    with app.app_context():
+        init_db()
+    return app
+
+
+@pytest.fixture
+def client(web_app):
+    return web_app.test_client()
+
+
+@pytest.fixture
+def open_store(tmp_path):
+    """Opens JournalStores under tmp_path and closes them after the test"""
+    from pet_store import JournalStore
+    stores = []
+
+    def open_(name='pet_data.json'):
+        store = JournalStore(str(tmp_path / name), flush_interval=0.01)
+        store.load()
+        stores.append(store)
+        return store
+    yield open_
+    for store in stores:
+        store.close()
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    from PySide6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
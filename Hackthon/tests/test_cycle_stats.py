@@ -0,0 +1,30 @@
+"""CycleStats kept up to date by add and remove against a fresh build"""
+import random
+from datetime import date, timedelta
+
+from cycle_stats import CycleStats
+
+
+def period(start, length=5):
+    return {'start_date': start.isoformat(), 'end_date': (start + timedelta(days=length - 1)).isoformat()}
+
+
+def test_updates_in_any_order_match_a_rebuild():
+    rng = random.Random(12)
+    day = date(2020, 1, 1)
+    records = []
+    for _ in range(60):
+        day += timedelta(days=rng.choice([10, 26, 28, 29, 31, 35, 120]))
+        records.append(period(day, rng.randint(3, 7)))
+    rng.shuffle(records)
+
+    stats = CycleStats()
+    kept = []
+    for record in records:
+        stats.add(record['start_date'], record['end_date'])
+        kept.append(record)
+        if rng.random() < 0.3:
+            gone = kept.pop(rng.randrange(len(kept)))
+            assert stats.remove(gone['start_date'], gone['end_date'])
+        assert stats.summary() == CycleStats.from_records(kept).summary()
+    assert not stats.remove('1999-01-01', '1999-01-05')
@@ -0,0 +1,37 @@
+"""Schema migrations on a database from before them, and the limits they add"""
+import sqlite3
+
+import pytest
+
+from bulk_io import NOTE_MAX_LENGTH
+from migrations import MIGRATIONS, migrate, schema_version
+
+
+def test_note_length_is_limited_after_migrating(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'old.db')
+    conn.executescript("""
+        CREATE TABLE todo (id INTEGER PRIMARY KEY, text VARCHAR(200) NOT NULL, completed BOOLEAN);
+        CREATE TABLE note (id INTEGER PRIMARY KEY, text TEXT NOT NULL, timestamp DATETIME);
+        CREATE TABLE period_record (id INTEGER PRIMARY KEY, start_date DATE NOT NULL, end_date DATE NOT NULL);
+        CREATE TABLE sync_change (uid TEXT PRIMARY KEY, kind TEXT, row_id INTEGER, seq INTEGER);
+    """)
+    conn.execute("INSERT INTO note (text) VALUES (?)", ('x' * (NOTE_MAX_LENGTH + 1),))
+    conn.commit()
+
+    assert migrate(conn) == len(MIGRATIONS)
+    assert schema_version(conn.cursor()) == len(MIGRATIONS)
+    with pytest.raises(sqlite3.IntegrityError, match='longer than'):
+        conn.execute("INSERT INTO note (text) VALUES (?)", ('x' * (NOTE_MAX_LENGTH + 1),))
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("UPDATE note SET text = text || 'y'")
+    conn.execute("INSERT INTO note (text) VALUES (?)", ('x' * NOTE_MAX_LENGTH,))
+    # The note saved before the limit is kept
+    assert conn.execute("SELECT COUNT(*) FROM note").fetchone()[0] == 2
+    conn.close()
+
+
+def test_api_rejects_long_notes(client):
+    response = client.post('/api/notes', json={'text': 'x' * (NOTE_MAX_LENGTH + 1)})
+    assert response.status_code == 400
+    assert str(NOTE_MAX_LENGTH) in response.get_json()['error']
+    assert client.post('/api/notes', json={'text': 'x' * NOTE_MAX_LENGTH}).status_code == 201
@@ -0,0 +1,96 @@
+"""JournalStore and the journal's op coalescing"""
+import copy
+
+import pytest
+
+from pet_store import apply_ops, coalesce
+
+
+def note(record_id, text='x'):
+    return {'id': record_id, 'text': text, 'timestamp': '2024-01-01 00:00:00'}
+
+
+def replay(ops):
+    data = {'notes': [note('a', 'snapshot a'), note('b', 'snapshot b')], 'tombstones': {}}
+    apply_ops(data, copy.deepcopy(ops))
+    return data
+
+
+SEQUENCES = {
+    'set, delete, set': [
+        {'op': 'set', 'key': 'tombstones', 'value': {}},
+        {'op': 'delete', 'collection': 'notes', 'id': 'a', 'tombstone': {'rev': 3, 'updated_at': 1.0}},
+        {'op': 'set', 'key': 'tombstones', 'value': {}},
+    ],
+    'set collection, delete, set collection': [
+        {'op': 'set', 'key': 'notes', 'value': [note('a')]},
+        {'op': 'delete', 'collection': 'notes', 'id': 'a'},
+        {'op': 'set', 'key': 'notes', 'value': [note('a', 'back'), note('c')]},
+    ],
+    'update across a set': [
+        {'op': 'update', 'collection': 'notes', 'id': 'a', 'fields': {'text': 'one'}},
+        {'op': 'set', 'key': 'notes', 'value': [note('a', 'replaced')]},
+        {'op': 'update', 'collection': 'notes', 'id': 'a', 'fields': {'rev': 4}},
+    ],
+    'delete then update': [
+        {'op': 'delete', 'collection': 'notes', 'id': 'a', 'tombstone': {'rev': 3, 'updated_at': 1.0}},
+        {'op': 'update', 'collection': 'notes', 'id': 'a', 'fields': {'text': 'late'}},
+    ],
+    'add, add, update the first': [
+        {'op': 'add', 'collection': 'notes', 'record': note('c')},
+        {'op': 'add', 'collection': 'notes', 'record': note('d')},
+        {'op': 'update', 'collection': 'notes', 'id': 'c', 'fields': {'text': 'edited'}},
+    ],
+    'delete and add again': [
+        {'op': 'delete', 'collection': 'notes', 'id': 'a', 'tombstone': {'rev': 3, 'updated_at': 1.0}},
+        {'op': 'add', 'collection': 'notes', 'record': note('c')},
+        {'op': 'add', 'collection': 'notes', 'record': note('a', 'pulled again')},
+    ],
+    'add then delete': [
+        {'op': 'add', 'collection': 'notes', 'record': note('c')},
+        {'op': 'update', 'collection': 'notes', 'id': 'c', 'fields': {'text': 'edited'}},
+        {'op': 'delete', 'collection': 'notes', 'id': 'c'},
+    ],
+}
+
+
+@pytest.mark.parametrize('name', SEQUENCES)
+def test_coalesce_replays_like_the_ops(name):
+    ops = SEQUENCES[name]
+    assert replay(coalesce(copy.deepcopy(ops))) == replay(ops)
+
+
+def test_coalesce_merges_repeated_changes():
+    ops = [{'op': 'update', 'collection': 'notes', 'id': 'a', 'fields': {'text': str(i)}} for i in range(5)]
+    ops += [{'op': 'set', 'key': 'pet_size', 'value': size} for size in (100, 120, 150)]
+    assert coalesce(ops) == [{'op': 'update', 'collection': 'notes', 'id': 'a', 'fields': {'text': '4'}},
+                             {'op': 'set', 'key': 'pet_size', 'value': 150}]
+
+
+def test_set_delete_set_survives_a_reload(open_store):
+    store = open_store()
+    store.flush_interval = 60  # One window for all of it
+    record = store.add('notes', note(None, 'to delete') | {'id': 'gone'})
+    store.flush()
+    store.set('tombstones', {})
+    store.delete('notes', record)
+    store.set('pushed_rev', store.revision)
+    store.set('tombstones', {})
+    store.close()
+    reloaded = open_store()
+    assert reloaded.get('notes', 'gone') is None
+    assert reloaded.get_setting('tombstones') == {}
+
+
+def test_periods_stay_newest_first(open_store):
+    store = open_store()
+    for start in ('2024-03-01', '2024-01-01', '2024-05-01', '2024-02-01'):
+        store.add('period_records', {'start_date': start, 'end_date': start})
+    store.delete('period_records', store.fetch('period_records')[1])
+    moved = store.fetch('period_records')[-1]
+    store.update('period_records', moved, start_date='2024-04-01')
+    expected = ['2024-05-01', '2024-04-01', '2024-02-01']
+    assert [r['start_date'] for r in store.fetch('period_records')] == expected
+
+    store.close()
+    assert [r['start_date'] for r in open_store().fetch('period_records')] == expected
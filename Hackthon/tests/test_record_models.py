@@ -0,0 +1,45 @@
+"""RecordListModel edits under a search, and painting rows with missing fields"""
+from PySide6.QtCore import QRect
+from PySide6.QtGui import QPainter, QPixmap
+from PySide6.QtWidgets import QStyleOptionViewItem
+
+from record_models import RecordListModel, NoteDelegate, TodoDelegate
+
+
+def texts(model):
+    return [model.record(row)['text'] for row in range(model.rowCount())]
+
+
+def test_append_under_a_search_shows_only_matches(open_store):
+    store = open_store()
+    store.add_many('notes', [{'text': f'walk the dog {i}'} for i in range(3)])
+    model = RecordListModel(store, 'notes')
+    model.set_query('walk do')
+
+    model.append_record({'text': 'buy milk'})
+    assert texts(model) == ['walk the dog 0', 'walk the dog 1', 'walk the dog 2']
+    model.append_record({'text': 'Walked the dogs'})
+    assert texts(model)[-1] == 'Walked the dogs'
+    assert model.total() == 4
+
+    model.set_query('')
+    while model.canFetchMore():
+        model.fetchMore()
+    assert model.rowCount() == model.total() == 5
+
+
+def test_rows_paint_without_timestamp_or_text(qapp, open_store):
+    store = open_store()
+    for collection, delegate in (('notes', NoteDelegate()), ('todos', TodoDelegate())):
+        store.add(collection, {'text': None, 'timestamp': None})
+        model = RecordListModel(store, collection)
+        model.reload()
+        model.fetchMore()
+        option = QStyleOptionViewItem()
+        option.rect = QRect(0, 0, 300, 80)
+        pixmap = QPixmap(300, 80)
+        painter = QPainter(pixmap)
+        try:
+            delegate.paint(painter, option, model.index(0))
+        finally:
+            painter.end()
@@ -0,0 +1,47 @@
+"""SQLiteStore pointed at the web app's database"""
+import uuid
+
+from sqlite_store import SQLiteStore
+
+
+def search(client, kind, query):
+    return sorted(item['text'] for item in client.get(f'/api/{kind}', query_string={'q': query}).get_json()['items'])
+
+
+def test_store_writes_reach_the_cached_api(client, web_app):
+    db_path = web_app.config['SQLALCHEMY_DATABASE_URI'][len('sqlite:///'):]
+    marker = 'm' + uuid.uuid4().hex[:8]
+    # Cache the empty results first
+    assert search(client, 'notes', marker) == []
+    records = client.get('/api/periods/stats').get_json()['records']
+
+    store = SQLiteStore(db_path).load()
+    try:
+        note = store.add('notes', {'text': f'one {marker}', 'timestamp': '2021-01-01 00:00:00'})
+        assert search(client, 'notes', marker) == [f'one {marker}']
+
+        # A bulk import, as bulk_io.py import --db does
+        store.add_many('notes', [{'text': f'two {marker}', 'timestamp': '2021-01-02 00:00:00'},
+                                 {'text': f'three {marker}', 'timestamp': '2021-01-03 00:00:00'}])
+        assert search(client, 'notes', marker) == sorted([f'one {marker}', f'two {marker}', f'three {marker}'])
+
+        store.update('notes', note, text=f'first {marker}')
+        assert f'first {marker}' in search(client, 'notes', marker)
+        store.delete('notes', note)
+        assert search(client, 'notes', marker) == sorted([f'two {marker}', f'three {marker}'])
+
+        store.add('period_records', {'start_date': '1950-01-01', 'end_date': '1950-01-05'})
+        assert client.get('/api/periods/stats').get_json()['records'] == records + 1
+    finally:
+        store.close()
+
+    # The desktop sync sees them as server changes
+    pulled = client.post('/api/sync', json={'client_id': 'test-client', 'cursor': 0, 'changes': []}).get_json()
+    texts = set()
+    while True:
+        texts |= {c['record']['text'] for c in pulled['changes'] if c['kind'] == 'notes' and not c['deleted']}
+        if not pulled['more']:
+            break
+        pulled = client.post('/api/sync', json={'client_id': 'test-client', 'cursor': pulled['cursor'],
+                                                'changes': []}).get_json()
+    assert {f'two {marker}', f'three {marker}'} <= texts and f'first {marker}' not in texts
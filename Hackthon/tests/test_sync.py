@@ -0,0 +1,83 @@
+"""Sync between the desktop JSON store and the web app, through Flask's test client"""
+import json
+import uuid
+
+from sync import SyncClient
+
+
+class LocalSyncClient(SyncClient):
+    """A SyncClient whose requests go to the test client instead of over HTTP"""
+
+    def __init__(self, store, client):
+        super().__init__(store, 'http://testserver')
+        self.client = client
+
+    def exchange(self, payload):
+        body = {key: payload[key] for key in ('client_id', 'cursor', 'changes')}
+        response = self.client.post('/api/sync', json=body)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return response.get_json()
+
+
+def server_texts(client, kind):
+    texts, cursor = [], None
+    while True:
+        page = client.get(f'/api/{kind}', query_string={'limit': 200, **({'cursor': cursor} if cursor else {})}).get_json()
+        texts += [item.get('text') or item.get('start_date') for item in page['items']]
+        cursor = page.get('next_cursor')
+        if not cursor:
+            return texts
+
+
+def test_first_sync_pushes_legacy_records(client, open_store, tmp_path):
+    marker = uuid.uuid4().hex[:8]
+    # pet_data.json from before the journal: no ids, no revs
+    (tmp_path / 'pet_data.json').write_text(json.dumps({
+        'notes': [{'text': f'legacy note {marker}', 'timestamp': '2020-05-01 10:00:00'}],
+        'todos': [{'text': f'legacy todo {marker}', 'completed': False}],
+        'period_records': [{'start_date': '1987-03-01', 'end_date': '1987-03-05'}],
+        'reminders': [], 'pet_size': 100,
+    }), encoding='utf-8')
+    store = open_store()
+    assert LocalSyncClient(store, client).sync()[0] == 3
+    assert f'legacy note {marker}' in server_texts(client, 'notes')
+    assert f'legacy todo {marker}' in server_texts(client, 'todos')
+    assert '1987-03-01' in server_texts(client, 'periods')
+
+    # Pushed once: after a reload nothing is left to push, and the records aren't duplicated
+    store.close()
+    store = open_store()
+    assert LocalSyncClient(store, client).sync()[0] == 0
+    assert server_texts(client, 'notes').count(f'legacy note {marker}') == 1
+    assert [n['text'] for n in store.fetch('notes') if marker in n['text']] == [f'legacy note {marker}']
+
+
+def test_pulled_records_reach_open_dialogs(qapp, client, open_store):
+    from types import SimpleNamespace
+    from PySide6.QtWidgets import QWidget
+    from desktop_pet import DesktopPet
+    from dialogs import NotesDialog, TodoListDialog
+
+    marker = uuid.uuid4().hex[:8]
+    other = open_store('other.json')
+    other.add('todos', {'text': f'todo from elsewhere {marker}', 'completed': False})
+    other.add('notes', {'text': f'note from elsewhere {marker}', 'timestamp': '2024-01-01 00:00:00'})
+    LocalSyncClient(other, client).sync()
+
+    store = open_store()
+    parent = QWidget()
+    parent.store = store
+    pet = SimpleNamespace(syncing=True, sync_client=LocalSyncClient(store, client), period_dialog=None,
+                          todo_dialog=TodoListDialog(parent), notes_dialog=NotesDialog(parent))
+    pet.todo_dialog.search_input.setText(marker)
+    pet.todo_dialog.run_search()
+    pet.start_sync = lambda: rounds.append(True)
+    rounds = [True]
+    while rounds:
+        rounds.pop()
+        payload = pet.sync_client.prepare()
+        DesktopPet.finish_sync(pet, payload, pet.sync_client.exchange(payload))
+
+    todos = pet.todo_dialog.model
+    assert [todos.record(row)['text'] for row in range(todos.rowCount())] == [f'todo from elsewhere {marker}']
+    assert pet.notes_dialog.model.total() == store.count('notes') > 0
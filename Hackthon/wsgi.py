@@ -0,0 +1,35 @@
+"""Production entry point for the Flask app.
+
+Flask's built-in server is for development only. Serve the app with a
+multi-threaded or multi-process WSGI server instead:
+
+    python wsgi.py --port 5000 --threads 16                                 # waitress, works everywhere
+    EVENTS_MAX_CLIENTS=2 gunicorn -w 4 --threads 4 -b 0.0.0.0:5000 wsgi:app  # gunicorn, Linux/macOS
+
+Every /events stream holds a server thread until the page closes. Under
+waitress at most half of --threads serve streams; gunicorn doesn't tell
+the app its thread count, so set EVENTS_MAX_CLIENTS, the streams allowed
+per worker, to half of --threads there.
+
+Set DATABASE_URL to use a database other than instance/app.db.
+"""
+import argparse
+import logging
+
+from app import app, broker
+from models import init_db
+
+with app.app_context():
+    init_db()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve the Oiia web app with waitress")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=16)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    # Live update streams hold a thread each; leave the rest for requests
+    broker.max_subscribers = max(1, args.threads // 2)
+    from waitress import serve
+    serve(app, host=args.host, port=args.port, threads=args.threads)